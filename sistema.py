@@ -1,24 +1,249 @@
+import time
+INICIO_PROCESSO = time.perf_counter()
+
 import customtkinter as ctk
 from CTkMessagebox import CTkMessagebox
 import sqlite3
 from datetime import datetime, timedelta
 from tkinter import ttk, filedialog
 from pathlib import Path
-import shutil
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib
-matplotlib.use('Agg')
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from contextlib import contextmanager, nullcontext
+import threading
+import queue
+from collections import OrderedDict
+import logging
+from logging.handlers import RotatingFileHandler
+import os
+import sys
+import importlib.util
+import csv
+
+# pandas, matplotlib e openpyxl são importados só onde são usados
+# (relatórios, gráfico do dashboard e exportações); veja pre_carregar_modulos
+TEMPO_IMPORTACOES = time.perf_counter() - INICIO_PROCESSO
+
+log = logging.getLogger('barbearia')
+
+# =============================================================
+# MÓDULOS PESADOS (IMPORTAÇÃO ADIADA)
+# =============================================================
+MODULOS_ADIADOS = (
+    'pandas',
+    'matplotlib.figure',
+    'matplotlib.backends.backend_agg',
+    'matplotlib.ticker',
+    'PIL.Image',
+    'openpyxl',
+)
+
+# Milissegundos gastos em cada importação feita por importar_modulo
+tempos_importacao = {}
+
+
+def importar_modulo(nome):
+    """Importa o módulo (ou espera a importação em andamento em outra
+    thread) e registra quanto tempo a primeira importação levou"""
+    ja_importado = nome in sys.modules
+    inicio = time.perf_counter()
+    modulo = importlib.import_module(nome)
+    if not ja_importado:
+        tempos_importacao.setdefault(nome, (time.perf_counter() - inicio) * 1000)
+    return modulo
+
+
+def pre_carregar_modulos():
+    """Importa os módulos pesados em segundo plano (chamado com a tela de
+    login aberta), para que o primeiro uso não trave a interface"""
+    def carregar():
+        for nome in MODULOS_ADIADOS:
+            try:
+                importar_modulo(nome)
+            except ImportError:
+                pass  # O erro aparece de novo no primeiro uso, com a mensagem da tela
+    
+    threading.Thread(target=carregar, name="pre-carregamento", daemon=True).start()
 
 # =============================================================
 # BANCO DE DADOS COMPLETO
 # =============================================================
-class Database:
+def escrita(*tabelas):
+    """Serializa os métodos de escrita do Database entre as threads, conta
+    a escrita das tabelas em versoes_dados (na transação do próprio método)
+    e marca as tabelas alteradas, para as telas saberem o que atualizar"""
+    def decorador(metodo):
+        @wraps(metodo)
+        def wrapper(self, *args, **kwargs):
+            with self.trava_escrita:
+                externa = not self.conn.in_transaction
+                try:
+                    # Abre a transação: o contador sobe com o commit do método
+                    self.contar_escrita(*tabelas)
+                    return metodo(self, *args, **kwargs)
+                finally:
+                    if externa and self.conn.in_transaction:
+                        self.conn.rollback()  # O método falhou ou não gravou nada
+                    self.marcar_alteracao(*tabelas)
+        return wrapper
+    return decorador
+
+
+class CacheRelatorios:
+    """Resultados dos métodos de relatório do Database, compartilhados
+    entre todas as conexões do processo.
+    
+    Cada método tem seu próprio LRU de até `limite` resultados, com chave
+    pelos argumentos. Um resultado guarda a versão (versoes_dados) das
+    tabelas que o método lê e só é entregue enquanto ela for a mesma.
+    Os resultados são compartilhados: quem os recebe não deve alterá-los.
+    """
+    
+    AUSENTE = object()
+    
     def __init__(self):
-        self.conn = sqlite3.connect('barbearia.db', check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.criar_tabelas()
+        self._metodos = {}
+        self._trava = threading.Lock()
+    
+    def obter(self, metodo, chave, versao):
+        with self._trava:
+            itens = self._metodos.get(metodo)
+            item = itens.get(chave) if itens else None
+            if item is None or item[0] != versao:
+                return self.AUSENTE
+            itens.move_to_end(chave)
+            return item[1]
+    
+    def guardar(self, metodo, chave, versao, valor, limite):
+        with self._trava:
+            itens = self._metodos.setdefault(metodo, OrderedDict())
+            itens[chave] = (versao, valor)
+            itens.move_to_end(chave)
+            while len(itens) > limite:
+                itens.popitem(last=False)
+    
+    def limpar(self):
+        with self._trava:
+            self._metodos.clear()
+
+
+def relatorio(*tabelas, limite=32):
+    """Memoriza o método de relatório do Database em cache_relatorios até
+    alguma das tabelas que ele lê ser gravada (por qualquer conexão)"""
+    def decorador(metodo):
+        @wraps(metodo)
+        def wrapper(self, *args, **kwargs):
+            versao = self.versoes_gravadas(*tabelas)
+            chave = (self.caminho, args, tuple(sorted(kwargs.items())))
+            resultado = self.cache_relatorios.obter(metodo.__name__, chave, versao)
+            if resultado is CacheRelatorios.AUSENTE:
+                resultado = metodo(self, *args, **kwargs)
+                self.cache_relatorios.guardar(metodo.__name__, chave, versao, resultado, limite)
+            return resultado
+        return wrapper
+    return decorador
+
+
+def normalizar_telefone(telefone):
+    """Chave de comparação do telefone: só os dígitos, sem o código do
+    país (55) e sem o zero de longa distância.
+    
+    "(11) 99999-9999", "11999999999" e "+55 11 99999-9999" viram "11999999999".
+    """
+    digitos = ''.join(c for c in str(telefone or '') if c.isdigit())
+    if len(digitos) in (12, 13) and digitos.startswith('55'):
+        digitos = digitos[2:]
+    return digitos.lstrip('0')
+
+
+class Database:
+    # Ajustes aplicados em todas as conexões
+    PRAGMAS = (
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -8000",
+        "PRAGMA busy_timeout = 5000",
+    )
+    
+    def __init__(self, caminho='barbearia.db', somente_leitura=False):
+        self.caminho = caminho
+        self.somente_leitura = somente_leitura
+        self.trava_escrita = threading.RLock()
+        self._local = threading.local()
+        self.versoes_tabelas = {}
+        self._trava_versoes = threading.Lock()
+        # Avisos das migrações, mostrados ao usuário depois do login
+        self.avisos_migracao = []
+        # Meses fechados movidos para fora do banco (veja arquivar_historico)
+        self.historico = ArquivoHistorico(Path(caminho).resolve().parent / 'historico')
+        
+        if somente_leitura:
+            uri = Path(caminho).resolve().as_uri() + "?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self.aplicar_pragmas()
+        else:
+            self.conn = sqlite3.connect(caminho, check_same_thread=False)
+            # WAL deixa as conexões de leitura trabalharem junto com a escrita
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.aplicar_pragmas()
+            self.criar_tabelas()
+    
+    # Tabelas cujas escritas são contadas em versoes_tabelas e versoes_dados
+    TABELAS_DADOS = ('servicos', 'produtos', 'clientes', 'agendamentos', 'vendas', 'despesas', 'caixa')
+    
+    def marcar_alteracao(self, *tabelas):
+        # Chamado pelas threads de escrita e pelo MonitorAlteracoes, na do Tk
+        with self._trava_versoes:
+            for tabela in tabelas:
+                self.versoes_tabelas[tabela] = self.versoes_tabelas.get(tabela, 0) + 1
+    
+    def versao_tabelas(self, *tabelas):
+        """Contadores de escrita (neste processo) das tabelas"""
+        with self._trava_versoes:
+            return tuple(self.versoes_tabelas.get(tabela, 0) for tabela in tabelas)
+    
+    # Resultados dos métodos marcados com @relatorio (um cache para o processo)
+    cache_relatorios = CacheRelatorios()
+    
+    def contar_escrita(self, *tabelas):
+        """Soma uma escrita às tabelas em versoes_dados (veja @escrita)"""
+        marcadores = ', '.join('?' * len(tabelas))
+        self.cursor.execute(
+            f"UPDATE versoes_dados SET versao = versao + 1 WHERE tabela IN ({marcadores})", tabelas
+        )
+    
+    def versoes_gravadas(self, *tabelas):
+        """Contadores de escrita das tabelas guardados no banco (versoes_dados):
+        ao contrário de versao_tabelas, mudam também com escritas de outros processos"""
+        marcadores = ', '.join('?' * len(tabelas))
+        self.cursor.execute(
+            f"SELECT tabela, versao FROM versoes_dados WHERE tabela IN ({marcadores})", tabelas
+        )
+        versoes = dict(self.cursor.fetchall())
+        return tuple(versoes.get(tabela, 0) for tabela in tabelas)
+    
+    def versao_dados(self):
+        """PRAGMA data_version: muda quando outra conexão grava no banco"""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def aplicar_pragmas(self):
+        for pragma in self.PRAGMAS:
+            self.conn.execute(pragma)
+    
+    @property
+    def cursor(self):
+        """Cursor próprio de cada thread, já que a conexão é compartilhada"""
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._local.cursor = self.novo_cursor()
+        return cursor
+    
+    def novo_cursor(self):
+        """Cursor avulso, para consultas lidas aos poucos enquanto o
+        cursor da thread é usado por outras"""
+        if ProfilerConsultas.ativo():
+            return self.conn.cursor(CursorMonitorado)
+        return self.conn.cursor()
     
     def criar_tabelas(self):
         # Tabela de serviços
@@ -29,7 +254,7 @@ class Database:
                 valor REAL NOT NULL,
                 duracao INTEGER DEFAULT 30,
                 ativo INTEGER DEFAULT 1,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                data_criacao TIMESTAMP DEFAULT (datetime('now', 'localtime'))
             )
         ''')
         
@@ -43,7 +268,7 @@ class Database:
                 estoque INTEGER DEFAULT 0,
                 estoque_minimo INTEGER DEFAULT 5,
                 ativo INTEGER DEFAULT 1,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                data_criacao TIMESTAMP DEFAULT (datetime('now', 'localtime'))
             )
         ''')
         
@@ -55,7 +280,7 @@ class Database:
                 telefone TEXT NOT NULL UNIQUE,
                 email TEXT,
                 data_nascimento DATE,
-                data_cadastro DATE DEFAULT CURRENT_DATE,
+                data_cadastro DATE DEFAULT (date('now', 'localtime')),
                 total_gasto REAL DEFAULT 0,
                 total_visitas INTEGER DEFAULT 0,
                 observacoes TEXT
@@ -75,7 +300,7 @@ class Database:
                 valor REAL NOT NULL,
                 pago INTEGER DEFAULT 0,
                 observacoes TEXT,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_criacao TIMESTAMP DEFAULT (datetime('now', 'localtime')),
                 FOREIGN KEY (cliente_id) REFERENCES clientes(id),
                 FOREIGN KEY (servico_id) REFERENCES servicos(id)
             )
@@ -92,7 +317,7 @@ class Database:
                 valor_unitario REAL NOT NULL,
                 valor_total REAL NOT NULL,
                 forma_pagamento TEXT NOT NULL,
-                data_venda TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_venda TIMESTAMP DEFAULT (datetime('now', 'localtime')),
                 FOREIGN KEY (cliente_id) REFERENCES clientes(id)
             )
         ''')
@@ -118,7 +343,7 @@ class Database:
                 valor_inicial REAL NOT NULL,
                 valor_final REAL,
                 status TEXT DEFAULT 'aberto',
-                data_abertura TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_abertura TIMESTAMP DEFAULT (datetime('now', 'localtime')),
                 data_fechamento TIMESTAMP
             )
         ''')
@@ -144,8 +369,319 @@ class Database:
             )
         
         self.conn.commit()
+        
+        self.aplicar_migracoes()
+    
+    # ========== MIGRAÇÕES ==========
+    def aplicar_migracoes(self):
+        """Aplica as migrações pendentes, controladas por PRAGMA user_version"""
+        migracoes = [
+            (1, self.migracao_indices),
+            (2, self.migracao_vendas_diarias),
+            (3, self.migracao_indices_clientes),
+            (4, self.migracao_busca_clientes),
+            (5, self.migracao_telefone_normalizado),
+            (6, self.migracao_indices_ordenacao),
+            (7, self.migracao_arquivo_historico),
+            (8, self.migracao_versoes_dados),
+            (9, self.migracao_trigger_exclusao_vendas),
+            (10, self.migracao_versoes_por_escrita),
+            (11, self.migracao_datas_locais),
+        ]
+        
+        self.cursor.execute("PRAGMA user_version")
+        versao_atual = self.cursor.fetchone()[0]
+        
+        for versao, migracao in migracoes:
+            if versao_atual < versao:
+                migracao()
+                self.cursor.execute(f"PRAGMA user_version = {versao}")
+                self.conn.commit()
+        
+        self.verificar_busca_textual()
+    
+    def verificar_busca_textual(self):
+        """Cria o índice de busca se ele faltar (banco migrado num SQLite
+        sem FTS5 e aberto agora num SQLite que tem)"""
+        self.cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'clientes_fts'"
+        )
+        if self.cursor.fetchone()[0] == 0:
+            self.migracao_busca_clientes()
+            self.conn.commit()
+    
+    def migracao_indices(self):
+        """Índices usados pelos relatórios, dashboard, agenda e caixa"""
+        indices = [
+            "CREATE INDEX IF NOT EXISTS idx_vendas_data_venda ON vendas(data_venda)",
+            "CREATE INDEX IF NOT EXISTS idx_vendas_cliente ON vendas(cliente_id)",
+            "CREATE INDEX IF NOT EXISTS idx_vendas_tipo_item ON vendas(tipo, item_id)",
+            "CREATE INDEX IF NOT EXISTS idx_agendamentos_data_hora ON agendamentos(data, hora)",
+            "CREATE INDEX IF NOT EXISTS idx_despesas_data ON despesas(data)",
+            "CREATE INDEX IF NOT EXISTS idx_caixa_data_status ON caixa(data, status)",
+        ]
+        for sql in indices:
+            self.cursor.execute(sql)
+        self.cursor.execute("ANALYZE")
+    
+    # Soma a venda no dia (usado pelos triggers de INSERT e UPDATE de vendas)
+    SOMAR_VENDA_DIARIA = '''
+        INSERT INTO vendas_diarias 
+            (dia, tipo, forma_pagamento, quantidade_vendas, quantidade_itens, valor_total)
+        VALUES (date(NEW.data_venda), NEW.tipo, NEW.forma_pagamento, 1,
+                COALESCE(NEW.quantidade, 1), NEW.valor_total)
+        ON CONFLICT (dia, tipo, forma_pagamento) DO UPDATE SET
+            quantidade_vendas = quantidade_vendas + 1,
+            quantidade_itens = quantidade_itens + excluded.quantidade_itens,
+            valor_total = valor_total + excluded.valor_total;
+    '''
+    
+    # Subtrai a venda antiga do dia (usado pelos triggers de DELETE e UPDATE de vendas)
+    SUBTRAIR_VENDA_DIARIA = '''
+        UPDATE vendas_diarias 
+           SET quantidade_vendas = quantidade_vendas - 1,
+               quantidade_itens = quantidade_itens - COALESCE(OLD.quantidade, 1),
+               valor_total = valor_total - OLD.valor_total
+         WHERE dia = date(OLD.data_venda) AND tipo = OLD.tipo AND forma_pagamento = OLD.forma_pagamento;
+        DELETE FROM vendas_diarias 
+         WHERE dia = date(OLD.data_venda) AND tipo = OLD.tipo AND forma_pagamento = OLD.forma_pagamento
+           AND quantidade_vendas <= 0;
+    '''
+    
+    def migracao_vendas_diarias(self):
+        """Tabela de totais diários de vendas, mantida por triggers"""
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS vendas_diarias (
+                dia DATE NOT NULL,
+                tipo TEXT NOT NULL,
+                forma_pagamento TEXT NOT NULL,
+                quantidade_vendas INTEGER DEFAULT 0,
+                quantidade_itens INTEGER DEFAULT 0,
+                valor_total REAL DEFAULT 0,
+                PRIMARY KEY (dia, tipo, forma_pagamento)
+            )
+        ''')
+        
+        somar_nova = self.SOMAR_VENDA_DIARIA
+        subtrair_antiga = self.SUBTRAIR_VENDA_DIARIA
+        
+        self.cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_vendas_diarias_insert AFTER INSERT ON vendas
+            BEGIN {somar_nova} END
+        """)
+        self.cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_vendas_diarias_delete AFTER DELETE ON vendas
+            BEGIN {subtrair_antiga} END
+        """)
+        self.cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_vendas_diarias_update 
+            AFTER UPDATE OF data_venda, tipo, forma_pagamento, quantidade, valor_total ON vendas
+            BEGIN {subtrair_antiga} {somar_nova} END
+        """)
+        
+        # Carga inicial a partir das vendas existentes
+        self.cursor.execute("DELETE FROM vendas_diarias")
+        self.cursor.execute('''
+            INSERT INTO vendas_diarias 
+                (dia, tipo, forma_pagamento, quantidade_vendas, quantidade_itens, valor_total)
+            SELECT date(data_venda), tipo, forma_pagamento, COUNT(*),
+                   SUM(COALESCE(quantidade, 1)), SUM(valor_total)
+            FROM vendas
+            GROUP BY date(data_venda), tipo, forma_pagamento
+        ''')
+    
+    def migracao_indices_clientes(self):
+        """Índices usados pela paginação da lista de clientes"""
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_nome ON clientes(nome)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_total_gasto ON clientes(total_gasto)")
+    
+    def migracao_busca_clientes(self):
+        """Índice de texto (FTS5 trigram) sobre clientes, mantido por triggers"""
+        try:
+            self.cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5(
+                    nome, telefone, email, observacoes,
+                    content='clientes', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as erro:
+            # SQLite sem FTS5/trigram: a busca usa LIKE
+            log.warning("Busca de clientes sem índice de texto (FTS5 trigram indisponível: %s); usando LIKE", erro)
+            return
+        
+        inserir_novo = '''
+            INSERT INTO clientes_fts (rowid, nome, telefone, email, observacoes)
+            VALUES (NEW.id, NEW.nome, NEW.telefone, NEW.email, NEW.observacoes);
+        '''
+        remover_antigo = '''
+            INSERT INTO clientes_fts (clientes_fts, rowid, nome, telefone, email, observacoes)
+            VALUES ('delete', OLD.id, OLD.nome, OLD.telefone, OLD.email, OLD.observacoes);
+        '''
+        
+        self.cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_clientes_fts_insert AFTER INSERT ON clientes
+            BEGIN {inserir_novo} END
+        """)
+        self.cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_clientes_fts_delete AFTER DELETE ON clientes
+            BEGIN {remover_antigo} END
+        """)
+        self.cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_clientes_fts_update 
+            AFTER UPDATE OF nome, telefone, email, observacoes ON clientes
+            BEGIN {remover_antigo} {inserir_novo} END
+        """)
+        
+        # Carga inicial a partir dos clientes existentes
+        self.cursor.execute("INSERT INTO clientes_fts (clientes_fts) VALUES ('rebuild')")
+    
+    def migracao_telefone_normalizado(self):
+        """Coluna telefone_norm com índice único, preenchida a partir dos
+        clientes existentes. Telefones repetidos ficam sem telefone_norm
+        (vale o cliente mais antigo) e são listados em um relatório .txt"""
+        colunas = [c[1] for c in self.cursor.execute("PRAGMA table_info(clientes)")]
+        if 'telefone_norm' not in colunas:
+            self.cursor.execute("ALTER TABLE clientes ADD COLUMN telefone_norm TEXT")
+        
+        self.cursor.execute("SELECT id, nome, telefone FROM clientes ORDER BY id")
+        clientes = self.cursor.fetchall()
+        
+        primeiro = {}
+        duplicados = []
+        atualizacoes = []
+        for cliente_id, nome, telefone in clientes:
+            norm = normalizar_telefone(telefone) or None
+            if norm and norm in primeiro:
+                duplicados.append((norm, primeiro[norm], (cliente_id, nome, telefone)))
+                norm = None
+            elif norm:
+                primeiro[norm] = (cliente_id, nome, telefone)
+            atualizacoes.append((norm, cliente_id))
+        
+        self.cursor.executemany(
+            "UPDATE clientes SET telefone_norm = ? WHERE id = ?", atualizacoes
+        )
+        self.cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_clientes_telefone_norm ON clientes(telefone_norm)"
+        )
+        
+        if duplicados:
+            self.relatorio_telefones_duplicados(duplicados)
+    
+    def relatorio_telefones_duplicados(self, duplicados):
+        """Grava ao lado do banco a lista de clientes com o mesmo telefone"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        arquivo = Path(self.caminho).resolve().parent / f"telefones_duplicados_{timestamp}.txt"
+        
+        linhas = [
+            "CLIENTES COM TELEFONE DUPLICADO",
+            f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}",
+            "O cliente mantido é o mais antigo; revise e una os cadastros repetidos.",
+            "",
+        ]
+        for norm, (id_mantido, nome_mantido, tel_mantido), (cliente_id, nome, telefone) in duplicados:
+            linhas.append(
+                f"{norm}: mantido #{id_mantido} {nome_mantido} ({tel_mantido}) | "
+                f"repetido #{cliente_id} {nome} ({telefone})"
+            )
+        
+        arquivo.write_text("\n".join(linhas) + "\n", encoding="utf-8")
+        aviso = f"{len(duplicados)} telefone(s) duplicado(s) encontrado(s). Veja {arquivo}"
+        log.warning(aviso)
+        self.avisos_migracao.append(aviso)
+    
+    def migracao_indices_ordenacao(self):
+        """Índices das colunas que as listas virtuais ordenam pelo cabeçalho"""
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_data_cadastro ON clientes(data_cadastro)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_total_visitas ON clientes(total_visitas)")
+    
+    def migracao_arquivo_historico(self):
+        """Catálogo dos arquivos do histórico (veja ArquivoHistorico)"""
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS arquivos_historico (
+                arquivo TEXT PRIMARY KEY,
+                tabela TEXT NOT NULL,
+                mes TEXT NOT NULL,
+                linhas INTEGER NOT NULL,
+                concluido INTEGER DEFAULT 0,
+                arquivado_em TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+            )
+        ''')
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_arquivos_historico_tabela_mes ON arquivos_historico(tabela, mes)"
+        )
+    
+    def migracao_versoes_dados(self):
+        """Contador de escritas de cada tabela de dados (invalida o cache
+        dos relatórios, veja @relatorio)"""
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS versoes_dados (
+                tabela TEXT PRIMARY KEY,
+                versao INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        ''')
+        for tabela in self.TABELAS_DADOS:
+            self.cursor.execute("INSERT OR IGNORE INTO versoes_dados (tabela) VALUES (?)", (tabela,))
+    
+    def migracao_trigger_exclusao_vendas(self):
+        """Volta o trigger de DELETE de vendas a subtrair sempre: quem mantém
+        as vendas arquivadas em vendas_diarias é o arquivar_mes"""
+        self.cursor.execute("DROP TRIGGER IF EXISTS trg_vendas_diarias_delete")
+        self.cursor.execute(f"""
+            CREATE TRIGGER trg_vendas_diarias_delete AFTER DELETE ON vendas
+            BEGIN {self.SUBTRAIR_VENDA_DIARIA} END
+        """)
+    
+    def migracao_versoes_por_escrita(self):
+        """versoes_dados passa a ser contado uma vez por método de escrita
+        (@escrita), não mais por linha pelos triggers da migração 8"""
+        for tabela in self.TABELAS_DADOS:
+            for evento in ('insert', 'update', 'delete'):
+                self.cursor.execute(f"DROP TRIGGER IF EXISTS trg_versao_{tabela}_{evento}")
+    
+    # Padrões de data do SQLite (em UTC) e os equivalentes em hora local
+    PADROES_DATA_LOCAL = (
+        ("DEFAULT CURRENT_TIMESTAMP", "DEFAULT (datetime('now', 'localtime'))"),
+        ("DEFAULT CURRENT_DATE", "DEFAULT (date('now', 'localtime'))"),
+    )
+    
+    def migracao_datas_locais(self):
+        """Padrões das colunas de data em hora local, a mesma das datas com
+        que o dashboard e os relatórios comparam (e das chaves de
+        vendas_diarias, que é date(data_venda)).
+        
+        O SQLite não altera o DEFAULT de uma coluna: o CREATE TABLE guardado
+        é reescrito com writable_schema, o caminho que a documentação do
+        ALTER TABLE dá para mudanças que não tocam nos dados gravados. As
+        vendas já gravadas, todas com o padrão em UTC, passam para a hora
+        local, e os triggers as levam para o dia local em vendas_diarias.
+        """
+        self.cursor.execute("PRAGMA schema_version")
+        versao = self.cursor.fetchone()[0]
+        self.cursor.execute("PRAGMA writable_schema = ON")
+        try:
+            for utc, local in self.PADROES_DATA_LOCAL:
+                self.cursor.execute(
+                    "UPDATE sqlite_master SET sql = replace(sql, ?, ?) WHERE type = 'table' AND instr(sql, ?)",
+                    (utc, local, utc)
+                )
+            self.cursor.execute(f"PRAGMA schema_version = {versao + 1}")
+        finally:
+            self.cursor.execute("PRAGMA writable_schema = OFF")
+        
+        self.cursor.execute("UPDATE vendas SET data_venda = datetime(data_venda, 'localtime')")
+    
+    # ========== PAGINAÇÃO ==========
+    @staticmethod
+    def chave_keyset(linhas, limite, *indices):
+        """Chave da última linha, ou None se não houver próxima página"""
+        if len(linhas) < limite:
+            return None
+        ultima = linhas[-1]
+        return tuple(ultima[i] for i in indices)
     
     # ========== SERVIÇOS ==========
+    @escrita('servicos')
     def adicionar_servico(self, nome, valor, duracao=30):
         self.cursor.execute(
             "INSERT INTO servicos (nome, valor, duracao) VALUES (?, ?, ?)",
@@ -162,10 +698,7 @@ class Database:
         self.cursor.execute(query)
         return self.cursor.fetchall()
     
-    def obter_servico_por_id(self, servico_id):
-        self.cursor.execute("SELECT * FROM servicos WHERE id = ?", (servico_id,))
-        return self.cursor.fetchone()
-    
+    @escrita('servicos')
     def atualizar_servico(self, servico_id, nome, valor, duracao, ativo=1):
         self.cursor.execute(
             "UPDATE servicos SET nome = ?, valor = ?, duracao = ?, ativo = ? WHERE id = ?",
@@ -173,11 +706,13 @@ class Database:
         )
         self.conn.commit()
     
+    @escrita('servicos')
     def excluir_servico(self, servico_id):
         self.cursor.execute("DELETE FROM servicos WHERE id = ?", (servico_id,))
         self.conn.commit()
     
     # ========== PRODUTOS ==========
+    @escrita('produtos')
     def adicionar_produto(self, nome, valor_venda, valor_custo, estoque, estoque_minimo=5):
         self.cursor.execute(
             """INSERT INTO produtos (nome, valor_venda, valor_custo, estoque, estoque_minimo) 
@@ -195,10 +730,7 @@ class Database:
         self.cursor.execute(query)
         return self.cursor.fetchall()
     
-    def obter_produto_por_id(self, produto_id):
-        self.cursor.execute("SELECT * FROM produtos WHERE id = ?", (produto_id,))
-        return self.cursor.fetchone()
-    
+    @escrita('produtos')
     def atualizar_produto(self, produto_id, nome, valor_venda, valor_custo, estoque, estoque_minimo, ativo=1):
         self.cursor.execute(
             """UPDATE produtos 
@@ -208,43 +740,154 @@ class Database:
         )
         self.conn.commit()
     
+    @escrita('produtos')
     def excluir_produto(self, produto_id):
         self.cursor.execute("DELETE FROM produtos WHERE id = ?", (produto_id,))
         self.conn.commit()
     
-    def atualizar_estoque(self, produto_id, quantidade):
-        self.cursor.execute(
-            "UPDATE produtos SET estoque = estoque + ? WHERE id = ?",
-            (quantidade, produto_id)
-        )
-        self.conn.commit()
-    
     # ========== CLIENTES ==========
+    @escrita('clientes')
     def adicionar_cliente(self, nome, telefone, email="", data_nascimento=None, observacoes=""):
         self.cursor.execute(
-            """INSERT INTO clientes (nome, telefone, email, data_nascimento, observacoes) 
-               VALUES (?, ?, ?, ?, ?)""",
-            (nome, telefone, email, data_nascimento, observacoes)
+            """INSERT INTO clientes (nome, telefone, telefone_norm, email, data_nascimento, observacoes) 
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (nome, telefone, normalizar_telefone(telefone) or None, email, data_nascimento, observacoes)
         )
         self.conn.commit()
         return self.cursor.lastrowid
     
-    def obter_clientes(self):
-        self.cursor.execute("SELECT * FROM clientes ORDER BY nome")
-        return self.cursor.fetchall()
+    # Ordenações da paginação de clientes: (coluna, índice na linha, direção)
+    ORDENS_CLIENTES = {
+        'id': ('id', 0, 'ASC'),
+        'nome': ('nome', 1, 'ASC'),
+        'telefone': ('telefone', 2, 'ASC'),
+        'data_cadastro': ('data_cadastro', 5, 'DESC'),
+        'total_gasto': ('total_gasto', 6, 'DESC'),
+        'total_visitas': ('total_visitas', 7, 'DESC'),
+    }
+    
+    def obter_clientes_pagina(self, apos=None, limite=200, ordem='nome', decrescente=None, deslocamento=0):
+        """Página de clientes por keyset. `apos` é a chave (valor, id) da última
+        linha da página anterior; sem ela, a página começa em `deslocamento`.
+        Retorna (linhas, proxima_chave)."""
+        coluna, indice, direcao = self.ORDENS_CLIENTES[ordem]
+        if decrescente is not None:
+            direcao = 'DESC' if decrescente else 'ASC'
+        comparacao = '>' if direcao == 'ASC' else '<'
+        
+        query = "SELECT * FROM clientes"
+        params = []
+        if apos is not None:
+            query += f" WHERE ({coluna}, id) {comparacao} (?, ?)"
+            params.extend(apos)
+        query += f" ORDER BY {coluna} {direcao}, id {direcao} LIMIT ?"
+        params.append(limite)
+        if apos is None and deslocamento:
+            query += " OFFSET ?"
+            params.append(deslocamento)
+        
+        self.cursor.execute(query, params)
+        linhas = self.cursor.fetchall()
+        return linhas, self.chave_keyset(linhas, limite, indice, 0)
+    
+    def contar_clientes(self):
+        self.cursor.execute("SELECT COUNT(*) FROM clientes")
+        return self.cursor.fetchone()[0]
     
     def buscar_cliente_por_telefone(self, telefone):
-        self.cursor.execute("SELECT * FROM clientes WHERE telefone = ?", (telefone,))
+        """Busca pelo telefone normalizado, qualquer que seja a formatação digitada"""
+        norm = normalizar_telefone(telefone)
+        if not norm:
+            return None
+        self.cursor.execute("SELECT * FROM clientes WHERE telefone_norm = ?", (norm,))
         return self.cursor.fetchone()
     
-    def buscar_cliente_por_nome(self, nome):
-        self.cursor.execute("SELECT * FROM clientes WHERE nome LIKE ? ORDER BY nome", (f'%{nome}%',))
+    def possui_busca_textual(self):
+        if not hasattr(self, '_possui_fts'):
+            self.cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'clientes_fts'"
+            )
+            self._possui_fts = self.cursor.fetchone()[0] > 0
+        return self._possui_fts
+    
+    def filtro_busca_clientes(self, termo):
+        """(origem, parâmetros, ordem por relevância) da busca de clientes em
+        SQL, com os clientes como `c`; None se o termo não tem palavras"""
+        palavras = termo.split()
+        if not palavras:
+            return None
+        
+        # O trigram só encontra palavras com 3 ou mais caracteres
+        if self.possui_busca_textual() and all(len(p) >= 3 for p in palavras):
+            consulta = " AND ".join('"' + p.replace('"', '""') + '"' for p in palavras)
+            # bm25 com o nome pesando mais que telefone, email e observações
+            origem = '''
+                clientes_fts f JOIN clientes c ON c.id = f.rowid
+                WHERE f.clientes_fts MATCH ? AND f.rank MATCH 'bm25(10.0, 5.0, 2.0, 1.0)'
+            '''
+            return origem, [consulta], "f.rank"
+        
+        condicoes = " AND ".join(
+            "(c.nome LIKE ? OR c.telefone LIKE ? OR c.email LIKE ? OR c.observacoes LIKE ?)"
+            for _ in palavras
+        )
+        params = [f'%{p}%' for p in palavras for _ in range(4)]
+        return f"clientes c WHERE {condicoes}", params, "c.nome"
+    
+    def buscar_clientes(self, termo, limite=None, deslocamento=0, ordem=None, decrescente=None):
+        """Clientes cujo nome, telefone, email ou observações contêm todas as
+        palavras do termo, do mais relevante para o menos relevante (ou pela
+        `ordem` de ORDENS_CLIENTES). Todas as correspondências entram na
+        ordenação; `limite` e `deslocamento` escolhem a página (padrão: todas)."""
+        filtro = self.filtro_busca_clientes(termo)
+        if filtro is None:
+            return []
+        origem, params, relevancia = filtro
+        
+        if ordem is None:
+            ordenacao = f"{relevancia}, c.id"
+        else:
+            coluna, _indice, direcao = self.ORDENS_CLIENTES[ordem]
+            if decrescente is not None:
+                direcao = 'DESC' if decrescente else 'ASC'
+            ordenacao = f"c.{coluna} {direcao}, c.id {direcao}"
+        
+        self.cursor.execute(
+            f"SELECT c.* FROM {origem} ORDER BY {ordenacao} LIMIT ? OFFSET ?",
+            params + [-1 if limite is None else limite, deslocamento]
+        )
         return self.cursor.fetchall()
     
+    def buscar_clientes_pagina(self, termo, apos=None, limite=200, ordem=None, decrescente=None, deslocamento=0):
+        """Página da busca para a TreeviewVirtual. A relevância não serve de
+        chave de keyset, então as páginas vêm sempre por deslocamento.
+        Retorna (linhas, None)."""
+        return self.buscar_clientes(termo, limite, deslocamento, ordem, decrescente), None
+    
+    def contar_busca_clientes(self, termo):
+        """Total de clientes encontrados pela busca (sem limite)"""
+        filtro = self.filtro_busca_clientes(termo)
+        if filtro is None:
+            return 0
+        origem, params, _relevancia = filtro
+        self.cursor.execute(f"SELECT COUNT(*) FROM {origem}", params)
+        return self.cursor.fetchone()[0]
+    
+    @escrita('clientes')
     def atualizar_cliente(self, cliente_id, **kwargs):
         if not kwargs:
             return
         
+        if 'telefone' in kwargs:
+            # A chave só é recalculada se o número mudou: um telefone repetido
+            # da migração (sem telefone_norm) pode ter outros campos editados
+            # sem esbarrar no índice único
+            self.cursor.execute("SELECT telefone FROM clientes WHERE id = ?", (cliente_id,))
+            atual = self.cursor.fetchone()
+            norm = normalizar_telefone(kwargs['telefone']) or None
+            if atual is None or norm != (normalizar_telefone(atual[0]) or None):
+                kwargs['telefone_norm'] = norm
+        
         set_clause = ', '.join([f"{k} = ?" for k in kwargs.keys()])
         values = list(kwargs.values())
         values.append(cliente_id)
@@ -253,11 +896,45 @@ class Database:
         self.cursor.execute(query, values)
         self.conn.commit()
     
+    @escrita('clientes')
     def excluir_cliente(self, cliente_id):
         self.cursor.execute("DELETE FROM clientes WHERE id = ?", (cliente_id,))
         self.conn.commit()
     
+    def obter_historico_cliente(self, cliente_id):
+        """Compras do cliente, da mais recente para a mais antiga: as do
+        banco e depois as dos meses arquivados"""
+        self.cursor.execute('''
+            SELECT v.data_venda, v.tipo, 
+                   CASE WHEN v.tipo = 'servico' THEN s.nome ELSE p.nome END as item_nome,
+                   v.quantidade, v.valor_total, v.forma_pagamento
+            FROM vendas v
+            LEFT JOIN servicos s ON v.tipo = 'servico' AND v.item_id = s.id
+            LEFT JOIN produtos p ON v.tipo = 'produto' AND v.item_id = p.id
+            WHERE v.cliente_id = ?
+            ORDER BY v.data_venda DESC
+        ''', (cliente_id,))
+        historico = self.cursor.fetchall()
+        
+        arquivos = self.obter_arquivos_historico('vendas', '0001-01-01', '9999-12-31')
+        if not arquivos:
+            return historico
+        
+        # Nomes das tabelas atuais, como no JOIN acima
+        self.cursor.execute(
+            "SELECT 'servico', id, nome FROM servicos UNION ALL SELECT 'produto', id, nome FROM produtos"
+        )
+        itens = {(tipo, item_id): nome for tipo, item_id, nome in self.cursor.fetchall()}
+        colunas = ['data_venda', 'tipo', 'item_id', 'quantidade', 'valor_total', 'forma_pagamento', 'cliente_id']
+        for arquivo in arquivos:
+            quadro = self.historico.ler(arquivo, 'vendas', colunas)
+            quadro = quadro[quadro['cliente_id'].eq(cliente_id).fillna(False)]
+            for data, tipo, item_id, *valores, _cliente in ArquivoHistorico.linhas(quadro):
+                historico.append((data, tipo, itens.get((tipo, item_id)), *valores))
+        return historico
+    
     # ========== AGENDAMENTOS ==========
+    @escrita('agendamentos')
     def adicionar_agendamento(self, cliente_id, servico_id, data, hora, profissional, valor, observacoes=""):
         self.cursor.execute(
             """INSERT INTO agendamentos 
@@ -269,6 +946,7 @@ class Database:
         return self.cursor.lastrowid
     
     def obter_agendamentos_do_dia(self, data=None):
+        """Agendamentos do dia, do banco ou do histórico se o mês foi arquivado"""
         if data is None:
             data = datetime.now().strftime("%Y-%m-%d")
         
@@ -280,191 +958,2250 @@ class Database:
             WHERE a.data = ?
             ORDER BY a.hora
         ''', (data,))
-        return self.cursor.fetchall()
+        agendamentos = self.cursor.fetchall()
+        
+        arquivados = self.obter_agendamentos_arquivados(data, data)
+        if arquivados:
+            agendamentos = sorted(agendamentos + arquivados, key=lambda ag: (ag[4], ag[0]))
+        return agendamentos
+    
+    def obter_agendamentos_arquivados(self, data_inicio, data_fim):
+        """Agendamentos do histórico no período, com as colunas de
+        obter_agendamentos_do_dia (nomes e telefone vêm das tabelas atuais)"""
+        quadro = self.ler_historico('agendamentos', data_inicio, data_fim)
+        if quadro is None or quadro.empty:
+            return []
+        
+        linhas = list(ArquivoHistorico.linhas(quadro))
+        clientes = {
+            cliente_id: (nome, telefone) for cliente_id, nome, telefone in
+            self.consultar_por_ids("SELECT id, nome, telefone FROM clientes", {linha[1] for linha in linhas})
+        }
+        servicos = dict(self.iterar_consulta("SELECT id, nome FROM servicos"))
+        agendamentos = [
+            (*linha, *clientes.get(linha[1], (None, None)), servicos.get(linha[2]))
+            for linha in linhas
+        ]
+        agendamentos.sort(key=lambda ag: (ag[3], ag[4], ag[0]))
+        return agendamentos
+    
+    def obter_agendamento(self, agendamento_id):
+        """Um agendamento, com as mesmas colunas de obter_agendamentos_do_dia.
+        Só lê o banco: os agendamentos arquivados não mudam mais de status"""
+        self.cursor.execute('''
+            SELECT a.*, c.nome as cliente_nome, c.telefone, s.nome as servico_nome 
+            FROM agendamentos a
+            LEFT JOIN clientes c ON a.cliente_id = c.id
+            LEFT JOIN servicos s ON a.servico_id = s.id
+            WHERE a.id = ?
+        ''', (agendamento_id,))
+        return self.cursor.fetchone()
+    
+    # Ordenações de obter_agendamentos_periodo_pagina: (colunas, índices na
+    # linha, direção padrão). Colunas que aceitam nulo vão com COALESCE para
+    # o keyset sempre comparar valores
+    ORDENS_AGENDAMENTOS = {
+        'hora': (('a.data', 'a.hora'), (3, 4), 'ASC'),
+        'cliente_nome': (("COALESCE(c.nome, '')",), (11,), 'ASC'),
+        'telefone': (("COALESCE(c.telefone, '')",), (12,), 'ASC'),
+        'servico_nome': (("COALESCE(s.nome, '')",), (13,), 'ASC'),
+        'profissional': (("COALESCE(a.profissional, '')",), (5,), 'ASC'),
+        'valor': (('a.valor',), (7,), 'DESC'),
+        'status': (("COALESCE(a.status, '')",), (6,), 'ASC'),
+    }
+    
+    def obter_agendamentos_periodo_pagina(self, data_inicio, data_fim, apos=None, limite=200,
+                                         ordem='hora', decrescente=None, deslocamento=0):
+        """Página de agendamentos do período (banco e histórico) por keyset
+        (colunas da ordem, id), com as colunas de obter_agendamentos_do_dia;
+        por padrão por data e hora. Sem `apos`, a página começa em
+        `deslocamento`. Retorna (linhas, proxima_chave)."""
+        colunas, indices, direcao = self.ORDENS_AGENDAMENTOS[ordem]
+        if decrescente is not None:
+            direcao = 'DESC' if decrescente else 'ASC'
+        comparacao = '>' if direcao == 'ASC' else '<'
+        
+        def chave(ag):
+            return (*('' if ag[i] is None else ag[i] for i in indices), ag[0])
+        
+        arquivados = self.obter_agendamentos_arquivados(data_inicio, data_fim)
+        if apos is not None:
+            apos = tuple(apos)
+            arquivados = [ag for ag in arquivados if (chave(ag) > apos if direcao == 'ASC' else chave(ag) < apos)]
+        
+        query = '''
+            SELECT a.*, c.nome as cliente_nome, c.telefone, s.nome as servico_nome 
+            FROM agendamentos a
+            LEFT JOIN clientes c ON a.cliente_id = c.id
+            LEFT JOIN servicos s ON a.servico_id = s.id
+            WHERE a.data BETWEEN ? AND ?
+        '''
+        params = [data_inicio, data_fim]
+        if apos is not None:
+            query += f" AND ({', '.join(colunas)}, a.id) {comparacao} ({', '.join('?' * len(apos))})"
+            params.extend(apos)
+            deslocamento = 0
+        query += " ORDER BY " + ', '.join(f"{coluna} {direcao}" for coluna in (*colunas, 'a.id'))
+        if arquivados:
+            # O deslocamento vale para as duas fontes juntas: a junção é feita aqui
+            query += " LIMIT ?"
+            params.append(limite + deslocamento)
+        else:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limite, deslocamento])
+        
+        self.cursor.execute(query, params)
+        linhas = self.cursor.fetchall()
+        if arquivados:
+            linhas = sorted(linhas + arquivados, key=chave, reverse=direcao == 'DESC')
+            linhas = linhas[deslocamento:deslocamento + limite]
+        return linhas, chave(linhas[-1]) if len(linhas) == limite else None
+    
+    def contar_agendamentos_periodo(self, data_inicio, data_fim):
+        """Agendamentos do período, no banco e no histórico"""
+        self.cursor.execute(
+            "SELECT COUNT(*) FROM agendamentos WHERE data BETWEEN ? AND ?",
+            (data_inicio, data_fim)
+        )
+        total = self.cursor.fetchone()[0]
+        arquivados = self.ler_historico('agendamentos', data_inicio, data_fim, ['id'])
+        return total + (len(arquivados) if arquivados is not None else 0)
+    
+    @escrita('agendamentos')
+    def atualizar_status_agendamento(self, agendamento_id, status, status_atual=None):
+        """Muda o status e devolve o agendamento atualizado. Com status_atual,
+        só altera se o agendamento ainda estiver nesse status; devolve None
+        se nada foi alterado (agendamento excluído ou mudado por outro)"""
+        query = "UPDATE agendamentos SET status = ? WHERE id = ?"
+        params = [status, agendamento_id]
+        if status_atual is not None:
+            query += " AND status = ?"
+            params.append(status_atual)
+        
+        self.cursor.execute(query, params)
+        alterado = self.cursor.rowcount > 0
+        self.conn.commit()
+        return self.obter_agendamento(agendamento_id) if alterado else None
+    
+    @escrita('agendamentos')
+    def excluir_agendamento(self, agendamento_id):
+        """EXCLUI agendamento pelo ID; retorna False se ele já não existia"""
+        self.cursor.execute("DELETE FROM agendamentos WHERE id = ?", (agendamento_id,))
+        excluido = self.cursor.rowcount > 0
+        self.conn.commit()
+        return excluido
+    
+    # ========== VENDAS ==========
+    @escrita('vendas', 'clientes', 'produtos')
+    def registrar_venda_lote(self, cliente_id, itens, forma_pagamento):
+        """Registra todos os itens de uma venda em uma única transação"""
+        linhas = [
+            (cliente_id, item['tipo'], item['id'], item['quantidade'], item['valor_unitario'],
+             item['valor_unitario'] * item['quantidade'], forma_pagamento)
+            for item in itens
+        ]
+        baixas_estoque = [
+            (item['quantidade'], item['id'])
+            for item in itens if item['tipo'] == 'produto'
+        ]
+        total = sum(linha[5] for linha in linhas)
+        
+        try:
+            self.cursor.executemany(
+                """INSERT INTO vendas 
+                   (cliente_id, tipo, item_id, quantidade, valor_unitario, valor_total, forma_pagamento) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                linhas
+            )
+            
+            if baixas_estoque:
+                self.cursor.executemany(
+                    "UPDATE produtos SET estoque = estoque - ? WHERE id = ?",
+                    baixas_estoque
+                )
+            
+            if cliente_id:
+                self.cursor.execute(
+                    "UPDATE clientes SET total_gasto = total_gasto + ?, total_visitas = total_visitas + 1 WHERE id = ?",
+                    (total, cliente_id)
+                )
+            
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        
+        return total
+    
+    # Ordenações da paginação de vendas: (coluna, índice na linha, direção)
+    ORDENS_VENDAS = {
+        'data_venda': ('v.data_venda', 8, 'DESC'),
+        'tipo': ('v.tipo', 2, 'ASC'),
+        'quantidade': ('v.quantidade', 4, 'DESC'),
+        'valor_total': ('v.valor_total', 6, 'DESC'),
+        'forma_pagamento': ('v.forma_pagamento', 7, 'ASC'),
+    }
+    
+    def obter_vendas_periodo_pagina(self, data_inicio, data_fim, apos=None, limite=200,
+                                    ordem='data_venda', decrescente=None, deslocamento=0):
+        """Página de vendas do período por keyset (coluna da ordem, id); por
+        padrão da mais recente para a mais antiga. Sem `apos`, a página
+        começa em `deslocamento`. Retorna (linhas, proxima_chave)."""
+        coluna, indice, direcao = self.ORDENS_VENDAS[ordem]
+        if decrescente is not None:
+            direcao = 'DESC' if decrescente else 'ASC'
+        comparacao = '>' if direcao == 'ASC' else '<'
+        
+        query = '''
+            SELECT v.*, 
+                   CASE WHEN v.tipo = 'servico' THEN s.nome ELSE p.nome END as item_nome,
+                   c.nome as cliente_nome
+            FROM vendas v
+            LEFT JOIN clientes c ON v.cliente_id = c.id
+            LEFT JOIN servicos s ON v.tipo = 'servico' AND v.item_id = s.id
+            LEFT JOIN produtos p ON v.tipo = 'produto' AND v.item_id = p.id
+            WHERE v.data_venda >= ? AND v.data_venda < date(?, '+1 day')
+        '''
+        params = [data_inicio, data_fim]
+        if apos is not None:
+            query += f" AND ({coluna}, v.id) {comparacao} (?, ?)"
+            params.extend(apos)
+        query += f" ORDER BY {coluna} {direcao}, v.id {direcao} LIMIT ?"
+        params.append(limite)
+        if apos is None and deslocamento:
+            query += " OFFSET ?"
+            params.append(deslocamento)
+        
+        self.cursor.execute(query, params)
+        linhas = self.cursor.fetchall()
+        return linhas, self.chave_keyset(linhas, limite, indice, 0)
+    
+    def contar_vendas_periodo(self, data_inicio, data_fim):
+        self.cursor.execute('''
+            SELECT COALESCE(SUM(quantidade_vendas), 0) 
+            FROM vendas_diarias 
+            WHERE dia BETWEEN ? AND ?
+        ''', (data_inicio, data_fim))
+        return self.cursor.fetchone()[0]
+    
+    def obter_total_vendas_periodo(self, data_inicio, data_fim):
+        self.cursor.execute('''
+            SELECT COALESCE(SUM(valor_total), 0) 
+            FROM vendas_diarias 
+            WHERE dia BETWEEN ? AND ?
+        ''', (data_inicio, data_fim))
+        return self.cursor.fetchone()[0] or 0
+    
+    def obter_vendas_diarias(self, data_inicio, data_fim):
+        """Total vendido por dia no período: {'AAAA-MM-DD': total}"""
+        self.cursor.execute('''
+            SELECT dia, SUM(valor_total)
+            FROM vendas_diarias 
+            WHERE dia BETWEEN ? AND ?
+            GROUP BY dia
+        ''', (data_inicio, data_fim))
+        return dict(self.cursor.fetchall())
+    
+    # ========== DESPESAS ==========
+    @escrita('despesas')
+    def adicionar_despesa(self, descricao, categoria, valor, data, forma_pagamento="", observacoes=""):
+        self.cursor.execute(
+            """INSERT INTO despesas (descricao, categoria, valor, data, forma_pagamento, observacoes)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (descricao, categoria, valor, data, forma_pagamento, observacoes)
+        )
+        self.conn.commit()
+        return self.cursor.lastrowid
+    
+    # ========== CAIXA ==========
+    @escrita('caixa')
+    def abrir_caixa(self, valor_inicial):
+        hoje = datetime.now().strftime("%Y-%m-%d")
+        self.cursor.execute(
+            "INSERT INTO caixa (data, valor_inicial, status) VALUES (?, ?, 'aberto')",
+            (hoje, valor_inicial)
+        )
+        self.conn.commit()
+        return self.cursor.lastrowid
+    
+    @escrita('caixa')
+    def fechar_caixa(self, valor_final):
+        hoje = datetime.now().strftime("%Y-%m-%d")
+        self.cursor.execute(
+            """UPDATE caixa 
+               SET valor_final = ?, status = 'fechado', data_fechamento = datetime('now', 'localtime')
+               WHERE data = ? AND status = 'aberto'""",
+            (valor_final, hoje)
+        )
+        self.conn.commit()
+    
+    def caixa_esta_aberto(self):
+        hoje = datetime.now().strftime("%Y-%m-%d")
+        self.cursor.execute(
+            "SELECT COUNT(*) FROM caixa WHERE data = ? AND status = 'aberto'",
+            (hoje,)
+        )
+        return self.cursor.fetchone()[0] > 0
+    
+    def obter_caixa_hoje(self):
+        hoje = datetime.now().strftime("%Y-%m-%d")
+        self.cursor.execute(
+            "SELECT * FROM caixa WHERE data = ?",
+            (hoje,)
+        )
+        return self.cursor.fetchone()
+    
+    # ========== EXPORTAÇÃO ==========
+    def iterar_consulta(self, sql, params=(), bloco=2000):
+        """Entrega as linhas da consulta aos poucos (fetchmany), sem montar
+        a lista inteira; usa um cursor próprio, fechado ao final"""
+        cursor = self.novo_cursor()
+        try:
+            cursor.execute(sql, params)
+            while True:
+                linhas = cursor.fetchmany(bloco)
+                if not linhas:
+                    break
+                yield from linhas
+        finally:
+            cursor.close()
+    
+    def iterar_quadros(self, sql, params=(), bloco=2000, dtype=None):
+        """A consulta em DataFrames de até `bloco` linhas (fetchmany em um
+        cursor próprio, medido pelo ProfilerConsultas). Sem linhas, entrega
+        um DataFrame vazio com as colunas"""
+        import pandas as pd
+        
+        cursor = self.novo_cursor()
+        try:
+            cursor.execute(sql, params)
+            colunas = [descricao[0] for descricao in cursor.description]
+            linhas = cursor.fetchmany(bloco)
+            while True:
+                yield pd.DataFrame.from_records(linhas, columns=colunas).astype(dtype or {})
+                linhas = cursor.fetchmany(bloco)
+                if not linhas:
+                    break
+        finally:
+            cursor.close()
+    
+    def consultar_por_ids(self, sql, ids, bloco=500):
+        """Linhas de `sql` (sem WHERE) com id entre os ids dados, em lotes de IN (...)"""
+        ids = sorted(i for i in ids if i is not None)
+        for inicio in range(0, len(ids), bloco):
+            lote = ids[inicio:inicio + bloco]
+            marcadores = ', '.join('?' * len(lote))
+            yield from self.iterar_consulta(f"{sql} WHERE id IN ({marcadores})", lote)
+    
+    # Colunas de iterar_vendas_exportacao
+    COLUNAS_EXPORTACAO_VENDAS = (
+        'ID', 'Data', 'Cliente_ID', 'Cliente_Nome', 'Tipo', 'Item_ID', 'Item_Nome',
+        'Quantidade', 'Valor_Unitario', 'Valor_Total', 'Forma_Pagamento',
+    )
+    
+    def iterar_vendas_exportacao(self, data_inicio, data_fim, bloco=2000):
+        """Vendas do período: as do banco e depois as do histórico, um mês
+        arquivado por vez"""
+        yield from self.iterar_consulta('''
+            SELECT v.id, v.data_venda, v.cliente_id, c.nome, v.tipo, v.item_id,
+                   COALESCE(CASE WHEN v.tipo = 'servico' THEN s.nome ELSE p.nome END, 'Item removido'),
+                   v.quantidade, v.valor_unitario, v.valor_total, v.forma_pagamento
+            FROM vendas v
+            LEFT JOIN clientes c ON v.cliente_id = c.id
+            LEFT JOIN servicos s ON v.tipo = 'servico' AND v.item_id = s.id
+            LEFT JOIN produtos p ON v.tipo = 'produto' AND v.item_id = p.id
+            WHERE v.data_venda >= ? AND v.data_venda < date(?, '+1 day')
+            ORDER BY v.data_venda DESC
+        ''', (data_inicio, data_fim), bloco)
+        
+        arquivos = self.obter_arquivos_historico('vendas', data_inicio, data_fim)
+        if not arquivos:
+            return
+        
+        # O histórico guarda só os ids: os nomes vêm das tabelas atuais, como no JOIN acima
+        clientes = dict(self.iterar_consulta("SELECT id, nome FROM clientes"))
+        itens = {
+            (tipo, item_id): nome for tipo, item_id, nome in self.iterar_consulta(
+                "SELECT 'servico', id, nome FROM servicos UNION ALL SELECT 'produto', id, nome FROM produtos"
+            )
+        }
+        for arquivo in arquivos:
+            quadro = self.historico.ler(arquivo, 'vendas', None, data_inicio, data_fim)
+            for venda_id, data, cliente_id, tipo, item_id, *valores in ArquivoHistorico.linhas(quadro):
+                yield (venda_id, data, cliente_id, clientes.get(cliente_id), tipo, item_id,
+                       itens.get((tipo, item_id), 'Item removido'), *valores)
+    
+    # Colunas de iterar_despesas_exportacao
+    COLUNAS_EXPORTACAO_DESPESAS = (
+        'ID', 'Descricao', 'Categoria', 'Valor', 'Data', 'Forma_Pagamento', 'Observacoes',
+    )
+    
+    def iterar_despesas_exportacao(self, data_inicio, data_fim, bloco=2000):
+        """Despesas do período: as do banco e depois as do histórico"""
+        yield from self.iterar_consulta('''
+            SELECT id, descricao, categoria, valor, data, forma_pagamento, observacoes
+            FROM despesas
+            WHERE data BETWEEN ? AND ?
+            ORDER BY data DESC
+        ''', (data_inicio, data_fim), bloco)
+        
+        for quadro in self.iterar_historico('despesas', data_inicio, data_fim):
+            yield from ArquivoHistorico.linhas(quadro)
+    
+    def contar_despesas_periodo(self, data_inicio, data_fim):
+        self.cursor.execute(
+            "SELECT COUNT(*) FROM despesas WHERE data BETWEEN ? AND ?",
+            (data_inicio, data_fim)
+        )
+        return self.cursor.fetchone()[0]
+    
+    # ========== HISTÓRICO ==========
+    # Meses mais recentes que nunca saem do banco (além do mês atual)
+    MESES_NO_BANCO = 12
+    
+    def meses_para_arquivar(self, tabela, meses_no_banco=None):
+        """Meses (AAAA-MM) com linhas da tabela no banco anteriores aos
+        últimos `meses_no_banco` meses fechados"""
+        if meses_no_banco is None:
+            meses_no_banco = self.MESES_NO_BANCO
+        hoje = datetime.now()
+        indice = hoje.year * 12 + hoje.month - 1 - meses_no_banco
+        limite = f"{indice // 12:04d}-{indice % 12 + 1:02d}-01"
+        
+        coluna = ArquivoHistorico.COLUNA_DATA[tabela]
+        self.cursor.execute(
+            f"SELECT DISTINCT substr({coluna}, 1, 7) FROM {tabela} WHERE {coluna} < ? ORDER BY 1",
+            (limite,)
+        )
+        return [linha[0] for linha in self.cursor.fetchall()]
+    
+    @escrita('vendas', 'despesas', 'agendamentos')
+    def arquivar_mes(self, tabela, mes):
+        """Move as linhas de `mes` (AAAA-MM) da tabela para um arquivo do
+        histórico e retorna quantas saíram do banco. O arquivo é gravado
+        antes de as linhas serem apagadas; se a transação falhar, ele é
+        descartado e o banco fica como estava. Os totais do mês em
+        vendas_diarias são mantidos: as vendas arquivadas continuam
+        contando nos relatórios."""
+        coluna = ArquivoHistorico.COLUNA_DATA[tabela]
+        colunas = ', '.join(ArquivoHistorico.COLUNAS[tabela])
+        filtro = f"{coluna} >= ? AND {coluna} < date(?, '+1 month')"
+        inicio = f"{mes}-01"
+        
+        # A transação já foi aberta pelo @escrita, com a trava de escrita do banco
+        arquivo = None
+        try:
+            self.cursor.execute(
+                f"SELECT {colunas} FROM {tabela} WHERE {filtro} ORDER BY {coluna}", (inicio, inicio)
+            )
+            linhas = self.cursor.fetchall()
+            if not linhas:
+                self.conn.rollback()
+                return 0
+            
+            arquivo = self.historico.gravar(tabela, mes, linhas)
+            self.cursor.execute(
+                "INSERT INTO arquivos_historico (arquivo, tabela, mes, linhas) VALUES (?, ?, ?, ?)",
+                (arquivo, tabela, mes, len(linhas))
+            )
+            
+            # O trigger de DELETE subtrai as vendas apagadas de vendas_diarias;
+            # os totais do mês lidos antes voltam na mesma transação
+            totais_diarios = []
+            if tabela == 'vendas':
+                self.cursor.execute(
+                    "SELECT * FROM vendas_diarias WHERE dia >= ? AND dia < date(?, '+1 month')",
+                    (inicio, inicio)
+                )
+                totais_diarios = self.cursor.fetchall()
+            
+            self.cursor.execute(f"DELETE FROM {tabela} WHERE {filtro}", (inicio, inicio))
+            self.cursor.executemany('''
+                INSERT OR REPLACE INTO vendas_diarias
+                    (dia, tipo, forma_pagamento, quantidade_vendas, quantidade_itens, valor_total)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', totais_diarios)
+            self.cursor.execute("UPDATE arquivos_historico SET concluido = 1 WHERE arquivo = ?", (arquivo,))
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            if arquivo:
+                self.historico.apagar(arquivo)
+            raise
+        return len(linhas)
+    
+    def arquivar_historico(self, meses_no_banco=None):
+        """Arquiva, mês a mês, todos os meses fechados de vendas, despesas e
+        agendamentos fora dos últimos `meses_no_banco`. Retorna as linhas
+        movidas por tabela."""
+        movidas = {}
+        for tabela in ArquivoHistorico.COLUNAS:
+            for mes in self.meses_para_arquivar(tabela, meses_no_banco):
+                movidas[tabela] = movidas.get(tabela, 0) + self.arquivar_mes(tabela, mes)
+        return movidas
+    
+    def obter_arquivos_historico(self, tabela, data_inicio, data_fim):
+        """Arquivos da tabela com meses dentro do período, do mais recente ao mais antigo"""
+        self.cursor.execute('''
+            SELECT arquivo FROM arquivos_historico
+            WHERE tabela = ? AND concluido = 1
+              AND mes BETWEEN substr(?, 1, 7) AND substr(?, 1, 7)
+            ORDER BY mes DESC, arquivo DESC
+        ''', (tabela, data_inicio, data_fim))
+        return [linha[0] for linha in self.cursor.fetchall()]
+    
+    def contar_historico(self, tabela, data_inicio, data_fim):
+        """Linhas arquivadas dos meses do período (conta os meses inteiros;
+        serve para estimar o progresso das exportações)"""
+        self.cursor.execute('''
+            SELECT COALESCE(SUM(linhas), 0) FROM arquivos_historico
+            WHERE tabela = ? AND concluido = 1
+              AND mes BETWEEN substr(?, 1, 7) AND substr(?, 1, 7)
+        ''', (tabela, data_inicio, data_fim))
+        return self.cursor.fetchone()[0]
+    
+    def iterar_historico(self, tabela, data_inicio, data_fim, colunas=None):
+        """DataFrames com as linhas arquivadas do período, um arquivo por vez,
+        do mais recente ao mais antigo"""
+        for arquivo in self.obter_arquivos_historico(tabela, data_inicio, data_fim):
+            yield self.historico.ler(arquivo, tabela, colunas, data_inicio, data_fim)
+    
+    def ler_historico(self, tabela, data_inicio, data_fim, colunas=None):
+        """Linhas arquivadas do período em um DataFrame, ou None se nenhum
+        mês do período está no histórico"""
+        quadros = list(self.iterar_historico(tabela, data_inicio, data_fim, colunas))
+        if not quadros:
+            return None
+        import pandas as pd
+        return pd.concat(quadros, ignore_index=True)
+    
+    @relatorio('vendas', 'despesas', 'agendamentos', 'clientes', 'servicos', 'produtos', limite=4)
+    def obter_analise_periodo(self, data_inicio, data_fim):
+        """AnalisePeriodo do período (banco e histórico), reaproveitada entre
+        as abas dos relatórios enquanto as tabelas dela não mudarem"""
+        return AnalisePeriodo.carregar(self, data_inicio, data_fim)
+    
+    # ========== DASHBOARD ==========
+    @contextmanager
+    def transacao_leitura(self):
+        """Consultas dentro do bloco veem o mesmo estado do banco"""
+        # Na conexão de escrita, a trava impede que uma escrita de outra
+        # thread caia dentro desta transação
+        with nullcontext() if self.somente_leitura else self.trava_escrita:
+            self.cursor.execute("BEGIN")
+            try:
+                yield
+            finally:
+                self.cursor.execute("COMMIT")
+    
+    # Partes de obter_snapshot_dashboard
+    PARTES_SNAPSHOT = ('agendamentos', 'metricas', 'estoque_baixo', 'vendas_semana')
+    
+    def obter_snapshot_dashboard(self, data=None, partes=None, limite_estoque=5):
+        """Dados do dashboard do dia `data`, lidos em uma única transação:
+        
+        agendamentos: agendamentos do dia (como obter_agendamentos_do_dia)
+        metricas: agendamentos pendentes, clientes novos, total vendido e
+            produtos com estoque baixo
+        estoque_baixo: (até limite_estoque produtos com estoque baixo, total)
+        vendas_semana: total vendido por dia nos 7 dias até `data`
+        
+        `partes` limita o que é lido (padrão: tudo).
+        """
+        if data is None:
+            data = datetime.now().strftime("%Y-%m-%d")
+        partes = self.PARTES_SNAPSHOT if partes is None else partes
+        snapshot = {}
+        
+        with self.transacao_leitura():
+            if 'agendamentos' in partes:
+                snapshot['agendamentos'] = self.obter_agendamentos_do_dia(data)
+            
+            if 'metricas' in partes:
+                self.cursor.execute('''
+                    SELECT
+                        (SELECT COUNT(*) FROM agendamentos
+                         WHERE data = ? AND status = 'agendado'),
+                        (SELECT COUNT(*) FROM clientes
+                         WHERE data_cadastro >= ? AND data_cadastro < date(?, '+1 day')),
+                        (SELECT COALESCE(SUM(valor_total), 0) FROM vendas_diarias WHERE dia = ?),
+                        (SELECT COUNT(*) FROM produtos
+                         WHERE ativo = 1 AND estoque <= estoque_minimo)
+                ''', (data, data, data, data))
+                pendentes, clientes_novos, vendas, baixo_estoque = self.cursor.fetchone()
+                snapshot['metricas'] = {
+                    'agendamentos': pendentes,
+                    'clientes_novos': clientes_novos,
+                    'vendas_hoje': vendas,
+                    'baixo_estoque': baixo_estoque,
+                }
+            
+            if 'estoque_baixo' in partes:
+                # COUNT(*) OVER () traz o total junto com a primeira página
+                self.cursor.execute('''
+                    SELECT *, COUNT(*) OVER ()
+                    FROM produtos
+                    WHERE ativo = 1 AND estoque <= estoque_minimo
+                    ORDER BY nome
+                    LIMIT ?
+                ''', (limite_estoque,))
+                linhas = self.cursor.fetchall()
+                total = linhas[0][-1] if linhas else 0
+                snapshot['estoque_baixo'] = ([linha[:-1] for linha in linhas], total)
+            
+            if 'vendas_semana' in partes:
+                inicio = (datetime.strptime(data, "%Y-%m-%d") - timedelta(days=6)).strftime("%Y-%m-%d")
+                snapshot['vendas_semana'] = self.obter_vendas_diarias(inicio, data)
+        
+        return snapshot
+    
+    def fazer_backup(self, arquivo):
+        """Copia o banco com a API de backup do SQLite (inclui o que ainda está no WAL)"""
+        destino = sqlite3.connect(arquivo)
+        try:
+            with self.trava_escrita:
+                self.conn.backup(destino)
+        finally:
+            destino.close()
+    
+    def fechar(self):
+        self.conn.close()
+
+# =============================================================
+# ARQUIVO HISTÓRICO (MESES FECHADOS FORA DO BANCO)
+# =============================================================
+class ArquivoHistorico:
+    """Arquivos colunares com meses fechados de vendas, despesas e agendamentos.
+    
+    Cada arquivamento de uma tabela/mês vira um arquivo em `pasta`
+    (vendas_2024-03_<momento>.parquet), registrado pelo Database em
+    arquivos_historico. Com pyarrow instalado o formato é Parquet; sem ele,
+    um .npz comprimido do NumPy, com uma matriz por coluna (e uma máscara
+    das colunas com nulos). Nos dois formatos a leitura carrega só as
+    colunas pedidas. Os arquivos nunca são alterados depois de gravados.
+    """
+    
+    # Colunas guardadas de cada tabela, com o tipo delas no DataFrame
+    COLUNAS = {
+        'vendas': {
+            'id': 'Int64', 'data_venda': 'object', 'cliente_id': 'Int64', 'tipo': 'object',
+            'item_id': 'Int64', 'quantidade': 'Int64', 'valor_unitario': 'float64',
+            'valor_total': 'float64', 'forma_pagamento': 'object',
+        },
+        'despesas': {
+            'id': 'Int64', 'descricao': 'object', 'categoria': 'object', 'valor': 'float64',
+            'data': 'object', 'forma_pagamento': 'object', 'observacoes': 'object',
+        },
+        'agendamentos': {
+            'id': 'Int64', 'cliente_id': 'Int64', 'servico_id': 'Int64', 'data': 'object',
+            'hora': 'object', 'profissional': 'object', 'status': 'object', 'valor': 'float64',
+            'pago': 'Int64', 'observacoes': 'object', 'data_criacao': 'object',
+        },
+    }
+    
+    # Coluna de data que separa os meses
+    COLUNA_DATA = {'vendas': 'data_venda', 'despesas': 'data', 'agendamentos': 'data'}
+    
+    def __init__(self, pasta):
+        self.pasta = Path(pasta)
+    
+    @staticmethod
+    def extensao():
+        return '.parquet' if importlib.util.find_spec('pyarrow') else '.npz'
+    
+    def gravar(self, tabela, mes, linhas):
+        """Grava as linhas (tuplas na ordem de COLUNAS[tabela]) e retorna o nome do arquivo"""
+        import pandas as pd
+        
+        tipos = self.COLUNAS[tabela]
+        quadro = pd.DataFrame.from_records(linhas, columns=list(tipos)).astype(tipos)
+        
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        arquivo = f"{tabela}_{mes}_{datetime.now():%Y%m%d%H%M%S%f}{self.extensao()}"
+        # Grava com outro nome e renomeia: um arquivo com o nome final está sempre completo
+        temporario = self.pasta / f"{arquivo}.tmp"
+        try:
+            if arquivo.endswith('.parquet'):
+                quadro.to_parquet(temporario, index=False, compression='zstd')
+            else:
+                self._gravar_npz(temporario, quadro)
+            os.replace(temporario, self.pasta / arquivo)
+        except BaseException:
+            temporario.unlink(missing_ok=True)
+            raise
+        return arquivo
+    
+    @staticmethod
+    def _gravar_npz(caminho, quadro):
+        import numpy as np
+        
+        matrizes = {}
+        for coluna, serie in quadro.items():
+            nulos = serie.isna().to_numpy()
+            if nulos.any():
+                matrizes[f"{coluna}__nulos"] = nulos
+            if serie.dtype == object:
+                # Texto como unicode de tamanho fixo: o .npz não precisa de pickle
+                matrizes[coluna] = serie.fillna('').to_numpy(dtype=str)
+            elif serie.dtype == 'Int64':
+                matrizes[coluna] = serie.fillna(0).to_numpy(dtype='int64')
+            else:
+                matrizes[coluna] = serie.to_numpy()
+        
+        with open(caminho, 'wb') as saida:
+            np.savez_compressed(saida, **matrizes)
+    
+    def ler(self, arquivo, tabela, colunas=None, data_inicio=None, data_fim=None):
+        """Lê as colunas pedidas (padrão: todas) de um arquivo, só com as
+        linhas entre data_inicio e data_fim (dias inteiros), da mais recente
+        para a mais antiga"""
+        import pandas as pd
+        
+        tipos = self.COLUNAS[tabela]
+        colunas = list(colunas or tipos)
+        coluna_data = self.COLUNA_DATA[tabela]
+        lidas = colunas if coluna_data in colunas else colunas + [coluna_data]
+        
+        caminho = self.pasta / arquivo
+        if caminho.suffix == '.parquet':
+            quadro = pd.read_parquet(caminho, columns=lidas)
+        else:
+            quadro = self._ler_npz(caminho, lidas, tipos)
+        
+        datas = quadro[coluna_data]
+        if data_inicio:
+            quadro = quadro[datas >= data_inicio]
+        if data_fim:
+            quadro = quadro[datas.loc[quadro.index].str.slice(0, 10) <= data_fim]
+        return quadro.sort_values(coluna_data, ascending=False, ignore_index=True)[colunas]
+    
+    @staticmethod
+    def _ler_npz(caminho, colunas, tipos):
+        import numpy as np
+        import pandas as pd
+        
+        series = {}
+        with np.load(caminho) as dados:
+            for coluna in colunas:
+                serie = pd.Series(dados[coluna]).astype(tipos[coluna])
+                if f"{coluna}__nulos" in dados.files:
+                    serie = serie.mask(dados[f"{coluna}__nulos"])
+                series[coluna] = serie
+        return pd.DataFrame(series, columns=colunas)
+    
+    def apagar(self, arquivo):
+        (self.pasta / arquivo).unlink(missing_ok=True)
+    
+    @staticmethod
+    def linhas(quadro):
+        """Tuplas do DataFrame lido, com None no lugar dos nulos (como as do sqlite3)"""
+        return quadro.astype(object).where(quadro.notna(), None).itertuples(index=False, name=None)
+
+# =============================================================
+# GERENCIADOR DE CONEXÕES
+# =============================================================
+class GerenciadorConexoes:
+    """Conexões do processo com o barbearia.db.
+    
+    Abre uma única conexão de escrita (que cria/migra o schema uma vez)
+    e até `leitores` conexões somente leitura para o ExecutorBanco, além
+    das conexões do MonitorAlteracoes e da FilaExportacoes.
+    LoginWindow e BarbeariaApp compartilham o mesmo gerenciador.
+    """
+    
+    _instancia = None
+    _trava_instancia = threading.Lock()
+    
+    def __init__(self, caminho='barbearia.db', leitores=3):
+        self.caminho = caminho
+        self.leitores = leitores
+        self.db = Database(caminho)
+        self._conexoes_leitura = []
+        self._conexoes_exportacao = []
+        self._monitor = None
+        self._trava = threading.Lock()
+    
+    @classmethod
+    def obter(cls):
+        with cls._trava_instancia:
+            if cls._instancia is None:
+                cls._instancia = cls()
+            return cls._instancia
+    
+    @classmethod
+    def encerrar(cls):
+        """Fecha todas as conexões abertas (pode ser chamado mais de uma vez)"""
+        with cls._trava_instancia:
+            if cls._instancia is not None:
+                cls._instancia.fechar()
+                cls._instancia = None
+    
+    def abrir_leitura(self):
+        with self._trava:
+            if len(self._conexoes_leitura) >= self.leitores:
+                raise RuntimeError("Limite de conexões de leitura atingido")
+            db = Database(self.caminho, somente_leitura=True)
+            self._conexoes_leitura.append(db)
+            return db
+    
+    def abrir_monitor(self):
+        """Conexão somente leitura do MonitorAlteracoes (fora do limite dos leitores)"""
+        with self._trava:
+            if self._monitor is None:
+                self._monitor = Database(self.caminho, somente_leitura=True)
+            return self._monitor
+    
+    def abrir_exportacao(self):
+        """Conexão somente leitura de uma thread da FilaExportacoes (fora do
+        limite dos leitores, que o pool da fila já limita)"""
+        with self._trava:
+            db = Database(self.caminho, somente_leitura=True)
+            self._conexoes_exportacao.append(db)
+            return db
+    
+    def fechar(self):
+        with self._trava:
+            for db in self._conexoes_leitura + self._conexoes_exportacao:
+                db.fechar()
+            self._conexoes_leitura.clear()
+            self._conexoes_exportacao.clear()
+            if self._monitor is not None:
+                self._monitor.fechar()
+                self._monitor = None
+        self.db.fechar()
+
+# =============================================================
+# PROFILER DE CONSULTAS (OPCIONAL)
+# =============================================================
+class ProfilerConsultas:
+    """Mede as consultas feitas pelos cursores do Database.
+    
+    Desligado por padrão; é ativado com a variável de ambiente
+    BARBEARIA_PROFILER=1. Registra tempo, linhas retornadas e a ação da
+    interface que disparou cada consulta. Consultas acima de
+    BARBEARIA_PROFILER_LIMITE_MS (padrão 50 ms) vão, com o EXPLAIN QUERY
+    PLAN, para o log rotativo consultas_lentas.log. Ao sair, imprime as
+    consultas que mais somaram tempo.
+    """
+    
+    _instancia = None
+    _verificado = False
+    _trava_instancia = threading.Lock()
+    
+    # Comandos que aceitam EXPLAIN QUERY PLAN de forma útil
+    COMANDOS_COM_PLANO = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+    
+    def __init__(self, limite_ms=50, arquivo_log='consultas_lentas.log', top=15):
+        self.limite_ms = limite_ms
+        self.top = top
+        self.estatisticas = {}
+        self._trava = threading.Lock()
+        self._local = threading.local()
+        
+        self.log = logging.getLogger('barbearia.consultas_lentas')
+        self.log.setLevel(logging.INFO)
+        self.log.propagate = False
+        handler = RotatingFileHandler(arquivo_log, maxBytes=1_000_000, backupCount=3, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        self.log.addHandler(handler)
+    
+    @classmethod
+    def ativo(cls):
+        """O profiler do processo, ou None se não foi ativado"""
+        if not cls._verificado:
+            with cls._trava_instancia:
+                if not cls._verificado:
+                    if os.environ.get('BARBEARIA_PROFILER', '') not in ('', '0'):
+                        limite = float(os.environ.get('BARBEARIA_PROFILER_LIMITE_MS', 50))
+                        cls._instancia = cls(limite_ms=limite)
+                    cls._verificado = True
+        return cls._instancia
+    
+    @classmethod
+    def encerrar(cls):
+        """Imprime e registra o resumo (nada acontece se estiver desligado)"""
+        profiler = cls._instancia
+        if profiler is None:
+            return
+        resumo = profiler.resumo()
+        print(resumo)
+        profiler.log.info("RESUMO\n%s", resumo)
+        for handler in profiler.log.handlers:
+            handler.close()
+        profiler.log.handlers.clear()
+        cls._instancia = None
+    
+    # ----- Ação da interface -----
+    def acao_atual(self):
+        """Método da interface que está na pilha; nas threads do
+        ExecutorBanco, a ação de quem enviou a tarefa. Percorre a pilha,
+        então só é chamado por tarefa enviada e por consulta lenta"""
+        frame = sys._getframe(1)
+        while frame is not None:
+            if frame.f_code.co_filename == __file__:
+                dono = frame.f_locals.get('self')
+                if isinstance(dono, (BarbeariaApp, LoginWindow)):
+                    codigo = frame.f_code
+                    return getattr(codigo, 'co_qualname', f"{type(dono).__name__}.{codigo.co_name}")
+            frame = frame.f_back
+        return self.acao_da_thread()
+    
+    def acao_da_thread(self):
+        """Ação levada para esta thread pelo ExecutorBanco, ou o nome da
+        thread; não olha a pilha"""
+        return getattr(self._local, 'acao', None) or threading.current_thread().name
+    
+    def com_acao_atual(self, funcao):
+        """Leva a ação atual para a thread que vai executar funcao"""
+        acao = self.acao_atual()
+        
+        @wraps(funcao)
+        def wrapper(*args, **kwargs):
+            anterior = getattr(self._local, 'acao', None)
+            self._local.acao = acao
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                self._local.acao = anterior
+        return wrapper
+    
+    # ----- Registro -----
+    def registrar(self, conexao, sql, params, segundos, linhas, plano=True):
+        chave = ' '.join(sql.split())
+        milissegundos = segundos * 1000
+        lenta = milissegundos >= self.limite_ms
+        acao = self.acao_atual() if lenta else self.acao_da_thread()
+        
+        with self._trava:
+            item = self.estatisticas.get(chave)
+            if item is None:
+                item = self.estatisticas[chave] = {
+                    'chamadas': 0, 'tempo': 0.0, 'maximo': 0.0, 'linhas': 0, 'acoes': {}
+                }
+            item['chamadas'] += 1
+            item['tempo'] += milissegundos
+            item['maximo'] = max(item['maximo'], milissegundos)
+            item['linhas'] += linhas
+            item['acoes'][acao] = item['acoes'].get(acao, 0) + 1
+        
+        if lenta:
+            detalhes = ''
+            if plano and chave.upper().startswith(self.COMANDOS_COM_PLANO):
+                detalhes = self.plano(conexao, sql, params)
+            self.log.warning(
+                "%.1f ms | %d linha(s) | %s | %s\n  %s\n  params=%.200r%s",
+                milissegundos, linhas, acao, threading.current_thread().name,
+                chave, params, detalhes
+            )
+    
+    @staticmethod
+    def plano(conexao, sql, params):
+        try:
+            linhas = conexao.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        except sqlite3.Error as e:
+            return f"\n  (sem plano: {e})"
+        return ''.join(f"\n  plano: {linha[3]}" for linha in linhas)
+    
+    def resumo(self):
+        with self._trava:
+            itens = sorted(self.estatisticas.items(), key=lambda i: i[1]['tempo'], reverse=True)
+        
+        linhas = [f"===== TOP {self.top} CONSULTAS POR TEMPO TOTAL ====="]
+        for posicao, (sql, item) in enumerate(itens[:self.top], 1):
+            acoes = sorted(item['acoes'].items(), key=lambda a: a[1], reverse=True)[:3]
+            linhas.append(
+                f"{posicao:2d}. {item['tempo']:9.1f} ms total | {item['chamadas']:5d}x | "
+                f"média {item['tempo'] / item['chamadas']:7.2f} ms | máx {item['maximo']:7.1f} ms | "
+                f"{item['linhas']} linha(s)"
+            )
+            linhas.append(f"    {sql[:160]}")
+            linhas.append("    ações: " + ", ".join(f"{a} ({n})" for a, n in acoes))
+        return "\n".join(linhas)
+
+
+class CursorMonitorado(sqlite3.Cursor):
+    """Cursor que informa ao ProfilerConsultas o tempo de cada consulta,
+    somando execução e leitura das linhas"""
+    
+    _consulta = None
+    
+    def execute(self, sql, params=()):
+        self._finalizar()
+        inicio = time.perf_counter()
+        super().execute(sql, params)
+        self._consulta = [sql, params, time.perf_counter() - inicio, 0]
+        return self
+    
+    def executemany(self, sql, seq_params):
+        self._finalizar()
+        profiler = ProfilerConsultas.ativo()
+        inicio = time.perf_counter()
+        super().executemany(sql, seq_params)
+        profiler.registrar(
+            self.connection, sql, (), time.perf_counter() - inicio,
+            max(self.rowcount, 0), plano=False
+        )
+        return self
+    
+    def _medir_leitura(self, leitura, *args):
+        inicio = time.perf_counter()
+        resultado = leitura(*args)
+        if self._consulta is not None:
+            self._consulta[2] += time.perf_counter() - inicio
+        return resultado
+    
+    def fetchone(self):
+        # Quase sempre é a única leitura da consulta, então encerra a medição
+        linha = self._medir_leitura(super().fetchone)
+        if linha is not None and self._consulta is not None:
+            self._consulta[3] += 1
+        self._finalizar()
+        return linha
+    
+    def fetchmany(self, size=None):
+        linhas = self._medir_leitura(super().fetchmany, size or self.arraysize)
+        if self._consulta is not None:
+            self._consulta[3] += len(linhas)
+        return linhas
+    
+    def fetchall(self):
+        linhas = self._medir_leitura(super().fetchall)
+        if self._consulta is not None:
+            self._consulta[3] += len(linhas)
+        self._finalizar()
+        return linhas
+    
+    def __next__(self):
+        try:
+            linha = self._medir_leitura(super().__next__)
+        except StopIteration:
+            self._finalizar()
+            raise
+        if self._consulta is not None:
+            self._consulta[3] += 1
+        return linha
+    
+    def close(self):
+        self._finalizar()
+        super().close()
+    
+    def _finalizar(self):
+        consulta, self._consulta = self._consulta, None
+        if consulta is not None:
+            sql, params, segundos, linhas = consulta
+            ProfilerConsultas.ativo().registrar(self.connection, sql, params, segundos, linhas)
+
+# =============================================================
+# EXECUTOR DO BANCO DE DADOS (FORA DA THREAD DA INTERFACE)
+# =============================================================
+class ExecutorBanco:
+    """Executa métodos do Database em segundo plano.
+    
+    Escritas vão para uma única thread, usando a conexão de escrita do
+    GerenciadorConexoes. Leituras vão para um pool de threads, cada uma
+    com sua própria conexão somente leitura. Os callbacks voltam para a
+    thread do Tk através de janela.after.
+    """
+    
+    def __init__(self, janela, gerenciador, intervalo_ms=30):
+        self.janela = janela
+        self.gerenciador = gerenciador
+        self.db = gerenciador.db
+        self.intervalo_ms = intervalo_ms
+        
+        self._local = threading.local()
+        self._concluidos = queue.Queue()
+        self._pendentes = 0
+        
+        self.escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-escrita")
+        self.leitores = ThreadPoolExecutor(
+            max_workers=gerenciador.leitores,
+            thread_name_prefix="db-leitura",
+            initializer=self._abrir_conexao_leitura
+        )
+    
+    def _abrir_conexao_leitura(self):
+        self._local.db = self.gerenciador.abrir_leitura()
+    
+    @staticmethod
+    def _chamar(db, metodo, args, kwargs):
+        if callable(metodo):
+            return metodo(db, *args, **kwargs)
+        return getattr(db, metodo)(*args, **kwargs)
+    
+    def _executar_leitura(self, metodo, args, kwargs):
+        return self._chamar(self._local.db, metodo, args, kwargs)
+    
+    def _executar_escrita(self, metodo, args, kwargs):
+        return self._chamar(self.db, metodo, args, kwargs)
+    
+    @staticmethod
+    def _tarefa(executar):
+        profiler = ProfilerConsultas.ativo()
+        return profiler.com_acao_atual(executar) if profiler else executar
+    
+    def ler(self, metodo, *args, ao_concluir=None, ao_falhar=None, **kwargs):
+        """Executa uma leitura no pool. metodo é o nome de um método do
+        Database ou uma função que recebe o Database da thread."""
+        futuro = self.leitores.submit(self._tarefa(self._executar_leitura), metodo, args, kwargs)
+        self._acompanhar(futuro, ao_concluir, ao_falhar)
+        return futuro
+    
+    def escrever(self, metodo, *args, ao_concluir=None, ao_falhar=None, **kwargs):
+        """Executa uma escrita na thread de escrita"""
+        futuro = self.escritor.submit(self._tarefa(self._executar_escrita), metodo, args, kwargs)
+        self._acompanhar(futuro, ao_concluir, ao_falhar)
+        return futuro
+    
+    def _acompanhar(self, futuro, ao_concluir, ao_falhar):
+        self._pendentes += 1
+        if self._pendentes == 1:
+            self.janela.after(self.intervalo_ms, self._entregar_concluidos)
+        futuro.add_done_callback(
+            lambda f: self._concluidos.put((f, ao_concluir, ao_falhar))
+        )
+    
+    def _entregar_concluidos(self):
+        """Roda na thread do Tk: repassa os resultados aos callbacks"""
+        try:
+            while True:
+                try:
+                    futuro, ao_concluir, ao_falhar = self._concluidos.get_nowait()
+                except queue.Empty:
+                    break
+                
+                self._pendentes -= 1
+                if futuro.cancelled():
+                    continue  # Cancelada antes de começar (ex.: busca substituída)
+                erro = futuro.exception()
+                if erro is not None:
+                    if ao_falhar:
+                        ao_falhar(erro)
+                    else:
+                        CTkMessagebox(title="Erro", message=f"Erro: {str(erro)}", icon="cancel")
+                elif ao_concluir:
+                    ao_concluir(futuro.result())
+        finally:
+            if self._pendentes > 0:
+                self.janela.after(self.intervalo_ms, self._entregar_concluidos)
+    
+    def encerrar(self):
+        """Espera as tarefas em andamento; as conexões são fechadas pelo gerenciador"""
+        self.escritor.shutdown(wait=True)
+        self.leitores.shutdown(wait=True)
+
+# =============================================================
+# MONITOR DE ALTERAÇÕES
+# =============================================================
+class MonitorAlteracoes:
+    """Percebe alterações no banco sem reler os dados.
+    
+    A cada `intervalo_ms`, na thread do Tk, compara os contadores de
+    escrita do Database (escritas deste processo, por tabela) e o PRAGMA
+    data_version de uma conexão própria, que muda a cada commit de outra
+    conexão. Quando ele muda, os contadores gravados em versoes_dados
+    mostram quais tabelas foram escritas, por este ou por outro processo;
+    as de outro processo são marcadas no Database, para as telas
+    escondidas também se atualizarem. Os ouvintes recebem, a cada
+    verificação, o conjunto das tabelas alteradas (vazio se nada mudou);
+    parado, o banco custa só um PRAGMA por verificação.
+    """
+    
+    def __init__(self, janela, gerenciador, intervalo_ms=2000):
+        self.janela = janela
+        self.db = gerenciador.db
+        self.conexao = gerenciador.abrir_monitor()
+        self.intervalo_ms = intervalo_ms
+        self.ouvintes = []
+        self._versoes = self.versoes_processo()
+        self._versao_dados = self.conexao.versao_dados()
+        self._gravadas = self.versoes_gravadas()
+        self._agendado = None
+    
+    def iniciar(self):
+        if self._agendado is None:
+            self._agendado = self.janela.after(self.intervalo_ms, self._verificar)
+    
+    def parar(self):
+        if self._agendado is not None:
+            self.janela.after_cancel(self._agendado)
+            self._agendado = None
+    
+    def versoes_processo(self):
+        return dict(zip(Database.TABELAS_DADOS, self.db.versao_tabelas(*Database.TABELAS_DADOS)))
+    
+    def versoes_gravadas(self):
+        return dict(zip(Database.TABELAS_DADOS, self.conexao.versoes_gravadas(*Database.TABELAS_DADOS)))
+    
+    def verificar(self):
+        """Tabelas alteradas desde a última verificação"""
+        versoes = self.versoes_processo()
+        alteradas = {tabela for tabela, versao in versoes.items() if self._versoes.get(tabela) != versao}
+        
+        versao_dados = self.conexao.versao_dados()
+        if versao_dados != self._versao_dados:
+            gravadas = self.versoes_gravadas()
+            externas = {
+                tabela for tabela, versao in gravadas.items() if self._gravadas.get(tabela) != versao
+            } - alteradas
+            if externas:
+                self.db.marcar_alteracao(*externas)
+                versoes = self.versoes_processo()
+                alteradas |= externas
+            self._gravadas = gravadas
+        
+        self._versoes = versoes
+        self._versao_dados = versao_dados
+        return alteradas
+    
+    def _verificar(self):
+        try:
+            alteradas = self.verificar()
+            for ouvinte in self.ouvintes:
+                ouvinte(alteradas)
+        finally:
+            self._agendado = self.janela.after(self.intervalo_ms, self._verificar)
+
+# =============================================================
+# CARRINHO DA VENDA
+# =============================================================
+class CarrinhoVenda:
+    """Itens da venda em andamento, com o total mantido a cada alteração.
+    
+    Adicionar de novo o mesmo item (tipo, id) soma a quantidade na linha
+    existente. Cada alteração avisa os ouvintes com ouvinte(evento, chave,
+    item), onde evento é 'adicionado', 'alterado', 'removido' ou 'limpo',
+    para que a tela mexa só na linha afetada.
+    """
+    
+    def __init__(self):
+        self._itens = OrderedDict()
+        self.total = 0.0
+        self.ouvintes = []
+    
+    def __len__(self):
+        return len(self._itens)
+    
+    def quantidade(self, tipo, item_id):
+        item = self._itens.get((tipo, item_id))
+        return item['quantidade'] if item else 0
+    
+    def itens(self):
+        """Cópia dos itens, no formato de Database.registrar_venda_lote"""
+        return [dict(item) for item in self._itens.values()]
+    
+    def adicionar(self, tipo, item_id, nome, valor_unitario, quantidade=1):
+        chave = (tipo, item_id)
+        item = self._itens.get(chave)
+        if item is None:
+            item = self._itens[chave] = {
+                'id': item_id,
+                'nome': nome,
+                'tipo': tipo,
+                'quantidade': 0,
+                'valor_unitario': valor_unitario,
+                'valor_total': 0.0,
+            }
+            evento = 'adicionado'
+        else:
+            evento = 'alterado'
+        self._mudar_quantidade(item, item['quantidade'] + quantidade)
+        self._avisar(evento, chave, item)
+    
+    def remover(self, chave):
+        item = self._itens.pop(chave, None)
+        if item is not None:
+            self._somar(-item['valor_total'])
+            self._avisar('removido', chave, item)
+    
+    def limpar(self):
+        self._itens.clear()
+        self.total = 0.0
+        self._avisar('limpo', None, None)
+    
+    def _mudar_quantidade(self, item, quantidade):
+        anterior = item['valor_total']
+        item['quantidade'] = quantidade
+        item['valor_total'] = item['valor_unitario'] * quantidade
+        self._somar(item['valor_total'] - anterior)
+    
+    def _somar(self, valor):
+        # Arredonda em centavos para as somas e subtrações não acumularem erro
+        self.total = round(self.total + valor, 2) if self._itens else 0.0
+    
+    def _avisar(self, evento, chave, item):
+        for ouvinte in self.ouvintes:
+            ouvinte(evento, chave, item)
+
+# =============================================================
+# ANÁLISES DOS RELATÓRIOS (pandas)
+# =============================================================
+class AnalisePeriodo:
+    """Métricas de vendas, despesas e agendamentos de um período.
+    
+    As linhas entram em blocos (somar_vendas, somar_despesas,
+    somar_agendamentos) e viram agregados por forma de pagamento, item,
+    cliente e status, somados a cada bloco com group-bys vetorizados. A
+    memória cresce só com o número de itens, clientes e formas, não com o
+    período. As abas dos relatórios usam carregar, que lê o período do
+    banco e do histórico; a exportação do relatório financeiro soma as
+    linhas a caminho da planilha (repassar_vendas, repassar_despesas), e
+    as duas saem das mesmas contas. O pandas só é importado quando a
+    primeira análise é feita.
+    """
+    
+    # Colunas de venda usadas por somar_vendas
+    COLUNAS_VENDAS = ('id', 'data_venda', 'cliente_id', 'tipo', 'item_id', 'quantidade',
+                      'valor_total', 'forma_pagamento')
+    
+    def __init__(self, data_inicio, data_fim):
+        self.data_inicio = data_inicio
+        self.data_fim = data_fim
+        self.itens = None             # tipo, item_id -> item_nome, valor_custo (ler_itens)
+        self.cadastro_clientes = None  # cliente_id, cliente_nome, cliente_telefone (ler_clientes)
+        
+        self.quantidade_vendas = 0
+        self.quantidade_despesas = 0
+        self.total_vendas = 0.0
+        self.total_despesas = 0.0
+        self.custo_produtos = 0.0
+        self.atendimentos = 0
+        self.por_forma = None    # forma_pagamento -> vendas, total
+        self.por_item = None     # (tipo, item_id) -> quantidade, faturamento, custo
+        self.por_cliente = None  # cliente_id -> total, visitas
+        self.por_status = None   # status -> quantidade
+        
+        # Último horário de venda somado e os clientes vistos nele: um
+        # atendimento pode ter itens nos dois lados da divisa entre blocos
+        self._momento = None
+        self._clientes_no_momento = set()
+    
+    @classmethod
+    def carregar(cls, db, data_inicio, data_fim, bloco=20000):
+        """Lê o período (banco e histórico) em uma única transação, um
+        bloco por vez (roda em uma thread de leitura)"""
+        params = (data_inicio, data_fim)
+        analise = cls(data_inicio, data_fim)
+        
+        with db.transacao_leitura():
+            analise.ler_itens(db)
+            
+            # Em ordem de data_venda: o histórico só tem meses mais antigos
+            # que os do banco
+            for vendas in db.iterar_quadros(f'''
+                SELECT {', '.join(cls.COLUNAS_VENDAS)}
+                FROM vendas
+                WHERE data_venda >= ? AND data_venda < date(?, '+1 day')
+                ORDER BY data_venda DESC
+            ''', params, bloco=bloco, dtype={
+                'cliente_id': 'Int64', 'item_id': 'Int64', 'quantidade': 'Int64', 'valor_total': 'float64',
+            }):
+                analise.somar_vendas(vendas)
+            for vendas in db.iterar_historico('vendas', data_inicio, data_fim, list(cls.COLUNAS_VENDAS)):
+                analise.somar_vendas(vendas)
+            
+            for despesas in db.iterar_quadros('''
+                SELECT valor FROM despesas WHERE data BETWEEN ? AND ?
+            ''', params, bloco=bloco, dtype={'valor': 'float64'}):
+                analise.somar_despesas(despesas)
+            for despesas in db.iterar_historico('despesas', data_inicio, data_fim, ['valor']):
+                analise.somar_despesas(despesas)
+            
+            for agendamentos in db.iterar_quadros('''
+                SELECT status FROM agendamentos WHERE data BETWEEN ? AND ?
+            ''', params, bloco=bloco):
+                analise.somar_agendamentos(agendamentos)
+            for agendamentos in db.iterar_historico('agendamentos', data_inicio, data_fim, ['status']):
+                analise.somar_agendamentos(agendamentos)
+            
+            analise.ler_clientes(db)
+        
+        return analise
+    
+    def ler_itens(self, db):
+        """Nome e custo atual de serviços e produtos (serviços não têm custo)"""
+        import pandas as pd
+        
+        self.itens = pd.concat(db.iterar_quadros('''
+            SELECT 'servico' AS tipo, id AS item_id, nome AS item_nome, 0.0 AS valor_custo
+            FROM servicos
+            UNION ALL
+            SELECT 'produto', id, nome, COALESCE(valor_custo, 0) FROM produtos
+        ''', dtype={'item_id': 'Int64', 'valor_custo': 'float64'}), ignore_index=True).set_index(['tipo', 'item_id'])
+    
+    def ler_clientes(self, db, bloco=500):
+        """Nome e telefone dos clientes que compraram no período"""
+        import pandas as pd
+        
+        ids = [] if self.por_cliente is None else [int(cliente_id) for cliente_id in self.por_cliente.index]
+        linhas = db.consultar_por_ids('''
+            SELECT id AS cliente_id, nome AS cliente_nome, COALESCE(telefone, '') AS cliente_telefone
+            FROM clientes
+        ''', ids, bloco=bloco)
+        self.cadastro_clientes = pd.DataFrame.from_records(
+            list(linhas), columns=['cliente_id', 'cliente_nome', 'cliente_telefone']
+        ).astype({'cliente_id': 'Int64', 'cliente_nome': object, 'cliente_telefone': object})
+    
+    @staticmethod
+    def _acumular(total, parcial):
+        if total is None:
+            return parcial
+        return total.add(parcial, fill_value=0)
+    
+    def somar_vendas(self, vendas):
+        """Soma um bloco de vendas (DataFrame com COLUNAS_VENDAS). Os blocos
+        devem chegar em ordem de data_venda, como as consultas os leem"""
+        if vendas.empty:
+            return
+        
+        vendas = vendas.assign(
+            cliente_id=vendas['cliente_id'].astype('Int64'),
+            item_id=vendas['item_id'].astype('Int64'),
+            quantidade=vendas['quantidade'].astype('Int64'),
+            valor_total=vendas['valor_total'].astype('float64'),
+            forma_pagamento=vendas['forma_pagamento'].fillna("Não informado"),
+        )
+        # custo: valor de custo atual do produto
+        custos = self.itens['valor_custo'].reindex(
+            list(zip(vendas['tipo'], vendas['item_id']))
+        ).fillna(0.0).to_numpy()
+        vendas['custo'] = custos * vendas['quantidade'].fillna(0).to_numpy(dtype='float64')
+        
+        self.quantidade_vendas += len(vendas)
+        self.total_vendas += float(vendas['valor_total'].sum())
+        self.custo_produtos += float(vendas['custo'].sum())
+        
+        self.por_forma = self._acumular(self.por_forma, vendas.groupby('forma_pagamento').agg(
+            vendas=('id', 'count'), total=('valor_total', 'sum')
+        ))
+        self.por_item = self._acumular(self.por_item, vendas.groupby(['tipo', 'item_id']).agg(
+            quantidade=('quantidade', 'sum'), faturamento=('valor_total', 'sum'), custo=('custo', 'sum')
+        ))
+        
+        # Atendimento: os itens de um fechamento têm o mesmo cliente e o
+        # mesmo horário (0 = venda sem cliente)
+        pares = vendas[['data_venda']].assign(
+            cliente=vendas['cliente_id'].fillna(0).astype('int64')
+        ).drop_duplicates()
+        if self._momento is not None:
+            pares = pares[~((pares['data_venda'] == self._momento)
+                            & pares['cliente'].isin(self._clientes_no_momento))]
+        momento = vendas['data_venda'].iloc[-1]
+        if momento != self._momento:
+            self._momento, self._clientes_no_momento = momento, set()
+        self._clientes_no_momento.update(pares.loc[pares['data_venda'] == momento, 'cliente'])
+        self.atendimentos += len(pares)
+        
+        com_cliente = vendas[vendas['cliente_id'].notna()]
+        por_cliente = com_cliente.groupby('cliente_id').agg(total=('valor_total', 'sum'))
+        visitas = pares[pares['cliente'] != 0].groupby('cliente').size()
+        por_cliente['visitas'] = visitas.reindex(por_cliente.index.astype('int64'), fill_value=0).to_numpy()
+        self.por_cliente = self._acumular(self.por_cliente, por_cliente)
+    
+    def somar_despesas(self, despesas):
+        """Soma um bloco de despesas (DataFrame com a coluna valor)"""
+        self.quantidade_despesas += len(despesas)
+        self.total_despesas += float(despesas['valor'].sum())
+    
+    def somar_agendamentos(self, agendamentos):
+        """Conta um bloco de agendamentos por status"""
+        self.por_status = self._acumular(self.por_status, agendamentos['status'].value_counts())
+    
+    def repassar_vendas(self, db, linhas, bloco=2000):
+        """Repassa as linhas de Database.iterar_vendas_exportacao (a caminho
+        da planilha), somando-as a cada `bloco` linhas"""
+        import pandas as pd
+        
+        if self.itens is None:
+            self.ler_itens(db)
+        colunas = {
+            'ID': 'id', 'Data': 'data_venda', 'Cliente_ID': 'cliente_id', 'Tipo': 'tipo',
+            'Item_ID': 'item_id', 'Quantidade': 'quantidade', 'Valor_Total': 'valor_total',
+            'Forma_Pagamento': 'forma_pagamento',
+        }
+        
+        def somar(pendentes):
+            quadro = pd.DataFrame.from_records(pendentes, columns=Database.COLUNAS_EXPORTACAO_VENDAS)
+            self.somar_vendas(quadro[list(colunas)].rename(columns=colunas))
+        
+        pendentes = []
+        for linha in linhas:
+            yield linha
+            pendentes.append(linha)
+            if len(pendentes) >= bloco:
+                somar(pendentes)
+                pendentes = []
+        if pendentes:
+            somar(pendentes)
+    
+    def repassar_despesas(self, linhas, bloco=2000):
+        """Repassa as linhas de Database.iterar_despesas_exportacao, somando os valores"""
+        import pandas as pd
+        
+        pendentes = []
+        for linha in linhas:
+            yield linha
+            pendentes.append(linha[3])
+            if len(pendentes) >= bloco:
+                self.somar_despesas(pd.DataFrame({'valor': pendentes}, dtype='float64'))
+                pendentes = []
+        if pendentes:
+            self.somar_despesas(pd.DataFrame({'valor': pendentes}, dtype='float64'))
+    
+    def vazia(self):
+        return not self.quantidade_vendas and not self.quantidade_despesas
+    
+    def resumo_financeiro(self):
+        lucro = self.total_vendas - self.total_despesas
+        
+        return {
+            'total_vendas': self.total_vendas,
+            'total_despesas': self.total_despesas,
+            'lucro': lucro,
+            'margem': lucro / self.total_vendas * 100 if self.total_vendas else None,
+            'atendimentos': self.atendimentos,
+            'ticket_medio': self.total_vendas / self.atendimentos if self.atendimentos else 0.0,
+            'custo_produtos': self.custo_produtos,
+        }
+    
+    def formas_pagamento(self):
+        """Quantidade de itens, total e participação (%) por forma de pagamento"""
+        import pandas as pd
+        
+        if self.por_forma is None:
+            return pd.DataFrame(columns=['forma_pagamento', 'vendas', 'total', 'participacao'])
+        formas = self.por_forma.astype({'vendas': 'int64'})
+        total = formas['total'].sum()
+        formas['participacao'] = formas['total'] / total * 100 if total else 0.0
+        return formas.sort_values('total', ascending=False).rename_axis('forma_pagamento').reset_index()
+    
+    def ranking_itens(self, tipo):
+        """Serviços ou produtos vendidos, do maior faturamento para o menor,
+        com preço médio e margem sobre o custo"""
+        import pandas as pd
+        
+        colunas = ['item_nome', 'quantidade', 'faturamento', 'custo', 'media', 'margem']
+        if self.por_item is None or tipo not in self.por_item.index.get_level_values('tipo'):
+            return pd.DataFrame(columns=colunas)
+        
+        itens = self.por_item.xs(tipo, level='tipo').astype({'quantidade': 'int64'})
+        nomes = self.itens['item_nome'].xs(tipo, level='tipo') if tipo in self.itens.index else None
+        itens['item_nome'] = (
+            nomes.reindex(itens.index).fillna("Item removido") if nomes is not None else "Item removido"
+        )
+        itens['media'] = itens['faturamento'] / itens['quantidade']
+        itens['margem'] = (itens['faturamento'] - itens['custo']) / itens['faturamento'] * 100
+        itens = itens.fillna({'media': 0.0, 'margem': 0.0})  # Itens vendidos a R$ 0
+        return itens.sort_values('faturamento', ascending=False)[colunas].reset_index(drop=True)
+    
+    def ranking_clientes(self, limite=20):
+        """Clientes que mais gastaram no período"""
+        import pandas as pd
+        
+        colunas = ['cliente_id', 'cliente_nome', 'cliente_telefone', 'total', 'visitas', 'media']
+        if self.por_cliente is None:
+            return pd.DataFrame(columns=colunas)
+        
+        clientes = self.por_cliente.astype({'visitas': 'int64'})
+        clientes['media'] = clientes['total'] / clientes['visitas']
+        clientes = clientes.sort_values('total', ascending=False).head(limite)
+        clientes = clientes.rename_axis('cliente_id').reset_index()
+        return self.cadastro_clientes.merge(clientes, on='cliente_id').sort_values(
+            'total', ascending=False
+        )[colunas]
+    
+    def agendamentos_por_status(self):
+        """{status: quantidade} dos agendamentos do período"""
+        if self.por_status is None:
+            return {}
+        return {status: int(quantidade) for status, quantidade in self.por_status.items()}
+
+# =============================================================
+# EXPORTAÇÃO DE PLANILHAS
+# =============================================================
+class ExportacaoCancelada(Exception):
+    """A exportação foi cancelada antes de terminar"""
+
+class ExportacaoPlanilha:
+    """Grava uma planilha lendo o banco em blocos.
+    
+    Cada aba é (nome, colunas, linhas), onde linhas(db) devolve um iterável
+    de tuplas. As abas grandes vêm de geradores com fetchmany e vão direto
+    para um workbook write_only do openpyxl (ou para CSV, se o arquivo
+    terminar em .csv), então a memória não cresce com o período. `gravadas`
+    e `total` podem ser lidos da thread da interface durante a gravação.
+    """
+    
+    def __init__(self, arquivo, abas, contar=None, titulo=None):
+        self.arquivo = str(arquivo)
+        self.abas = abas
+        self.contar = contar  # contar(db) -> linhas esperadas, para o progresso
+        self.titulo = titulo or Path(self.arquivo).name
+        self.total = None
+        self.gravadas = 0
+        # na_fila, gravando, concluida, falhou ou cancelada (veja FilaExportacoes)
+        self.estado = 'na_fila'
+        self.erro = None
+        self._cancelada = threading.Event()
+    
+    def cancelar(self):
+        """Pede para a gravação parar na próxima linha (pode ser chamado de
+        qualquer thread); os arquivos incompletos são apagados"""
+        self._cancelada.set()
+    
+    def em_csv(self):
+        return self.arquivo.lower().endswith('.csv')
+    
+    def arquivos(self):
+        """Arquivos gravados: no CSV, cada aba depois da primeira vai para
+        um arquivo ao lado, com o nome da aba no final"""
+        if not self.em_csv():
+            return [self.arquivo]
+        base = Path(self.arquivo)
+        return [self.arquivo] + [
+            str(base.with_name(f"{base.stem}_{nome}{base.suffix}")) for nome, _, _ in self.abas[1:]
+        ]
+    
+    def progresso(self):
+        """Fração gravada (0 a 1), ou None enquanto o total não é conhecido"""
+        if not self.total:
+            return None
+        return min(self.gravadas / self.total, 1.0)
+    
+    def executar(self, db):
+        """Roda em uma thread de leitura; todas as abas veem o mesmo estado do banco"""
+        if self._cancelada.is_set():
+            raise ExportacaoCancelada()
+        with db.transacao_leitura():
+            if self.contar:
+                self.total = self.contar(db)
+            if self.em_csv():
+                self._gravar_csv(db)
+            else:
+                self._gravar_xlsx(db)
+        return self.arquivos()
+    
+    def _linhas(self, db, linhas):
+        for linha in linhas(db):
+            if self._cancelada.is_set():
+                raise ExportacaoCancelada()
+            yield linha
+            self.gravadas += 1
+    
+    def _gravar_xlsx(self, db):
+        from openpyxl import Workbook
+        
+        livro = Workbook(write_only=True)
+        for nome, colunas, linhas in self.abas:
+            planilha = livro.create_sheet(nome)
+            planilha.append(colunas)
+            for linha in self._linhas(db, linhas):
+                planilha.append(linha)
+        livro.save(self.arquivo)
+    
+    def _gravar_csv(self, db):
+        gravados = []
+        try:
+            for arquivo, (nome, colunas, linhas) in zip(self.arquivos(), self.abas):
+                gravados.append(arquivo)
+                # utf-8-sig e ';' para o Excel em português abrir direto
+                with open(arquivo, 'w', newline='', encoding='utf-8-sig') as saida:
+                    escritor = csv.writer(saida, delimiter=';')
+                    escritor.writerow(colunas)
+                    escritor.writerows(self._linhas(db, linhas))
+        except BaseException:
+            for arquivo in gravados:
+                Path(arquivo).unlink(missing_ok=True)
+            raise
+
+class FilaExportacoes:
+    """Exportações em segundo plano, várias ao mesmo tempo.
     
-    def obter_agendamentos_periodo(self, data_inicio, data_fim):
-        self.cursor.execute('''
-            SELECT a.*, c.nome as cliente_nome, s.nome as servico_nome 
-            FROM agendamentos a
-            LEFT JOIN clientes c ON a.cliente_id = c.id
-            LEFT JOIN servicos s ON a.servico_id = s.id
-            WHERE a.data BETWEEN ? AND ?
-            ORDER BY a.data, a.hora
-        ''', (data_inicio, data_fim))
-        return self.cursor.fetchall()
+    Até `simultaneas` exportações gravam de uma vez, cada uma em uma thread
+    com sua própria conexão somente leitura (para não ocupar os leitores
+    do ExecutorBanco); as demais esperam na fila. Enquanto houver
+    exportações ativas, os ouvintes são chamados na thread do Tk a cada
+    `intervalo_ms` com (evento, exportacao): 'adicionada', 'progresso',
+    'concluida', 'falhou', 'cancelada' ou 'removida'.
+    """
     
-    def atualizar_status_agendamento(self, agendamento_id, status):
-        self.cursor.execute(
-            "UPDATE agendamentos SET status = ? WHERE id = ?",
-            (status, agendamento_id)
+    def __init__(self, janela, gerenciador, simultaneas=2, intervalo_ms=200):
+        self.janela = janela
+        self.gerenciador = gerenciador
+        self.intervalo_ms = intervalo_ms
+        self.exportacoes = []
+        self.ouvintes = []
+        
+        self._futuros = {}
+        self._local = threading.local()
+        self._acompanhando = False
+        self.pool = ThreadPoolExecutor(
+            max_workers=simultaneas,
+            thread_name_prefix="exportacao",
+            initializer=self._abrir_conexao
         )
-        self.conn.commit()
     
-    def excluir_agendamento(self, agendamento_id):
-        """EXCLUI agendamento pelo ID"""
-        self.cursor.execute("DELETE FROM agendamentos WHERE id = ?", (agendamento_id,))
-        self.conn.commit()
+    def _abrir_conexao(self):
+        self._local.db = self.gerenciador.abrir_exportacao()
     
-    # ========== VENDAS ==========
-    def registrar_venda(self, cliente_id, tipo, item_id, quantidade, valor_unitario, forma_pagamento):
-        valor_total = valor_unitario * quantidade
-        
-        self.cursor.execute(
-            """INSERT INTO vendas 
-               (cliente_id, tipo, item_id, quantidade, valor_unitario, valor_total, forma_pagamento) 
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (cliente_id, tipo, item_id, quantidade, valor_unitario, valor_total, forma_pagamento)
-        )
+    def _executar(self, exportacao):
+        exportacao.estado = 'gravando'
+        return exportacao.executar(self._local.db)
+    
+    def adicionar(self, exportacao):
+        self.exportacoes.append(exportacao)
+        self._futuros[exportacao] = self.pool.submit(self._executar, exportacao)
+        self._avisar('adicionada', exportacao)
+        if not self._acompanhando:
+            self._acompanhando = True
+            self.janela.after(self.intervalo_ms, self._acompanhar)
+    
+    def ativas(self):
+        return [exportacao for exportacao in self.exportacoes if exportacao in self._futuros]
+    
+    def cancelar(self, exportacao):
+        """Na fila, a exportação sai sem começar; gravando, para na próxima linha"""
+        futuro = self._futuros.get(exportacao)
+        if futuro is not None:
+            exportacao.cancelar()
+            futuro.cancel()
+    
+    def remover(self, exportacao):
+        """Tira da lista uma exportação já encerrada"""
+        if exportacao in self._futuros:
+            return
+        self.exportacoes.remove(exportacao)
+        self._avisar('removida', exportacao)
+    
+    def _acompanhar(self):
+        """Roda na thread do Tk enquanto houver exportações ativas"""
+        for exportacao, futuro in list(self._futuros.items()):
+            if not futuro.done():
+                self._avisar('progresso', exportacao)
+                continue
+            
+            del self._futuros[exportacao]
+            erro = None if futuro.cancelled() else futuro.exception()
+            if futuro.cancelled() or isinstance(erro, ExportacaoCancelada):
+                exportacao.estado = 'cancelada'
+            elif erro is not None:
+                exportacao.estado = 'falhou'
+                exportacao.erro = erro
+            else:
+                exportacao.estado = 'concluida'
+            self._avisar(exportacao.estado, exportacao)
         
-        if cliente_id:
-            self.cursor.execute(
-                "UPDATE clientes SET total_gasto = total_gasto + ?, total_visitas = total_visitas + 1 WHERE id = ?",
-                (valor_total, cliente_id)
-            )
+        if self._futuros:
+            self.janela.after(self.intervalo_ms, self._acompanhar)
+        else:
+            self._acompanhando = False
+    
+    def _avisar(self, evento, exportacao):
+        for ouvinte in self.ouvintes:
+            ouvinte(evento, exportacao)
+    
+    def encerrar(self):
+        """Cancela as exportações pendentes e espera as threads terminarem"""
+        for exportacao in self.ativas():
+            self.cancelar(exportacao)
+        self.pool.shutdown(wait=True)
+
+# =============================================================
+# COMPONENTES DA INTERFACE
+# =============================================================
+class TreeviewVirtual:
+    """Treeview que só cria itens para as linhas visíveis.
+    
+    As linhas vêm de uma lista já carregada (definir_linhas) ou de uma
+    consulta no banco (definir_fonte), lida em blocos pelo ExecutorBanco
+    e guardada em um cache pequeno. A barra de rolagem, a roda do mouse
+    e as setas movem a janela de linhas exibidas.
+    
+    buscar(db, apos=, limite=, ordem=, decrescente=, deslocamento=) deve
+    retornar (linhas, proxima_chave), como os métodos *_pagina do Database,
+    e contar(db) o total de linhas. `ordens` liga as colunas da Treeview à
+    ordenação pelo cabeçalho: o índice da linha (listas) ou a tupla
+    (ordem do banco, índice da linha).
+    """
+    
+    BLOCOS_EM_CACHE = 8
+    
+    def __init__(self, app, tree, scrollbar, formatar, ordens=None, chave=None,
+                 tags=None, tamanho_bloco=200, coluna_ordem=None, decrescente=False):
+        self.app = app
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.formatar = formatar
+        self.chave = chave
+        self.tags = tags
+        self.tamanho_bloco = tamanho_bloco
+        
+        self.ordens = {
+            coluna: ordem if isinstance(ordem, tuple) else (None, ordem)
+            for coluna, ordem in (ordens or {}).items()
+        }
+        self.titulos = {coluna: tree.heading(coluna, 'text') for coluna in self.ordens}
+        self.coluna_ordem = coluna_ordem
+        self.decrescente = decrescente
+        
+        self.buscar = None
+        self.contar = None
+        self.linhas = None
+        self.blocos = OrderedDict()
+        self.pedidos = set()
+        self.total = 0
+        self.inicio = 0
+        self.visiveis = int(tree.cget('height')) or 10
+        self.geracao = 0
+        
+        scrollbar.configure(command=self._rolar_barra)
+        tree.configure(yscrollcommand="")
+        tree.bind("<Configure>", self._redimensionar)
+        tree.bind("<MouseWheel>", self._roda_mouse)
+        tree.bind("<Button-4>", lambda e: self._rolar_linhas(-3))
+        tree.bind("<Button-5>", lambda e: self._rolar_linhas(3))
+        tree.bind("<Up>", lambda e: self._mover_selecao(-1))
+        tree.bind("<Down>", lambda e: self._mover_selecao(1))
+        tree.bind("<Prior>", lambda e: self._rolar_linhas(-self.visiveis))
+        tree.bind("<Next>", lambda e: self._rolar_linhas(self.visiveis))
+        
+        for coluna in self.ordens:
+            tree.heading(coluna, command=lambda c=coluna: self.ordenar(c))
+        if coluna_ordem is not None:
+            self._atualizar_cabecalhos()
+    
+    # ----- Fontes de linhas -----
+    def definir_linhas(self, linhas):
+        """Exibe uma lista já carregada, ordenada na memória"""
+        self.geracao += 1
+        self.buscar = self.contar = None
+        self.blocos.clear()
+        self.pedidos.clear()
+        self.linhas = list(linhas)
+        self._ordenar_lista()
+        self.total = len(self.linhas)
+        self.inicio = min(self.inicio, self._inicio_maximo())
+        self._desenhar()
+    
+    def definir_fonte(self, buscar, contar, coluna_ordem=None, decrescente=False, ao_carregar=None,
+                      ao_falhar=None):
+        """Exibe o resultado de uma consulta, lido em blocos do banco"""
+        self.buscar, self.contar = buscar, contar
+        self.linhas = None
+        if coluna_ordem is not None:
+            self.coluna_ordem, self.decrescente = coluna_ordem, decrescente
+            self._atualizar_cabecalhos()
+        return self.recarregar(ao_carregar=ao_carregar, ao_falhar=ao_falhar)
+    
+    def recarregar(self, ao_carregar=None, ao_falhar=None):
+        """Relê a consulta a partir da primeira linha; ao_carregar(total)
+        é chamado quando o primeiro bloco é exibido. Com ao_falhar, quem
+        chamou mostra o andamento e o erro (sem o aviso 'Carregando...').
+        Retorna o futuro da leitura."""
+        if self.buscar is None:
+            return None
+        
+        self.geracao += 1
+        self.blocos.clear()
+        self.pedidos.clear()
+        self.inicio = 0
+        geracao = self.geracao
+        buscar, contar = self.buscar, self.contar
+        kwargs = self._kwargs_busca(0, None)
+        
+        def ler(db):
+            total = ExecutorBanco._chamar(db, contar, (), {})
+            return total, ExecutorBanco._chamar(db, buscar, (), kwargs)
+        
+        def preencher(resultado):
+            if geracao != self.geracao:
+                return  # Recarregado de novo enquanto a consulta rodava
+            self.total, self.blocos[0] = resultado
+            self._desenhar()
+            if ao_carregar:
+                ao_carregar(self.total)
+        
+        if ao_falhar:
+            return self.app.executor.ler(ler, ao_concluir=preencher, ao_falhar=ao_falhar)
+        return self.app.ler_em_segundo_plano(self.tree.master, ler, ao_concluir=preencher)
+    
+    def _kwargs_busca(self, bloco, apos):
+        kwargs = {
+            'apos': apos,
+            'limite': self.tamanho_bloco,
+            'deslocamento': bloco * self.tamanho_bloco,
+        }
+        if self.coluna_ordem is not None:
+            kwargs['ordem'] = self.ordens[self.coluna_ordem][0]
+            kwargs['decrescente'] = self.decrescente
+        return kwargs
+    
+    def _linha(self, indice):
+        if self.linhas is not None:
+            return self.linhas[indice]
+        
+        bloco, posicao = divmod(indice, self.tamanho_bloco)
+        if bloco not in self.blocos:
+            self._pedir_bloco(bloco)
+            return None
+        self.blocos.move_to_end(bloco)
+        linhas = self.blocos[bloco][0]
+        return linhas[posicao] if posicao < len(linhas) else None
+    
+    def _pedir_bloco(self, bloco):
+        if bloco in self.pedidos:
+            return
+        self.pedidos.add(bloco)
+        geracao = self.geracao
         
-        if tipo == 'produto':
-            self.atualizar_estoque(item_id, -quantidade)
+        # Com o bloco anterior em cache continua por keyset, senão usa OFFSET
+        anterior = self.blocos.get(bloco - 1)
+        apos = anterior[1] if anterior else None
         
-        self.conn.commit()
-        return self.cursor.lastrowid
+        def guardar(resultado):
+            if geracao != self.geracao or not self.tree.winfo_exists():
+                return
+            self.pedidos.discard(bloco)
+            self.blocos[bloco] = resultado
+            while len(self.blocos) > self.BLOCOS_EM_CACHE:
+                self.blocos.popitem(last=False)
+            self._desenhar()
+        
+        def falhar(erro):
+            self.pedidos.discard(bloco)
+            CTkMessagebox(title="Erro", message=f"Erro ao carregar dados: {str(erro)}", icon="cancel")
+        
+        self.app.executor.ler(
+            self.buscar, **self._kwargs_busca(bloco, apos),
+            ao_concluir=guardar, ao_falhar=falhar
+        )
     
-    def obter_vendas_periodo(self, data_inicio, data_fim):
-        self.cursor.execute('''
-            SELECT v.*, 
-                   CASE WHEN v.tipo = 'servico' THEN s.nome ELSE p.nome END as item_nome,
-                   c.nome as cliente_nome
-            FROM vendas v
-            LEFT JOIN clientes c ON v.cliente_id = c.id
-            LEFT JOIN servicos s ON v.tipo = 'servico' AND v.item_id = s.id
-            LEFT JOIN produtos p ON v.tipo = 'produto' AND v.item_id = p.id
-            WHERE date(v.data_venda) BETWEEN ? AND ?
-            ORDER BY v.data_venda DESC
-        ''', (data_inicio, data_fim))
-        return self.cursor.fetchall()
+    # ----- Alterações pontuais -----
+    def obter_linha(self, chave):
+        """Linha carregada (da lista ou dos blocos em cache) com essa chave, ou None"""
+        encontrada = self._procurar(chave)
+        if encontrada is None:
+            return None
+        linhas, indice = encontrada
+        return linhas[indice]
     
-    def obter_total_vendas_periodo(self, data_inicio, data_fim):
-        self.cursor.execute('''
-            SELECT COALESCE(SUM(valor_total), 0) 
-            FROM vendas 
-            WHERE date(data_venda) BETWEEN ? AND ?
-        ''', (data_inicio, data_fim))
-        return self.cursor.fetchone()[0] or 0
+    def atualizar_linha(self, linha):
+        """Troca a linha de mesma chave sem reler a lista. Retorna False se
+        ela não está carregada ou, num bloco do banco, se mudou de posição
+        na ordenação (quem chamou deve recarregar)"""
+        encontrada = self._procurar(self.chave(linha))
+        if encontrada is None:
+            return False
+        
+        linhas, indice = encontrada
+        if self.linhas is None:
+            if self.coluna_ordem is not None:
+                posicao = self.ordens[self.coluna_ordem][1]
+                if linhas[indice][posicao] != linha[posicao]:
+                    return False
+            linhas[indice] = linha
+        elif self._substituir(indice, linha):
+            return True
+        
+        iid = str(self.chave(linha))
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.formatar(linha), tags=self.tags(linha) if self.tags else ())
+        return True
     
-    # ========== DESPESAS ==========
-    def adicionar_despesa(self, descricao, categoria, valor, data, forma_pagamento="", observacoes=""):
-        self.cursor.execute(
-            """INSERT INTO despesas (descricao, categoria, valor, data, forma_pagamento, observacoes)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (descricao, categoria, valor, data, forma_pagamento, observacoes)
-        )
-        self.conn.commit()
-        return self.cursor.lastrowid
+    def _substituir(self, indice, linha):
+        """Troca a linha da lista; True se ela mudou de posição (já redesenhada)"""
+        self.linhas[indice] = linha
+        if self.coluna_ordem is not None:
+            self._ordenar_lista()
+            if self.linhas[indice] is not linha:
+                self._desenhar()  # Mudou de posição na ordenação
+                return True
+        return False
     
-    def obter_despesas_periodo(self, data_inicio, data_fim):
-        self.cursor.execute('''
-            SELECT * FROM despesas 
-            WHERE data BETWEEN ? AND ?
-            ORDER BY data DESC
-        ''', (data_inicio, data_fim))
-        return self.cursor.fetchall()
+    def inserir_linha(self, linha):
+        """Acrescenta uma linha na posição da ordenação atual"""
+        if self.linhas is None or self.chave is None:
+            return False
+        self.linhas.append(linha)
+        self._ordenar_lista()
+        self.total = len(self.linhas)
+        self._desenhar()
+        return True
     
-    def obter_total_despesas_periodo(self, data_inicio, data_fim):
-        self.cursor.execute('''
-            SELECT COALESCE(SUM(valor), 0) 
-            FROM despesas 
-            WHERE data BETWEEN ? AND ?
-        ''', (data_inicio, data_fim))
-        return self.cursor.fetchone()[0] or 0
+    def remover_linha(self, chave):
+        """Remove a linha com essa chave. Retorna False se ela não está
+        carregada ou vem do banco (quem chamou deve recarregar)"""
+        encontrada = self._procurar(chave) if self.linhas is not None else None
+        if encontrada is None:
+            return False
+        del self.linhas[encontrada[1]]
+        self.total = len(self.linhas)
+        self.inicio = min(self.inicio, self._inicio_maximo())
+        self._desenhar()
+        return True
     
-    # ========== CAIXA ==========
-    def abrir_caixa(self, valor_inicial):
-        hoje = datetime.now().strftime("%Y-%m-%d")
-        self.cursor.execute(
-            "INSERT INTO caixa (data, valor_inicial, status) VALUES (?, ?, 'aberto')",
-            (hoje, valor_inicial)
-        )
-        self.conn.commit()
-        return self.cursor.lastrowid
+    def _procurar(self, chave):
+        """(linhas, índice) da linha com essa chave, na lista ou nos blocos em cache"""
+        if self.chave is None:
+            return None
+        fontes = [self.linhas] if self.linhas is not None else [linhas for linhas, _ in self.blocos.values()]
+        for linhas in fontes:
+            for indice, linha in enumerate(linhas):
+                if self.chave(linha) == chave:
+                    return linhas, indice
+        return None
     
-    def fechar_caixa(self, valor_final):
-        hoje = datetime.now().strftime("%Y-%m-%d")
-        self.cursor.execute(
-            """UPDATE caixa 
-               SET valor_final = ?, status = 'fechado', data_fechamento = CURRENT_TIMESTAMP
-               WHERE data = ? AND status = 'aberto'""",
-            (valor_final, hoje)
-        )
-        self.conn.commit()
+    # ----- Ordenação pelo cabeçalho -----
+    def ordenar(self, coluna):
+        if coluna == self.coluna_ordem:
+            self.decrescente = not self.decrescente
+        else:
+            self.coluna_ordem, self.decrescente = coluna, False
+        self._atualizar_cabecalhos()
+        
+        if self.linhas is not None:
+            self._ordenar_lista()
+            self.inicio = 0
+            self._desenhar()
+        elif self.ordens[coluna][0] is not None:
+            self.recarregar()
     
-    def caixa_esta_aberto(self):
-        hoje = datetime.now().strftime("%Y-%m-%d")
-        self.cursor.execute(
-            "SELECT COUNT(*) FROM caixa WHERE data = ? AND status = 'aberto'",
-            (hoje,)
+    def _ordenar_lista(self):
+        if self.coluna_ordem is None:
+            return
+        indice = self.ordens[self.coluna_ordem][1]
+        self.linhas.sort(
+            key=lambda linha: (linha[indice] is None, linha[indice] if linha[indice] is not None else 0),
+            reverse=self.decrescente
         )
-        return self.cursor.fetchone()[0] > 0
     
-    def obter_caixa_hoje(self):
-        hoje = datetime.now().strftime("%Y-%m-%d")
-        self.cursor.execute(
-            "SELECT * FROM caixa WHERE data = ?",
-            (hoje,)
-        )
-        return self.cursor.fetchone()
+    def _atualizar_cabecalhos(self):
+        for coluna, titulo in self.titulos.items():
+            if coluna == self.coluna_ordem:
+                titulo += " ▼" if self.decrescente else " ▲"
+            self.tree.heading(coluna, text=titulo)
+    
+    # ----- Exibição -----
+    def _desenhar(self):
+        selecionados = set(self.tree.selection())
+        foco = self.tree.focus()
+        self.tree.delete(*self.tree.get_children())
+        
+        for indice in range(self.inicio, min(self.inicio + self.visiveis, self.total)):
+            linha = self._linha(indice)
+            if linha is None:
+                self.tree.insert("", "end", iid=f"_{indice}", values=("…",))
+                continue
+            iid = str(self.chave(linha)) if self.chave else str(indice)
+            tags = self.tags(linha) if self.tags else ()
+            self.tree.insert("", "end", iid=iid, values=self.formatar(linha), tags=tags)
+        
+        visiveis = [iid for iid in selecionados if self.tree.exists(iid)]
+        if visiveis:
+            self.tree.selection_set(visiveis)
+        if foco and self.tree.exists(foco):
+            self.tree.focus(foco)
+        
+        if self.total:
+            self.scrollbar.set(self.inicio / self.total, (self.inicio + self.visiveis) / self.total)
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def _inicio_maximo(self):
+        return max(0, self.total - self.visiveis)
+    
+    def _ir_para(self, inicio):
+        inicio = max(0, min(int(inicio), self._inicio_maximo()))
+        if inicio != self.inicio:
+            self.inicio = inicio
+            self._desenhar()
+    
+    def _rolar_linhas(self, quantidade):
+        self._ir_para(self.inicio + quantidade)
+        return "break"
+    
+    def _rolar_barra(self, acao, valor, unidade=None):
+        if acao == "moveto":
+            self._ir_para(float(valor) * self.total)
+        elif unidade == "pages":
+            self._rolar_linhas(int(valor) * self.visiveis)
+        else:
+            self._rolar_linhas(int(valor))
+    
+    def _roda_mouse(self, evento):
+        passos = -evento.delta // 120 if abs(evento.delta) >= 120 else -evento.delta
+        return self._rolar_linhas(passos * 3)
+    
+    def _mover_selecao(self, direcao):
+        """Setas: rola a janela quando a seleção passa da primeira/última linha"""
+        itens = self.tree.get_children()
+        foco = self.tree.focus()
+        if not itens or foco not in itens:
+            return None
+        
+        posicao = itens.index(foco) + direcao
+        if 0 <= posicao < len(itens):
+            return None  # Movimento normal da Treeview
+        
+        anterior = self.inicio
+        self._rolar_linhas(direcao)
+        if self.inicio != anterior:
+            itens = self.tree.get_children()
+            novo = itens[0] if direcao < 0 else itens[-1]
+            self.tree.selection_set(novo)
+            self.tree.focus(novo)
+        return "break"
+    
+    def _redimensionar(self, evento):
+        itens = self.tree.get_children()
+        caixa = self.tree.bbox(itens[0]) if itens else None
+        if caixa:
+            topo, altura = caixa[1], caixa[3]
+        else:
+            topo = 25
+            altura = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        
+        visiveis = max(1, (evento.height - topo) // altura)
+        if visiveis != self.visiveis:
+            self.visiveis = visiveis
+            self.inicio = min(self.inicio, self._inicio_maximo())
+            self._desenhar()
+
+class GerenciadorTelas:
+    """Mantém construídas as telas do menu.
+    
+    Cada tela é criada uma vez, em um frame próprio dentro do container,
+    e depois apenas escondida e mostrada. Ao voltar para uma tela, ela só
+    é atualizada se alguma das suas tabelas foi alterada (ou se o
+    contexto, como a data de hoje, mudou) desde a última atualização.
+    """
     
-    # ========== RELATÓRIOS ==========
-    def obter_resumo_financeiro(self, data_inicio, data_fim):
-        total_vendas = self.obter_total_vendas_periodo(data_inicio, data_fim)
-        total_despesas = self.obter_total_despesas_periodo(data_inicio, data_fim)
-        lucro = total_vendas - total_despesas
+    def __init__(self, app, container):
+        self.app = app
+        self.container = container
+        self.telas = {}
+        self.atual = None
+    
+    def mostrar(self, nome, construir, atualizar=None, tabelas=(), contexto=None):
+        """Exibe a tela `nome`. Sem `atualizar`, a tela é reconstruída
+        quando seus dados mudam."""
+        tela = self.telas.get(nome)
+        versao = self._versao(tabelas, contexto)
+        
+        if tela is None or not tela['frame'].winfo_exists():
+            frame = ctk.CTkFrame(self.container, fg_color="transparent")
+            tela = self.telas[nome] = {
+                'frame': frame, 'versao': versao, 'tabelas': tabelas, 'contexto': contexto
+            }
+            self._exibir(nome)
+            construir()
+            return
         
-        return {
-            'total_vendas': total_vendas,
-            'total_despesas': total_despesas,
-            'lucro': lucro
-        }
+        self._exibir(nome)
+        if versao != tela['versao']:
+            tela['versao'] = versao
+            if atualizar:
+                atualizar()
+            else:
+                for widget in tela['frame'].winfo_children():
+                    widget.destroy()
+                construir()
     
-    def obter_top_clientes(self, limite=10):
-        self.cursor.execute('''
-            SELECT nome, total_gasto, total_visitas 
-            FROM clientes 
-            WHERE total_visitas > 0
-            ORDER BY total_gasto DESC
-            LIMIT ?
-        ''', (limite,))
-        return self.cursor.fetchall()
+    def sincronizar(self, nome):
+        """Dá a tela como em dia com os dados atuais, depois de ela ter
+        sido atualizada por fora de mostrar (ex.: pelo MonitorAlteracoes)"""
+        tela = self.telas.get(nome)
+        if tela is not None:
+            tela['versao'] = self._versao(tela['tabelas'], tela['contexto'])
     
-    def obter_servicos_mais_vendidos(self, data_inicio, data_fim):
-        self.cursor.execute('''
-            SELECT s.nome, COUNT(v.id) as quantidade, SUM(v.valor_total) as total
-            FROM vendas v
-            JOIN servicos s ON v.item_id = s.id AND v.tipo = 'servico'
-            WHERE date(v.data_venda) BETWEEN ? AND ?
-            GROUP BY s.id
-            ORDER BY total DESC
-        ''', (data_inicio, data_fim))
-        return self.cursor.fetchall()
+    def descartar(self, nome):
+        """Destrói a tela; ela será construída de novo ao ser mostrada"""
+        tela = self.telas.pop(nome, None)
+        if tela and tela['frame'].winfo_exists():
+            tela['frame'].destroy()
     
-    def obter_produtos_mais_vendidos(self, data_inicio, data_fim):
-        self.cursor.execute('''
-            SELECT p.nome, SUM(v.quantidade) as quantidade, SUM(v.valor_total) as total
-            FROM vendas v
-            JOIN produtos p ON v.item_id = p.id AND v.tipo = 'produto'
-            WHERE date(v.data_venda) BETWEEN ? AND ?
-            GROUP BY p.id
-            ORDER BY total DESC
-        ''', (data_inicio, data_fim))
-        return self.cursor.fetchall()
+    def _exibir(self, nome):
+        if self.atual != nome and self.atual in self.telas:
+            self.telas[self.atual]['frame'].pack_forget()
+        self.atual = nome
+        frame = self.telas[nome]['frame']
+        frame.pack(fill="both", expand=True)
+        self.app.frame_principal = frame
     
-    def fechar(self):
-        self.conn.close()
+    def _versao(self, tabelas, contexto):
+        versao = self.app.db.versao_tabelas(*tabelas)
+        if contexto:
+            versao += (contexto(),)
+        return versao
+
+class GraficoBarras:
+    """Gráfico de barras com uma única Figure por gráfico.
+    
+    renderizar() só troca as alturas e os rótulos das barras e desenha a
+    Figure com o Agg, sem tocar no Tk, então pode rodar em uma thread de
+    leitura. exibir() mostra a imagem resultante em um CTkLabel na
+    thread do Tk. Nada passa pelo pyplot, que guardaria cada figura.
+    """
+    
+    def __init__(self, quantidade, titulo, rotulo_y, cor='#4CC9F0', tamanho=(8, 4), dpi=100):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.ticker import FuncFormatter
+        
+        self.figura = Figure(figsize=tamanho, dpi=dpi, facecolor='#2B2B2B')
+        self.canvas = FigureCanvasAgg(self.figura)
+        self._trava = threading.Lock()
+        self.label = None
+        self.imagem = None
+        
+        ax = self.ax = self.figura.add_subplot()
+        self.barras = ax.bar(range(quantidade), [0] * quantidade, color=cor)
+        ax.set_xticks(range(quantidade))
+        ax.set_facecolor('#2B2B2B')
+        ax.tick_params(colors='white')
+        ax.spines['bottom'].set_color('white')
+        ax.spines['left'].set_color('white')
+        ax.set_ylabel(rotulo_y, color='white')
+        ax.set_title(titulo, color='white', pad=20)
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'R$ {x:,.0f}'))
+    
+    def criar_widget(self, master):
+        self.label = ctk.CTkLabel(master, text="")
+        return self.label
+    
+    def renderizar(self, rotulos, valores):
+        """Atualiza as barras e devolve a imagem (PIL) do gráfico"""
+        from PIL import Image
+        
+        with self._trava:
+            for barra, valor in zip(self.barras, valores):
+                barra.set_height(valor)
+            self.ax.set_xticklabels(rotulos)
+            maior = max(valores, default=0)
+            self.ax.set_ylim(0, maior * 1.1 if maior > 0 else 1)
+            
+            self.canvas.draw()
+            largura, altura = self.canvas.get_width_height()
+            return Image.frombuffer(
+                "RGBA", (largura, altura), self.canvas.buffer_rgba(), "raw", "RGBA", 0, 1
+            ).copy()
+    
+    def exibir(self, imagem):
+        if self.label is None or not self.label.winfo_exists():
+            return
+        if isinstance(imagem, Exception):
+            self.label.configure(image=None, text=f"Erro ao gerar gráfico: {str(imagem)}", text_color="#F44336")
+            return
+        self.imagem = ctk.CTkImage(light_image=imagem, dark_image=imagem, size=imagem.size)
+        self.label.configure(image=self.imagem, text="")
 
 # =============================================================
 # SISTEMA DE LOGIN
 # =============================================================
 class LoginWindow:
     def __init__(self):
-        self.db = Database()
+        self.db = GerenciadorConexoes.obter().db
+        pre_carregar_modulos()
         self.janela = ctk.CTk()
         self.janela.title("Barbearia Granada - Login")
         self.janela.geometry("400x500")
@@ -537,11 +3274,25 @@ class LoginWindow:
 class BarbeariaApp:
     def __init__(self, usuario_info):
         self.usuario_id, self.usuario_nome, self.usuario_tipo = usuario_info
-        self.db = Database()
+        self.gerenciador = GerenciadorConexoes.obter()
+        self.db = self.gerenciador.db
         
         self.setup_janela()
+        self.executor = ExecutorBanco(self.janela, self.gerenciador)
+        self.monitor = MonitorAlteracoes(self.janela, self.gerenciador)
+        self.monitor.ouvintes.append(self.atualizar_dashboard_ao_vivo)
+        self.fila_exportacoes = FilaExportacoes(self.janela, self.gerenciador)
+        self.fila_exportacoes.ouvintes.append(self.atualizar_painel_exportacoes)
         self.setup_menu()
         self.setup_dashboard()
+        self.monitor.iniciar()
+        self.janela.after(500, self.mostrar_avisos_migracao)
+    
+    def mostrar_avisos_migracao(self):
+        """Mostra uma vez os avisos deixados pelas migrações do banco"""
+        if self.db.avisos_migracao:
+            CTkMessagebox(title="Aviso", message="\n\n".join(self.db.avisos_migracao), icon="warning")
+            self.db.avisos_migracao.clear()
     
     def setup_janela(self):
         self.janela = ctk.CTk()
@@ -611,10 +3362,12 @@ class BarbeariaApp:
         ).pack(side="bottom", padx=10, pady=20, fill="x")
     
     def setup_dashboard(self):
-        self.frame_principal = ctk.CTkFrame(self.janela, corner_radius=10)
-        self.frame_principal.grid(row=0, column=1, sticky="nsew", padx=10, pady=10)
-        self.frame_principal.grid_columnconfigure(0, weight=1)
-        self.frame_principal.grid_rowconfigure(0, weight=1)
+        self.area_telas = ctk.CTkFrame(self.janela, corner_radius=10)
+        self.area_telas.grid(row=0, column=1, sticky="nsew", padx=10, pady=10)
+        
+        # frame_principal aponta sempre para o frame da tela exibida
+        self.frame_principal = self.area_telas
+        self.telas = GerenciadorTelas(self, self.area_telas)
         
         self.mostrar_dashboard()
     
@@ -622,7 +3375,15 @@ class BarbeariaApp:
     # 1. DASHBOARD COMPLETO
     # =============================================================
     def mostrar_dashboard(self):
-        self.limpar_frame_principal()
+        self.telas.mostrar(
+            "dashboard", self.construir_dashboard, self.atualizar_dashboard,
+            tabelas=tuple({tabela for tabelas in self.PARTES_DASHBOARD.values() for tabela in tabelas}),
+            contexto=lambda: datetime.now().strftime("%Y-%m-%d")
+        )
+        self.label_data_dashboard.configure(text=datetime.now().strftime("%d/%m/%Y %H:%M"))
+    
+    def construir_dashboard(self):
+        self.tela_dashboard = self.frame_principal
         
         # Título
         titulo_frame = ctk.CTkFrame(self.frame_principal, fg_color="transparent")
@@ -634,58 +3395,138 @@ class BarbeariaApp:
             font=("Arial", 24, "bold")
         ).pack(side="left")
         
-        ctk.CTkLabel(
+        self.label_data_dashboard = ctk.CTkLabel(
             titulo_frame,
             text=datetime.now().strftime("%d/%m/%Y %H:%M"),
             font=("Arial", 14),
             text_color="gray"
-        ).pack(side="right")
+        )
+        self.label_data_dashboard.pack(side="right")
         
         # Métricas
-        self.criar_metricas_rapidas()
+        self.criar_metricas_rapidas(self.tela_dashboard)
         
         # Agendamentos do dia
-        self.criar_agendamentos_hoje()
+        self.criar_agendamentos_hoje(self.tela_dashboard)
         
         # Produtos baixo estoque
-        self.criar_alerta_estoque()
+        self.criar_alerta_estoque(self.tela_dashboard)
         
         # Gráfico simples
-        self.criar_grafico_vendas()
-    
-    def criar_metricas_rapidas(self):
-        frame_metricas = ctk.CTkFrame(self.frame_principal)
-        frame_metricas.pack(fill="x", padx=20, pady=(0, 20))
-        
-        hoje = datetime.now().strftime("%Y-%m-%d")
+        self.criar_grafico_vendas(self.tela_dashboard)
         
-        # Agendamentos hoje
-        agendamentos = self.db.obter_agendamentos_do_dia(hoje)
-        agendamentos_hoje = len([a for a in agendamentos if a[7] == 'agendado'])
+        self.atualizar_dashboard()
+    
+    # Partes do dashboard e as tabelas que cada uma mostra
+    PARTES_DASHBOARD = {
+        'metricas': ('agendamentos', 'clientes', 'vendas', 'produtos'),
+        'agendamentos': ('agendamentos', 'clientes', 'servicos'),
+        'estoque': ('produtos',),
+        'grafico': ('vendas',),
+    }
+    
+    def atualizar_dashboard(self, partes=None):
+        """Relê os dados e atualiza os widgets já criados do dashboard.
+        Com `partes`, atualiza só essas, sem o aviso de 'Carregando...'"""
+        self.dia_dashboard = datetime.now().strftime("%Y-%m-%d")
+        if partes is None:
+            self.ler_em_segundo_plano(
+                self.tela_dashboard,
+                self.coletar_dados_dashboard,
+                ao_concluir=self.preencher_dashboard
+            )
+        else:
+            self.executor.ler(
+                self.coletar_dados_dashboard, partes,
+                ao_concluir=self.preencher_dashboard,
+                ao_falhar=self.falha_atualizacao_dashboard
+            )
+    
+    def falha_atualizacao_dashboard(self, erro):
+        """Registra a falha da atualização ao vivo e avisa no cabeçalho;
+        a próxima alteração tenta de novo"""
+        log.error("Falha ao atualizar o dashboard: %s", erro, exc_info=erro)
+        if self.telas.atual == "dashboard" and self.label_data_dashboard.winfo_exists():
+            self.label_data_dashboard.configure(
+                text=f"⚠ Falha ao atualizar: {erro}",
+                text_color="#F44336"
+            )
+    
+    def atualizar_dashboard_ao_vivo(self, tabelas):
+        """Ouvinte do MonitorAlteracoes: com o dashboard à mostra, relê só
+        as partes cujas tabelas mudaram (ou tudo, se o dia virou)"""
+        if self.telas.atual != "dashboard":
+            return  # As telas escondidas se atualizam ao serem mostradas
         
-        # Clientes novos hoje
-        self.db.cursor.execute(
-            "SELECT COUNT(*) FROM clientes WHERE date(data_cadastro) = date('now')"
+        self.label_data_dashboard.configure(
+            text=datetime.now().strftime("%d/%m/%Y %H:%M"),
+            text_color="gray"
         )
-        clientes_novos = self.db.cursor.fetchone()[0] or 0
-        
-        # Vendas hoje
-        vendas_hoje = self.db.obter_total_vendas_periodo(hoje, hoje)
-        
-        # Produtos baixo estoque
-        self.db.cursor.execute(
-            "SELECT COUNT(*) FROM produtos WHERE estoque <= estoque_minimo AND ativo = 1"
+        if datetime.now().strftime("%Y-%m-%d") != self.dia_dashboard:
+            partes = set(self.PARTES_DASHBOARD)
+        else:
+            partes = {
+                parte for parte, tabelas_parte in self.PARTES_DASHBOARD.items()
+                if tabelas.intersection(tabelas_parte)
+            }
+        
+        if partes:
+            self.atualizar_dashboard(partes)
+            self.telas.sincronizar("dashboard")
+    
+    # Partes do snapshot do banco lidas por cada parte do dashboard
+    SNAPSHOT_DASHBOARD = {
+        'metricas': 'metricas',
+        'agendamentos': 'agendamentos',
+        'estoque': 'estoque_baixo',
+        'grafico': 'vendas_semana',
+    }
+    
+    def coletar_dados_dashboard(self, db, partes=None):
+        """Snapshot do dashboard e imagem do gráfico (roda em uma thread de leitura)"""
+        partes = set(self.PARTES_DASHBOARD) if partes is None else partes
+        dados = db.obter_snapshot_dashboard(
+            datetime.now().strftime("%Y-%m-%d"),
+            partes={self.SNAPSHOT_DASHBOARD[parte] for parte in partes}
         )
-        produtos_baixo_estoque = self.db.cursor.fetchone()[0] or 0
-        
-        metricas = [
-            ("📅 Agendamentos Hoje", str(agendamentos_hoje), "#2196F3"),
-            ("👥 Clientes Novos", str(clientes_novos), "#4CAF50"),
-            ("💰 Vendas Hoje", f"R$ {vendas_hoje:,.2f}", "#FF9800"),
-            ("⚠️ Baixo Estoque", str(produtos_baixo_estoque), "#F44336"),
-        ]
+        dados['partes'] = partes
+        if 'grafico' in partes:
+            dados['grafico_vendas'] = self.renderizar_grafico_vendas(dados['vendas_semana'])
+        return dados
+    
+    def renderizar_grafico_vendas(self, vendas_diarias):
+        if self.grafico_vendas is None:
+            return None
+        try:
+            return self.grafico_vendas.renderizar(*self.serie_vendas_semana(vendas_diarias))
+        except Exception as e:
+            return e  # Mostrado no lugar do gráfico
+    
+    def preencher_dashboard(self, dados):
+        partes = dados['partes']
+        if 'metricas' in partes:
+            self.preencher_metricas_rapidas(dados)
+        if 'agendamentos' in partes:
+            self.preencher_agendamentos_hoje(dados)
+        if 'estoque' in partes:
+            self.preencher_alerta_estoque(dados)
+        if 'grafico' in partes and self.grafico_vendas is not None:
+            self.grafico_vendas.exibir(dados['grafico_vendas'])
+    
+    # Métricas do topo: (chave, título, cor)
+    METRICAS_DASHBOARD = [
+        ('agendamentos', "📅 Agendamentos Hoje", "#2196F3"),
+        ('clientes_novos', "👥 Clientes Novos", "#4CAF50"),
+        ('vendas_hoje', "💰 Vendas Hoje", "#FF9800"),
+        ('baixo_estoque', "⚠️ Baixo Estoque", "#F44336"),
+    ]
+    
+    def criar_metricas_rapidas(self, tela):
+        frame_metricas = ctk.CTkFrame(tela)
+        frame_metricas.pack(fill="x", padx=20, pady=(0, 20))
         
-        for i, (titulo, valor, cor) in enumerate(metricas):
+        self.labels_metricas = {}
+        for i, (chave, titulo, cor) in enumerate(self.METRICAS_DASHBOARD):
             frame = ctk.CTkFrame(frame_metricas, fg_color=cor, corner_radius=10)
             frame.grid(row=0, column=i, padx=10, pady=10, sticky="nsew")
             frame_metricas.grid_columnconfigure(i, weight=1)
@@ -697,15 +3538,27 @@ class BarbeariaApp:
                 text_color="white"
             ).pack(pady=(15, 5))
             
-            ctk.CTkLabel(
+            self.labels_metricas[chave] = ctk.CTkLabel(
                 frame,
-                text=valor,
+                text="…",
                 font=("Arial", 24, "bold"),
                 text_color="white"
-            ).pack(pady=(0, 15))
+            )
+            self.labels_metricas[chave].pack(pady=(0, 15))
     
-    def criar_agendamentos_hoje(self):
-        frame = ctk.CTkFrame(self.frame_principal)
+    def preencher_metricas_rapidas(self, dados):
+        metricas = dados['metricas']
+        valores = {
+            'agendamentos': str(metricas['agendamentos']),
+            'clientes_novos': str(metricas['clientes_novos']),
+            'vendas_hoje': f"R$ {metricas['vendas_hoje']:,.2f}",
+            'baixo_estoque': str(metricas['baixo_estoque']),
+        }
+        for chave, valor in valores.items():
+            self.labels_metricas[chave].configure(text=valor)
+    
+    def criar_agendamentos_hoje(self, tela):
+        frame = ctk.CTkFrame(tela)
         frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
         ctk.CTkLabel(
@@ -729,30 +3582,12 @@ class BarbeariaApp:
         tree.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=10)
         scrollbar.pack(side="right", fill="y", pady=10)
         
-        # Carregar dados
-        agendamentos = self.db.obter_agendamentos_do_dia()
-        for ag in agendamentos:
-            status_color = {
-                'agendado': 'blue',
-                'confirmado': 'green',
-                'finalizado': 'gray',
-                'cancelado': 'red'
-            }.get(ag[7], 'black')
-            
-            tree.insert("", "end", values=(
-                ag[4],  # hora
-                ag[11],  # cliente_nome
-                ag[12],  # telefone
-                ag[13],  # servico_nome
-                ag[6],   # profissional
-                ag[7]    # status
-            ), tags=(status_color,))
-        
         # Configurar cores
         tree.tag_configure('blue', foreground='blue')
         tree.tag_configure('green', foreground='green')
         tree.tag_configure('gray', foreground='gray')
         tree.tag_configure('red', foreground='red')
+        self.tree_agendamentos_dash = tree
         
         # Botões
         frame_botoes = ctk.CTkFrame(frame, fg_color="transparent")
@@ -772,8 +3607,22 @@ class BarbeariaApp:
                 width=120
             ).pack(side="left", padx=5)
     
-    def criar_alerta_estoque(self):
-        frame = ctk.CTkFrame(self.frame_principal)
+    def preencher_agendamentos_hoje(self, dados):
+        tree = self.tree_agendamentos_dash
+        tree.delete(*tree.get_children())
+        
+        for ag in dados['agendamentos']:
+            tree.insert("", "end", values=(
+                ag[4],  # hora
+                ag[11],  # cliente_nome
+                ag[12],  # telefone
+                ag[13],  # servico_nome
+                ag[5],   # profissional
+                ag[6]    # status
+            ), tags=(self.STATUS_AGENDAMENTO.get(ag[6], ('black',))[0],))
+    
+    def criar_alerta_estoque(self, tela):
+        frame = ctk.CTkFrame(tela)
         frame.pack(fill="x", padx=20, pady=(0, 20))
         
         ctk.CTkLabel(
@@ -783,11 +3632,18 @@ class BarbeariaApp:
             text_color="#F44336"
         ).pack(pady=(10, 5))
         
-        produtos = self.db.obter_produtos()
-        produtos_baixo = [p for p in produtos if p[4] <= p[5] and p[6] == 1]
+        self.frame_alerta_estoque = ctk.CTkFrame(frame, fg_color="transparent")
+        self.frame_alerta_estoque.pack(fill="x")
+    
+    def preencher_alerta_estoque(self, dados):
+        frame = self.frame_alerta_estoque
+        for widget in frame.winfo_children():
+            widget.destroy()
+        
+        produtos_baixo, total = dados['estoque_baixo']
         
         if produtos_baixo:
-            for produto in produtos_baixo[:5]:
+            for produto in produtos_baixo:
                 frame_produto = ctk.CTkFrame(frame, fg_color="#FFF3E0")
                 frame_produto.pack(fill="x", padx=10, pady=2)
                 
@@ -798,10 +3654,10 @@ class BarbeariaApp:
                     text_color="black"
                 ).pack(pady=5)
             
-            if len(produtos_baixo) > 5:
+            if total > len(produtos_baixo):
                 ctk.CTkLabel(
                     frame,
-                    text=f"... e mais {len(produtos_baixo) - 5} produtos",
+                    text=f"... e mais {total - len(produtos_baixo)} produtos",
                     font=("Arial", 11),
                     text_color="gray"
                 ).pack(pady=5)
@@ -813,8 +3669,8 @@ class BarbeariaApp:
                 text_color="#4CAF50"
             ).pack(pady=10)
     
-    def criar_grafico_vendas(self):
-        frame = ctk.CTkFrame(self.frame_principal)
+    def criar_grafico_vendas(self, tela):
+        frame = ctk.CTkFrame(tela)
         frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
         ctk.CTkLabel(
@@ -823,43 +3679,42 @@ class BarbeariaApp:
             font=("Arial", 16, "bold")
         ).pack(pady=10)
         
-        try:
-            datas = []
-            valores = []
-            
-            for i in range(6, -1, -1):
-                data = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-                total = self.db.obter_total_vendas_periodo(data, data)
-                datas.append(data[8:10] + "/" + data[5:7])
-                valores.append(total)
-            
-            fig, ax = plt.subplots(figsize=(8, 4), facecolor='#2B2B2B')
-            ax.bar(datas, valores, color='#4CC9F0')
-            ax.set_facecolor('#2B2B2B')
-            ax.tick_params(colors='white')
-            ax.spines['bottom'].set_color('white')
-            ax.spines['left'].set_color('white')
-            ax.set_ylabel('Valor (R$)', color='white')
-            ax.set_title('Vendas Diárias', color='white', pad=20)
-            
-            ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'R$ {x:,.0f}'))
-            
-            canvas = FigureCanvasTkAgg(fig, frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
-            
-        except Exception as e:
-            ctk.CTkLabel(
-                frame,
-                text=f"Erro ao gerar gráfico: {str(e)}",
-                text_color="#F44336"
-            ).pack(pady=20)
+        # A Figure é criada uma vez e reaproveitada em todas as atualizações
+        if getattr(self, 'grafico_vendas', None) is None:
+            try:
+                self.grafico_vendas = GraficoBarras(7, 'Vendas Diárias', 'Valor (R$)')
+            except ImportError:
+                self.grafico_vendas = None
+                ctk.CTkLabel(
+                    frame,
+                    text="Gráfico indisponível: instale o matplotlib",
+                    text_color="gray"
+                ).pack(pady=20)
+                return
+        self.grafico_vendas.criar_widget(frame).pack(fill="both", expand=True, padx=10, pady=10)
+    
+    @staticmethod
+    def serie_vendas_semana(totais, hoje=None):
+        """Rótulos (DD/MM) e totais dos últimos 7 dias, do mais antigo para hoje"""
+        hoje = hoje or datetime.now()
+        datas = []
+        valores = []
+        for i in range(6, -1, -1):
+            data = (hoje - timedelta(days=i)).strftime("%Y-%m-%d")
+            datas.append(data[8:10] + "/" + data[5:7])
+            valores.append(totais.get(data, 0))
+        return datas, valores
     
     # =============================================================
     # 2. SERVIÇOS
     # =============================================================
     def mostrar_servicos(self):
-        self.limpar_frame_principal()
+        self.telas.mostrar(
+            "servicos", self.construir_servicos, self.carregar_servicos,
+            tabelas=('servicos',)
+        )
+    
+    def construir_servicos(self):
         
         ctk.CTkLabel(
             self.frame_principal,
@@ -899,6 +3754,18 @@ class BarbeariaApp:
         self.tree_servicos.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=10)
         scrollbar.pack(side="right", fill="y", pady=10)
         
+        self.lista_servicos = TreeviewVirtual(
+            self, self.tree_servicos, scrollbar,
+            lambda servico: (
+                servico[0],
+                servico[1],
+                f"R$ {servico[2]:.2f}",
+                f"{servico[3]} min"
+            ),
+            ordens={"ID": 0, "Nome": 1, "Valor": 2, "Duração": 3},
+            chave=lambda servico: servico[0]
+        )
+        
         # Formulário
         frame_form = ctk.CTkFrame(frame_conteudo, width=350)
         frame_form.pack(side="right", fill="y", padx=(10, 0))
@@ -959,17 +3826,10 @@ class BarbeariaApp:
         self.carregar_servicos()
     
     def carregar_servicos(self):
-        for item in self.tree_servicos.get_children():
-            self.tree_servicos.delete(item)
-        
-        servicos = self.db.obter_servicos(apenas_ativos=True)
-        for servico in servicos:
-            self.tree_servicos.insert("", "end", values=(
-                servico[0],
-                servico[1],
-                f"R$ {servico[2]:.2f}",
-                f"{servico[3]} min"
-            ))
+        self.ler_em_segundo_plano(
+            self.tree_servicos.master, "obter_servicos",
+            apenas_ativos=True, ao_concluir=self.lista_servicos.definir_linhas
+        )
     
     def adicionar_servico(self):
         nome = self.entry_nome_servico.get().strip()
@@ -983,18 +3843,19 @@ class BarbeariaApp:
         try:
             valor_float = float(valor.replace(',', '.'))
             duracao_int = int(duracao)
-            
-            self.db.adicionar_servico(nome, valor_float, duracao_int)
-            
+        except ValueError:
+            CTkMessagebox(title="Erro", message="Valores inválidos!", icon="cancel")
+            return
+        
+        def adicionado(_servico_id):
             self.entry_nome_servico.delete(0, "end")
             self.entry_valor_servico.delete(0, "end")
             self.entry_duracao_servico.delete(0, "end")
             
             self.carregar_servicos()
-            CTkMessagebox(title="Sucesso", message="Serviço adicionado!", icon="check")
-            
-        except ValueError:
-            CTkMessagebox(title="Erro", message="Valores inválidos!", icon="cancel")
+            CTkMessagebox(title="Sucesso", message="Serviço adicionado!", icon="check")
+        
+        self.executor.escrever("adicionar_servico", nome, valor_float, duracao_int, ao_concluir=adicionado)
     
     def editar_servico(self):
         selecionado = self.tree_servicos.selection()
@@ -1002,9 +3863,10 @@ class BarbeariaApp:
             CTkMessagebox(title="Aviso", message="Selecione um serviço!", icon="warning")
             return
         
-        item = self.tree_servicos.item(selecionado[0])
-        servico_id = item['values'][0]
-        servico = self.db.obter_servico_por_id(servico_id)
+        servico = self.lista_servicos.obter_linha(int(selecionado[0]))
+        if servico is None:
+            return
+        servico_id = servico[0]
         
         janela = ctk.CTkToplevel(self.janela)
         janela.title("Editar Serviço")
@@ -1037,23 +3899,28 @@ class BarbeariaApp:
                 nome = entry_nome.get().strip()
                 valor = float(entry_valor.get().replace(',', '.'))
                 duracao = int(entry_duracao.get())
-                
-                resposta = CTkMessagebox(
-                    title="Confirmar",
-                    message="Deseja salvar as alterações?",
-                    icon="question",
-                    option_1="Cancelar",
-                    option_2="Salvar"
-                )
-                
-                if resposta.get() == "Salvar":
-                    self.db.atualizar_servico(servico_id, nome, valor, duracao)
-                    self.carregar_servicos()
-                    janela.destroy()
-                    CTkMessagebox(title="Sucesso", message="Serviço atualizado!", icon="check")
-                    
             except ValueError:
                 CTkMessagebox(title="Erro", message="Valores inválidos!", icon="cancel")
+                return
+            
+            resposta = CTkMessagebox(
+                title="Confirmar",
+                message="Deseja salvar as alterações?",
+                icon="question",
+                option_1="Cancelar",
+                option_2="Salvar"
+            )
+            
+            if resposta.get() == "Salvar":
+                def atualizado(_):
+                    self.carregar_servicos()
+                    if janela.winfo_exists():
+                        janela.destroy()
+                    CTkMessagebox(title="Sucesso", message="Serviço atualizado!", icon="check")
+                
+                self.executor.escrever(
+                    "atualizar_servico", servico_id, nome, valor, duracao, ao_concluir=atualizado
+                )
         
         ctk.CTkButton(janela, text="💾 Salvar", command=salvar, width=200, height=40).pack(pady=20)
         ctk.CTkButton(janela, text="❌ Cancelar", command=janela.destroy, fg_color="gray", width=200).pack()
@@ -1077,15 +3944,22 @@ class BarbeariaApp:
         )
         
         if resposta.get() == "Excluir":
-            self.db.excluir_servico(servico_id)
-            self.carregar_servicos()
-            CTkMessagebox(title="Sucesso", message="Serviço excluído!", icon="check")
+            def excluido(_):
+                self.carregar_servicos()
+                CTkMessagebox(title="Sucesso", message="Serviço excluído!", icon="check")
+            
+            self.executor.escrever("excluir_servico", servico_id, ao_concluir=excluido)
     
     # =============================================================
     # 3. PRODUTOS
     # =============================================================
     def mostrar_produtos(self):
-        self.limpar_frame_principal()
+        self.telas.mostrar(
+            "produtos", self.construir_produtos, self.carregar_produtos,
+            tabelas=('produtos',)
+        )
+    
+    def construir_produtos(self):
         
         ctk.CTkLabel(
             self.frame_principal,
@@ -1116,6 +3990,20 @@ class BarbeariaApp:
         self.tree_produtos.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=10)
         scrollbar.pack(side="right", fill="y", pady=10)
         
+        self.lista_produtos = TreeviewVirtual(
+            self, self.tree_produtos, scrollbar,
+            lambda produto: (
+                produto[0],
+                produto[1],
+                f"R$ {produto[2]:.2f}",
+                f"R$ {produto[3]:.2f}",
+                produto[4],
+                produto[5]
+            ),
+            ordens={"ID": 0, "Nome": 1, "Venda": 2, "Custo": 3, "Estoque": 4, "Mínimo": 5},
+            chave=lambda produto: produto[0]
+        )
+        
         # Formulário
         frame_form = ctk.CTkFrame(frame_conteudo, width=350)
         frame_form.pack(side="right", fill="y", padx=(10, 0))
@@ -1154,19 +4042,10 @@ class BarbeariaApp:
         self.carregar_produtos()
     
     def carregar_produtos(self):
-        for item in self.tree_produtos.get_children():
-            self.tree_produtos.delete(item)
-        
-        produtos = self.db.obter_produtos(apenas_ativos=True)
-        for produto in produtos:
-            self.tree_produtos.insert("", "end", values=(
-                produto[0],
-                produto[1],
-                f"R$ {produto[2]:.2f}",
-                f"R$ {produto[3]:.2f}",
-                produto[4],
-                produto[5]
-            ))
+        self.ler_em_segundo_plano(
+            self.tree_produtos.master, "obter_produtos",
+            apenas_ativos=True, ao_concluir=self.lista_produtos.definir_linhas
+        )
     
     def adicionar_produto(self):
         try:
@@ -1175,18 +4054,22 @@ class BarbeariaApp:
             valor_custo = float(self.entries_produtos["Valor Custo (R$):"].get().replace(',', '.'))
             estoque = int(self.entries_produtos["Estoque:"].get())
             estoque_minimo = int(self.entries_produtos["Estoque Mínimo:"].get())
-            
-            self.db.adicionar_produto(nome, valor_venda, valor_custo, estoque, estoque_minimo)
-            
+        except ValueError:
+            CTkMessagebox(title="Erro", message="Valores inválidos!", icon="cancel")
+            return
+        
+        def adicionado(_produto_id):
             for entry in self.entries_produtos.values():
                 entry.delete(0, "end")
             self.entries_produtos["Estoque Mínimo:"].insert(0, "5")
             
             self.carregar_produtos()
             CTkMessagebox(title="Sucesso", message="Produto adicionado!", icon="check")
-            
-        except ValueError:
-            CTkMessagebox(title="Erro", message="Valores inválidos!", icon="cancel")
+        
+        self.executor.escrever(
+            "adicionar_produto", nome, valor_venda, valor_custo, estoque, estoque_minimo,
+            ao_concluir=adicionado
+        )
     
     def editar_produto(self):
         selecionado = self.tree_produtos.selection()
@@ -1194,9 +4077,10 @@ class BarbeariaApp:
             CTkMessagebox(title="Aviso", message="Selecione um produto!", icon="warning")
             return
         
-        item = self.tree_produtos.item(selecionado[0])
-        produto_id = item['values'][0]
-        produto = self.db.obter_produto_por_id(produto_id)
+        produto = self.lista_produtos.obter_linha(int(selecionado[0]))
+        if produto is None:
+            return
+        produto_id = produto[0]
         
         janela = ctk.CTkToplevel(self.janela)
         janela.title("Editar Produto")
@@ -1233,23 +4117,29 @@ class BarbeariaApp:
                 valor_custo = float(entries[2].get().replace(',', '.'))
                 estoque = int(entries[3].get())
                 estoque_minimo = int(entries[4].get())
-                
-                resposta = CTkMessagebox(
-                    title="Confirmar",
-                    message="Deseja salvar as alterações?",
-                    icon="question",
-                    option_1="Cancelar",
-                    option_2="Salvar"
-                )
-                
-                if resposta.get() == "Salvar":
-                    self.db.atualizar_produto(produto_id, nome, valor_venda, valor_custo, estoque, estoque_minimo)
-                    self.carregar_produtos()
-                    janela.destroy()
-                    CTkMessagebox(title="Sucesso", message="Produto atualizado!", icon="check")
-                    
             except ValueError:
                 CTkMessagebox(title="Erro", message="Valores inválidos!", icon="cancel")
+                return
+            
+            resposta = CTkMessagebox(
+                title="Confirmar",
+                message="Deseja salvar as alterações?",
+                icon="question",
+                option_1="Cancelar",
+                option_2="Salvar"
+            )
+            
+            if resposta.get() == "Salvar":
+                def atualizado(_):
+                    self.carregar_produtos()
+                    if janela.winfo_exists():
+                        janela.destroy()
+                    CTkMessagebox(title="Sucesso", message="Produto atualizado!", icon="check")
+                
+                self.executor.escrever(
+                    "atualizar_produto", produto_id, nome, valor_venda, valor_custo, estoque, estoque_minimo,
+                    ao_concluir=atualizado
+                )
         
         ctk.CTkButton(janela, text="💾 Salvar", command=salvar, width=200, height=40).pack(pady=20)
         ctk.CTkButton(janela, text="❌ Cancelar", command=janela.destroy, fg_color="gray", width=200).pack()
@@ -1273,15 +4163,22 @@ class BarbeariaApp:
         )
         
         if resposta.get() == "Excluir":
-            self.db.excluir_produto(produto_id)
-            self.carregar_produtos()
-            CTkMessagebox(title="Sucesso", message="Produto excluído!", icon="check")
+            def excluido(_):
+                self.carregar_produtos()
+                CTkMessagebox(title="Sucesso", message="Produto excluído!", icon="check")
+            
+            self.executor.escrever("excluir_produto", produto_id, ao_concluir=excluido)
     
     # =============================================================
     # 4. CLIENTES
     # =============================================================
     def mostrar_clientes(self):
-        self.limpar_frame_principal()
+        self.telas.mostrar(
+            "clientes", self.construir_clientes, self.carregar_clientes,
+            tabelas=('clientes',)
+        )
+    
+    def construir_clientes(self):
         
         ctk.CTkLabel(
             self.frame_principal,
@@ -1296,6 +4193,8 @@ class BarbeariaApp:
         ctk.CTkLabel(frame_pesquisa, text="🔍 Pesquisar:").pack(side="left", padx=(0, 10))
         self.entry_pesquisa_cliente = ctk.CTkEntry(frame_pesquisa, width=300, placeholder_text="Nome ou telefone...")
         self.entry_pesquisa_cliente.pack(side="left", padx=(0, 10))
+        self.entry_pesquisa_cliente.bind("<KeyRelease>", self.agendar_busca_clientes)
+        self.entry_pesquisa_cliente.bind("<Return>", lambda e: self.buscar_clientes())
         
         ctk.CTkButton(
             frame_pesquisa,
@@ -1304,6 +4203,15 @@ class BarbeariaApp:
             width=100
         ).pack(side="left", padx=(0, 10))
         
+        self.label_resultado_clientes = ctk.CTkLabel(frame_pesquisa, text="", text_color="gray")
+        self.label_resultado_clientes.pack(side="left", padx=(0, 10))
+        
+        # Estado da pesquisa enquanto digita
+        self.busca_clientes_agendada = None
+        self.buscas_clientes = []
+        self.geracao_busca_clientes = 0
+        self.termo_busca_clientes = ""
+        
         ctk.CTkButton(
             frame_pesquisa,
             text="➕ Novo Cliente",
@@ -1337,6 +4245,19 @@ class BarbeariaApp:
         scrollbar_y.pack(side="right", fill="y")
         scrollbar_x.pack(side="bottom", fill="x")
         
+        self.lista_clientes = TreeviewVirtual(
+            self, self.tree_clientes, scrollbar_y, self.formatar_linha_cliente,
+            ordens={
+                "ID": ('id', 0),
+                "Nome": ('nome', 1),
+                "Telefone": ('telefone', 2),
+                "Cadastro": ('data_cadastro', 5),
+                "Gasto Total": ('total_gasto', 6),
+                "Visitas": ('total_visitas', 7),
+            },
+            chave=lambda cliente: cliente[0]
+        )
+        
         # Botões de ação
         frame_acoes = ctk.CTkFrame(self.frame_principal, fg_color="transparent")
         frame_acoes.pack(fill="x", padx=20, pady=(0, 20))
@@ -1360,33 +4281,78 @@ class BarbeariaApp:
         self.carregar_clientes()
     
     def carregar_clientes(self):
-        for item in self.tree_clientes.get_children():
-            self.tree_clientes.delete(item)
-        
-        clientes = self.db.obter_clientes()
-        for cliente in clientes:
-            self.tree_clientes.insert("", "end", values=(
-                cliente[0],
-                cliente[1],
-                cliente[2],
-                cliente[3] or "",
-                cliente[5],
-                f"R$ {cliente[6]:.2f}",
-                cliente[7]
-            ))
-    
-    def buscar_clientes(self):
-        termo = self.entry_pesquisa_cliente.get().lower()
-        
-        for item in self.tree_clientes.get_children():
-            valores = self.tree_clientes.item(item)['values']
-            if (termo in str(valores[1]).lower() or 
-                termo in str(valores[2]).lower()):
-                self.tree_clientes.selection_set(item)
-                self.tree_clientes.see(item)
-                return
+        """Lista todos os clientes, ou refaz a pesquisa que está digitada"""
+        if self.entry_pesquisa_cliente.get().strip():
+            self.buscar_clientes(forcar=True)
+            return
+        self.termo_busca_clientes = ""
+        self.label_resultado_clientes.configure(text="")
+        self.lista_clientes.definir_fonte("obter_clientes_pagina", "contar_clientes")
+    
+    def formatar_linha_cliente(self, cliente):
+        return (
+            cliente[0],
+            cliente[1],
+            cliente[2],
+            cliente[3] or "",
+            cliente[5],
+            f"R$ {cliente[6]:.2f}",
+            cliente[7]
+        )
+    
+    # Pausa na digitação antes de pesquisar (ms)
+    ATRASO_BUSCA_MS = 250
+    
+    def agendar_busca_clientes(self, evento=None):
+        """Cada tecla adia a pesquisa; ela roda quando a digitação para"""
+        if self.busca_clientes_agendada is not None:
+            self.janela.after_cancel(self.busca_clientes_agendada)
+        self.busca_clientes_agendada = self.janela.after(self.ATRASO_BUSCA_MS, self.buscar_clientes)
+    
+    def buscar_clientes(self, forcar=False):
+        if self.busca_clientes_agendada is not None:
+            self.janela.after_cancel(self.busca_clientes_agendada)
+            self.busca_clientes_agendada = None
+        
+        termo = self.entry_pesquisa_cliente.get().strip()
+        if termo == self.termo_busca_clientes and not forcar:
+            return  # Teclas que não mudam o texto (setas, Shift...)
+        self.termo_busca_clientes = termo
+        
+        # Descarta as buscas anteriores: as que não começaram são canceladas
+        # e o resultado das que já estão rodando é ignorado
+        self.geracao_busca_clientes += 1
+        geracao = self.geracao_busca_clientes
+        for futuro in self.buscas_clientes:
+            futuro.cancel()
+        self.buscas_clientes = []
+        
+        if not termo:
+            self.carregar_clientes()
+            return
         
-        CTkMessagebox(title="Aviso", message="Nenhum cliente encontrado!", icon="warning")
+        self.label_resultado_clientes.configure(text="Buscando...")
+        
+        def carregada(total):
+            if geracao != self.geracao_busca_clientes or not self.tree_clientes.winfo_exists():
+                return
+            if total:
+                self.label_resultado_clientes.configure(text=f"{total} cliente(s) encontrado(s)")
+            else:
+                self.label_resultado_clientes.configure(text="Nenhum cliente encontrado")
+        
+        def falhar(erro):
+            if geracao == self.geracao_busca_clientes:
+                self.label_resultado_clientes.configure(text="Erro na busca")
+                CTkMessagebox(title="Erro", message=f"Erro ao buscar clientes: {str(erro)}", icon="cancel")
+        
+        # A primeira página chega com o total; as seguintes são lidas ao
+        # rolar a lista, a partir do deslocamento de cada bloco
+        self.buscas_clientes.append(self.lista_clientes.definir_fonte(
+            lambda db, **kwargs: db.buscar_clientes_pagina(termo, **kwargs),
+            lambda db: db.contar_busca_clientes(termo),
+            ao_carregar=carregada, ao_falhar=falhar
+        ))
     
     def abrir_form_cliente(self, cliente=None):
         janela = ctk.CTkToplevel(self.janela)
@@ -1439,27 +4405,36 @@ class BarbeariaApp:
                 CTkMessagebox(title="Erro", message="Nome e telefone são obrigatórios!", icon="cancel")
                 return
             
-            try:
-                if cliente:
-                    updates = {
-                        'nome': nome,
-                        'telefone': telefone,
-                        'email': email if email else None,
-                        'data_nascimento': data_nasc if data_nasc else None,
-                        'observacoes': observacoes
-                    }
-                    self.db.atualizar_cliente(cliente[0], **updates)
-                    mensagem = "Cliente atualizado!"
-                else:
-                    self.db.adicionar_cliente(nome, telefone, email, data_nasc if data_nasc else None, observacoes)
-                    mensagem = "Cliente cadastrado!"
-                
+            def salvo(_):
                 self.carregar_clientes()
-                janela.destroy()
-                CTkMessagebox(title="Sucesso", message=mensagem, icon="check")
-                
-            except Exception as e:
-                CTkMessagebox(title="Erro", message=f"Erro: {str(e)}", icon="cancel")
+                if janela.winfo_exists():
+                    janela.destroy()
+                CTkMessagebox(
+                    title="Sucesso", message="Cliente atualizado!" if cliente else "Cliente cadastrado!", icon="check"
+                )
+            
+            def falhou(e):
+                if isinstance(e, sqlite3.IntegrityError):
+                    CTkMessagebox(title="Erro", message="Já existe um cliente com este telefone!", icon="cancel")
+                else:
+                    CTkMessagebox(title="Erro", message=f"Erro: {str(e)}", icon="cancel")
+            
+            if cliente:
+                updates = {
+                    'nome': nome,
+                    'telefone': telefone,
+                    'email': email if email else None,
+                    'data_nascimento': data_nasc if data_nasc else None,
+                    'observacoes': observacoes
+                }
+                self.executor.escrever(
+                    "atualizar_cliente", cliente[0], **updates, ao_concluir=salvo, ao_falhar=falhou
+                )
+            else:
+                self.executor.escrever(
+                    "adicionar_cliente", nome, telefone, email, data_nasc if data_nasc else None, observacoes,
+                    ao_concluir=salvo, ao_falhar=falhou
+                )
         
         ctk.CTkButton(
             janela,
@@ -1475,12 +4450,7 @@ class BarbeariaApp:
             CTkMessagebox(title="Aviso", message="Selecione um cliente!", icon="warning")
             return
         
-        item = self.tree_clientes.item(selecionado[0])
-        cliente_id = item['values'][0]
-        
-        self.db.cursor.execute("SELECT * FROM clientes WHERE id = ?", (cliente_id,))
-        cliente = self.db.cursor.fetchone()
-        
+        cliente = self.lista_clientes.obter_linha(int(selecionado[0]))
         if cliente:
             self.abrir_form_cliente(cliente)
     
@@ -1503,9 +4473,11 @@ class BarbeariaApp:
         )
         
         if resposta.get() == "Excluir":
-            self.db.excluir_cliente(cliente_id)
-            self.carregar_clientes()
-            CTkMessagebox(title="Sucesso", message="Cliente excluído!", icon="check")
+            def excluido(_):
+                self.carregar_clientes()
+                CTkMessagebox(title="Sucesso", message="Cliente excluído!", icon="check")
+            
+            self.executor.escrever("excluir_cliente", cliente_id, ao_concluir=excluido)
     
     def ligar_cliente(self):
         selecionado = self.tree_clientes.selection()
@@ -1554,37 +4526,31 @@ class BarbeariaApp:
         tree.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=10)
         scrollbar.pack(side="right", fill="y", pady=10)
         
-        data_inicio = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
-        data_fim = datetime.now().strftime("%Y-%m-%d")
-        
-        self.db.cursor.execute('''
-            SELECT v.data_venda, v.tipo, 
-                   CASE WHEN v.tipo = 'servico' THEN s.nome ELSE p.nome END as item_nome,
-                   v.quantidade, v.valor_total, v.forma_pagamento
-            FROM vendas v
-            LEFT JOIN servicos s ON v.tipo = 'servico' AND v.item_id = s.id
-            LEFT JOIN produtos p ON v.tipo = 'produto' AND v.item_id = p.id
-            WHERE v.cliente_id = ?
-            ORDER BY v.data_venda DESC
-        ''', (cliente_id,))
-        
-        vendas = self.db.cursor.fetchall()
-        
-        for venda in vendas:
-            tree.insert("", "end", values=(
+        lista = TreeviewVirtual(
+            self, tree, scrollbar,
+            lambda venda: (
                 venda[0][:10],
                 "Serviço" if venda[1] == 'servico' else "Produto",
                 venda[2],
                 venda[3],
                 f"R$ {venda[4]:.2f}",
                 venda[5]
-            ))
+            ),
+            ordens={"Data": 0, "Tipo": 1, "Item": 2, "Quantidade": 3, "Valor": 4, "Pagamento": 5}
+        )
+        
+        self.ler_em_segundo_plano(frame, "obter_historico_cliente", cliente_id, ao_concluir=lista.definir_linhas)
     
     # =============================================================
     # 5. AGENDAMENTOS COMPLETO COM EXCLUSÃO FUNCIONAL
     # =============================================================
     def mostrar_agendamentos(self):
-        self.limpar_frame_principal()
+        self.telas.mostrar(
+            "agendamentos", self.construir_agendamentos, self.carregar_agendamentos_data,
+            tabelas=('agendamentos', 'clientes', 'servicos')
+        )
+    
+    def construir_agendamentos(self):
         
         ctk.CTkLabel(
             self.frame_principal,
@@ -1657,6 +4623,19 @@ class BarbeariaApp:
         self.tree_agendamentos.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=10)
         scrollbar.pack(side="right", fill="y", pady=10)
         
+        for color in ['blue', 'green', 'gray', 'red']:
+            self.tree_agendamentos.tag_configure(color, foreground=color)
+        
+        self.lista_agendamentos = TreeviewVirtual(
+            self, self.tree_agendamentos, scrollbar, self.formatar_linha_agendamento,
+            ordens={"Hora": ('hora', 4), "Cliente": ('cliente_nome', 11), "Telefone": ('telefone', 12),
+                    "Serviço": ('servico_nome', 13), "Profissional": ('profissional', 5),
+                    "Valor": ('valor', 7), "Status": ('status', 6)},
+            chave=lambda ag: ag[0],
+            tags=lambda ag: (self.STATUS_AGENDAMENTO.get(ag[6], ('black', ag[6]))[0],),
+            coluna_ordem="Hora"
+        )
+        
         # Botões de ação
         frame_acoes = ctk.CTkFrame(frame_lista, fg_color="transparent")
         frame_acoes.pack(fill="x", padx=10, pady=(0, 10))
@@ -1679,32 +4658,30 @@ class BarbeariaApp:
         self.carregar_agendamentos_data()
     
     def carregar_agendamentos_data(self):
-        for item in self.tree_agendamentos.get_children():
-            self.tree_agendamentos.delete(item)
-        
         data_str = self.data_selecionada.strftime("%Y-%m-%d")
-        agendamentos = self.db.obter_agendamentos_do_dia(data_str)
-        
-        for ag in agendamentos:
-            status_color = {
-                'agendado': ('blue', 'Agendado'),
-                'confirmado': ('green', 'Confirmado'),
-                'finalizado': ('gray', 'Finalizado'),
-                'cancelado': ('red', 'Cancelado')
-            }.get(ag[7], ('black', ag[7]))
-            
-            self.tree_agendamentos.insert("", "end", values=(
-                ag[4],
-                ag[11],
-                ag[12],
-                ag[13],
-                ag[6],
-                f"R$ {ag[8]:.2f}",
-                status_color[1]
-            ), tags=(status_color[0],))
-        
-        for color in ['blue', 'green', 'gray', 'red']:
-            self.tree_agendamentos.tag_configure(color, foreground=color)
+        self.lista_agendamentos.definir_fonte(
+            lambda db, **kwargs: db.obter_agendamentos_periodo_pagina(data_str, data_str, **kwargs),
+            lambda db: db.contar_agendamentos_periodo(data_str, data_str)
+        )
+    
+    # Cor e texto de cada status de agendamento
+    STATUS_AGENDAMENTO = {
+        'agendado': ('blue', 'Agendado'),
+        'confirmado': ('green', 'Confirmado'),
+        'finalizado': ('gray', 'Finalizado'),
+        'cancelado': ('red', 'Cancelado')
+    }
+    
+    def formatar_linha_agendamento(self, ag):
+        return (
+            ag[4],
+            ag[11],
+            ag[12],
+            ag[13],
+            ag[5],
+            f"R$ {ag[7]:.2f}",
+            self.STATUS_AGENDAMENTO.get(ag[6], ('black', ag[6]))[1]
+        )
     
     def mudar_data_agendamento(self, dias):
         self.data_selecionada += timedelta(days=dias)
@@ -1754,12 +4731,9 @@ class BarbeariaApp:
         
         # Serviço
         ctk.CTkLabel(campos_frame, text="Serviço:").pack(anchor="w", pady=(0, 5))
-        self.combo_servico_ag = ctk.CTkComboBox(
-            campos_frame,
-            width=300,
-            values=self.obter_nomes_servicos()
-        )
+        self.combo_servico_ag = ctk.CTkComboBox(campos_frame, width=300, values=[])
         self.combo_servico_ag.pack(anchor="w", pady=(0, 10))
+        self.carregar_nomes_servicos(self.combo_servico_ag)
         
         # Data
         ctk.CTkLabel(campos_frame, text="Data:").pack(anchor="w", pady=(0, 5))
@@ -1794,45 +4768,54 @@ class BarbeariaApp:
             try:
                 data_obj = datetime.strptime(data, "%d/%m/%Y")
                 data_banco = data_obj.strftime("%Y-%m-%d")
+            except ValueError:
+                CTkMessagebox(title="Erro", message="Data inválida! Use DD/MM/AAAA", icon="cancel")
+                return
+            
+            try:
+                servico_nome, servico_valor = servico.split(" - R$ ")
+                servico_valor = float(servico_valor)
+            except ValueError:
+                CTkMessagebox(title="Erro", message="Serviço não encontrado!", icon="cancel")
+                return
+            
+            def gravar(db):
+                """Roda na thread de escrita: acha o serviço, o cliente (ou
+                cadastra) e grava o agendamento. None se o serviço sumiu"""
+                servico_id = next((s[0] for s in db.obter_servicos() if s[1] == servico_nome), None)
+                if servico_id is None:
+                    return None
                 
-                servico_nome = servico.split(" - R$ ")[0]
-                servico_valor = float(servico.split(" - R$ ")[1])
-                
-                cliente_existente = self.db.buscar_cliente_por_telefone(telefone)
+                cliente_existente = db.buscar_cliente_por_telefone(telefone)
                 if cliente_existente:
                     cliente_id = cliente_existente[0]
                 else:
-                    cliente_id = self.db.adicionar_cliente(cliente, telefone)
-                
-                servicos = self.db.obter_servicos()
-                servico_id = None
-                for s in servicos:
-                    if s[1] == servico_nome:
-                        servico_id = s[0]
-                        break
-                
-                if not servico_id:
-                    CTkMessagebox(title="Erro", message="Serviço não encontrado!", icon="cancel")
-                    return
+                    cliente_id = db.adicionar_cliente(cliente, telefone)
                 
-                self.db.adicionar_agendamento(
+                agendamento_id = db.adicionar_agendamento(
                     cliente_id, servico_id, data_banco, hora,
                     profissional, servico_valor
                 )
+                return db.obter_agendamento(agendamento_id)
+            
+            def criado(novo):
+                if novo is None:
+                    CTkMessagebox(title="Erro", message="Serviço não encontrado!", icon="cancel")
+                    return
+                
+                if janela.winfo_exists():
+                    janela.destroy()
+                if data_banco == self.data_selecionada.strftime("%Y-%m-%d"):
+                    if not self.lista_agendamentos.inserir_linha(novo):
+                        self.carregar_agendamentos_data()
                 
                 CTkMessagebox(
                     title="Sucesso",
                     message=f"✅ Agendamento criado!\n\nCliente: {cliente}\nData: {data} {hora}\nServiço: {servico_nome}",
                     icon="check"
                 )
-                
-                janela.destroy()
-                self.carregar_agendamentos_data()
-                
-            except ValueError:
-                CTkMessagebox(title="Erro", message="Data inválida! Use DD/MM/AAAA", icon="cancel")
-            except Exception as e:
-                CTkMessagebox(title="Erro", message=f"Erro: {str(e)}", icon="cancel")
+            
+            self.executor.escrever(gravar, ao_concluir=criado)
         
         ctk.CTkButton(
             janela,
@@ -1845,176 +4828,156 @@ class BarbeariaApp:
     
     def buscar_cliente_agendamento(self):
         telefone = self.entry_telefone_ag.get().strip()
-        if telefone:
-            cliente = self.db.buscar_cliente_por_telefone(telefone)
+        if not telefone:
+            return
+        
+        def encontrado(cliente):
+            if not self.entry_cliente_ag.winfo_exists():
+                return
             if cliente:
                 self.entry_cliente_ag.delete(0, "end")
                 self.entry_cliente_ag.insert(0, cliente[1])
                 CTkMessagebox(title="Sucesso", message=f"Cliente encontrado: {cliente[1]}", icon="info")
             else:
                 CTkMessagebox(title="Aviso", message="Cliente não encontrado. Cadastre um novo.", icon="warning")
+        
+        self.executor.ler("buscar_cliente_por_telefone", telefone, ao_concluir=encontrado)
     
-    def obter_nomes_servicos(self):
-        servicos = self.db.obter_servicos()
-        return [f"{s[1]} - R$ {s[2]:.2f}" for s in servicos]
+    def carregar_nomes_servicos(self, combo):
+        """Preenche o combo com os serviços, lidos em segundo plano"""
+        def preencher(servicos):
+            if combo.winfo_exists():
+                combo.configure(values=[f"{s[1]} - R$ {s[2]:.2f}" for s in servicos])
+        
+        self.executor.ler("obter_servicos", ao_concluir=preencher)
     
-    def confirmar_agendamento(self):
+    def agendamento_selecionado(self):
+        """Linha (do banco) do agendamento selecionado na agenda, ou None"""
         selecionado = self.tree_agendamentos.selection()
         if not selecionado:
             CTkMessagebox(title="Aviso", message="Selecione um agendamento!", icon="warning")
-            return
+            return None
+        
+        agendamento = self.lista_agendamentos.obter_linha(int(selecionado[0]))
+        if agendamento is None:
+            CTkMessagebox(title="Erro", message="Agendamento não encontrado!", icon="cancel")
+            self.carregar_agendamentos_data()
+        return agendamento
+    
+    def mudar_status_agendamento(self, agendamento, status, sucesso):
+        """Grava o novo status e atualiza só a linha do agendamento. Se ele
+        foi alterado ou excluído em outro lugar, relê o dia inteiro"""
+        def gravado(atualizado):
+            if atualizado is None:
+                self.carregar_agendamentos_data()
+                CTkMessagebox(
+                    title="Aviso",
+                    message="Este agendamento foi alterado em outro lugar. A agenda foi atualizada.",
+                    icon="warning"
+                )
+                return
+            
+            if not self.lista_agendamentos.atualizar_linha(atualizado):
+                self.carregar_agendamentos_data()
+            CTkMessagebox(title="Sucesso", message=sucesso, icon="check")
         
-        item = self.tree_agendamentos.item(selecionado[0])
-        valores = item['values']
+        self.executor.escrever(
+            "atualizar_status_agendamento", agendamento[0], status,
+            status_atual=agendamento[6], ao_concluir=gravado
+        )
+    
+    def confirmar_agendamento(self):
+        agendamento = self.agendamento_selecionado()
+        if agendamento is None:
+            return
         
         resposta = CTkMessagebox(
             title="Confirmar Agendamento",
-            message=f"Confirmar agendamento de {valores[1]} para {valores[3]}?",
+            message=f"Confirmar agendamento de {agendamento[11]} para {agendamento[13]}?",
             icon="question",
             option_1="Cancelar",
             option_2="Confirmar"
         )
         
         if resposta.get() == "Confirmar":
-            data_str = self.data_selecionada.strftime("%Y-%m-%d")
-            self.db.cursor.execute('''
-                SELECT a.id 
-                FROM agendamentos a
-                JOIN clientes c ON a.cliente_id = c.id
-                JOIN servicos s ON a.servico_id = s.id
-                WHERE a.data = ? AND a.hora = ? AND c.nome = ? AND s.nome = ?
-            ''', (data_str, valores[0], valores[1], valores[3]))
-            
-            resultado = self.db.cursor.fetchone()
-            if resultado:
-                self.db.atualizar_status_agendamento(resultado[0], 'confirmado')
-                self.carregar_agendamentos_data()
-                CTkMessagebox(title="Sucesso", message="Agendamento confirmado!", icon="check")
+            self.mudar_status_agendamento(agendamento, 'confirmado', "Agendamento confirmado!")
     
     def finalizar_agendamento(self):
-        selecionado = self.tree_agendamentos.selection()
-        if not selecionado:
-            CTkMessagebox(title="Aviso", message="Selecione um agendamento!", icon="warning")
+        agendamento = self.agendamento_selecionado()
+        if agendamento is None:
             return
         
-        item = self.tree_agendamentos.item(selecionado[0])
-        valores = item['values']
-        
         resposta = CTkMessagebox(
             title="Finalizar Agendamento",
-            message=f"Finalizar agendamento de {valores[1]}?",
+            message=f"Finalizar agendamento de {agendamento[11]}?",
             icon="question",
             option_1="Cancelar",
             option_2="Finalizar"
         )
         
         if resposta.get() == "Finalizar":
-            data_str = self.data_selecionada.strftime("%Y-%m-%d")
-            self.db.cursor.execute('''
-                SELECT a.id 
-                FROM agendamentos a
-                JOIN clientes c ON a.cliente_id = c.id
-                JOIN servicos s ON a.servico_id = s.id
-                WHERE a.data = ? AND a.hora = ? AND c.nome = ? AND s.nome = ?
-            ''', (data_str, valores[0], valores[1], valores[3]))
-            
-            resultado = self.db.cursor.fetchone()
-            if resultado:
-                self.db.atualizar_status_agendamento(resultado[0], 'finalizado')
-                self.carregar_agendamentos_data()
-                CTkMessagebox(title="Sucesso", message="Agendamento finalizado!", icon="check")
+            self.mudar_status_agendamento(agendamento, 'finalizado', "Agendamento finalizado!")
     
     def cancelar_agendamento(self):
-        selecionado = self.tree_agendamentos.selection()
-        if not selecionado:
-            CTkMessagebox(title="Aviso", message="Selecione um agendamento!", icon="warning")
+        agendamento = self.agendamento_selecionado()
+        if agendamento is None:
             return
         
-        item = self.tree_agendamentos.item(selecionado[0])
-        valores = item['values']
-        
         resposta = CTkMessagebox(
             title="Cancelar Agendamento",
-            message=f"Cancelar agendamento de {valores[1]}?",
+            message=f"Cancelar agendamento de {agendamento[11]}?",
             icon="warning",
             option_1="Cancelar",
             option_2="Confirmar"
         )
         
         if resposta.get() == "Confirmar":
-            data_str = self.data_selecionada.strftime("%Y-%m-%d")
-            self.db.cursor.execute('''
-                SELECT a.id 
-                FROM agendamentos a
-                JOIN clientes c ON a.cliente_id = c.id
-                JOIN servicos s ON a.servico_id = s.id
-                WHERE a.data = ? AND a.hora = ? AND c.nome = ? AND s.nome = ?
-            ''', (data_str, valores[0], valores[1], valores[3]))
-            
-            resultado = self.db.cursor.fetchone()
-            if resultado:
-                self.db.atualizar_status_agendamento(resultado[0], 'cancelado')
-                self.carregar_agendamentos_data()
-                CTkMessagebox(title="Sucesso", message="Agendamento cancelado!", icon="check")
+            self.mudar_status_agendamento(agendamento, 'cancelado', "Agendamento cancelado!")
     
     def excluir_agendamento(self):
-        """EXCLUI agendamento do banco de dados - CORRIGIDO"""
-        selecionado = self.tree_agendamentos.selection()
-        if not selecionado:
-            CTkMessagebox(title="Aviso", message="Selecione um agendamento!", icon="warning")
+        """EXCLUI agendamento do banco de dados e tira a linha da agenda"""
+        agendamento = self.agendamento_selecionado()
+        if agendamento is None:
             return
         
-        item = self.tree_agendamentos.item(selecionado[0])
-        valores = item['values']
-        
-        hora = valores[0]
-        cliente = valores[1]
-        servico = valores[3]
-        
         resposta = CTkMessagebox(
             title="Confirmar Exclusão",
-            message=f"EXCLUIR agendamento?\n\n👤 {cliente}\n✂️ {servico}\n⏰ {hora}",
+            message=f"EXCLUIR agendamento?\n\n👤 {agendamento[11]}\n✂️ {agendamento[13]}\n⏰ {agendamento[4]}",
             icon="warning",
             option_1="Cancelar",
             option_2="Excluir"
         )
         
         if resposta.get() == "Excluir":
-            try:
-                data_str = self.data_selecionada.strftime("%Y-%m-%d")
-                
-                self.db.cursor.execute('''
-                    SELECT a.id 
-                    FROM agendamentos a
-                    JOIN clientes c ON a.cliente_id = c.id
-                    JOIN servicos s ON a.servico_id = s.id
-                    WHERE a.data = ? AND a.hora = ? AND c.nome = ? AND s.nome = ?
-                ''', (data_str, hora, cliente, servico))
-                
-                resultado = self.db.cursor.fetchone()
-                
-                if resultado:
-                    agendamento_id = resultado[0]
-                    self.db.excluir_agendamento(agendamento_id)
-                    
+            def excluido(removido):
+                if removido:
+                    if not self.lista_agendamentos.remover_linha(agendamento[0]):
+                        self.carregar_agendamentos_data()
                     CTkMessagebox(
                         title="✅ Excluído!",
-                        message=f"Agendamento excluído com sucesso.",
+                        message="Agendamento excluído com sucesso.",
                         icon="check"
                     )
-                    
-                    self.carregar_agendamentos_data()
                 else:
+                    self.carregar_agendamentos_data()
                     CTkMessagebox(title="Erro", message="Agendamento não encontrado!", icon="cancel")
-                    
-            except Exception as e:
-                CTkMessagebox(title="Erro", message=f"Erro ao excluir: {str(e)}", icon="cancel")
+            
+            self.executor.escrever(
+                "excluir_agendamento", agendamento[0], ao_concluir=excluido,
+                ao_falhar=lambda e: CTkMessagebox(title="Erro", message=f"Erro ao excluir: {str(e)}", icon="cancel")
+            )
     
     # =============================================================
     # 6. CAIXA COMPLETO COM FECHAMENTO FUNCIONAL
     # =============================================================
     def mostrar_caixa(self):
-        self.limpar_frame_principal()
+        self.telas.mostrar(
+            "caixa", self.construir_caixa,
+            tabelas=('caixa', 'vendas'),
+            contexto=lambda: datetime.now().strftime("%Y-%m-%d")
+        )
+    
+    def construir_caixa(self):
         
         ctk.CTkLabel(
             self.frame_principal,
@@ -2022,15 +4985,27 @@ class BarbeariaApp:
             font=("Arial", 24, "bold")
         ).pack(pady=20)
         
-        caixa_aberto = self.db.caixa_esta_aberto()
+        tela = self.frame_principal
         
-        if caixa_aberto:
-            self.mostrar_caixa_aberto()
-        else:
-            self.mostrar_caixa_fechado()
+        def montar(dados):
+            if dados['aberto']:
+                self.mostrar_caixa_aberto(tela, dados)
+            else:
+                self.mostrar_caixa_fechado(tela)
+        
+        self.ler_em_segundo_plano(tela, self.coletar_dados_caixa, ao_concluir=montar)
+    
+    def coletar_dados_caixa(self, db):
+        """Consultas da tela de caixa (roda em uma thread de leitura)"""
+        hoje = datetime.now().strftime("%Y-%m-%d")
+        return {
+            'aberto': db.caixa_esta_aberto(),
+            'caixa': db.obter_caixa_hoje(),
+            'total_vendas': db.obter_total_vendas_periodo(hoje, hoje),
+        }
     
-    def mostrar_caixa_aberto(self):
-        frame = ctk.CTkFrame(self.frame_principal)
+    def mostrar_caixa_aberto(self, tela, dados):
+        frame = ctk.CTkFrame(tela)
         frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
         ctk.CTkLabel(
@@ -2040,14 +5015,13 @@ class BarbeariaApp:
             text_color="#4CAF50"
         ).pack(pady=20)
         
-        caixa = self.db.obter_caixa_hoje()
+        caixa = dados['caixa']
         if caixa:
             valor_inicial = caixa[2]
         else:
             valor_inicial = 0
         
-        hoje = datetime.now().strftime("%Y-%m-%d")
-        total_vendas = self.db.obter_total_vendas_periodo(hoje, hoje)
+        total_vendas = dados['total_vendas']
         total_esperado = valor_inicial + total_vendas
         
         metricas = [
@@ -2073,8 +5047,8 @@ class BarbeariaApp:
             font=("Arial", 16, "bold")
         ).pack(pady=40, padx=100, fill="x")
     
-    def mostrar_caixa_fechado(self):
-        frame = ctk.CTkFrame(self.frame_principal)
+    def mostrar_caixa_fechado(self, tela):
+        frame = ctk.CTkFrame(tela)
         frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
         ctk.CTkLabel(
@@ -2101,16 +5075,18 @@ class BarbeariaApp:
     def abrir_caixa(self):
         try:
             valor_inicial = float(self.entry_valor_inicial.get().replace(',', '.'))
-            self.db.abrir_caixa(valor_inicial)
-            self.mostrar_caixa()
-            CTkMessagebox(title="Sucesso", message="Caixa aberto com sucesso!", icon="check")
         except ValueError:
             CTkMessagebox(title="Erro", message="Valor inválido!", icon="cancel")
+            return
+        
+        def aberto(_caixa_id):
+            self.mostrar_caixa()
+            CTkMessagebox(title="Sucesso", message="Caixa aberto com sucesso!", icon="check")
+        
+        self.executor.escrever("abrir_caixa", valor_inicial, ao_concluir=aberto)
     
     def fechar_caixa(self):
         """FECHA o caixa corretamente - CORRIGIDO"""
-        hoje = datetime.now().strftime("%Y-%m-%d")
-        
         resposta = CTkMessagebox(
             title="Fechar Caixa",
             message="Deseja fechar o caixa?\n\nIsso registrará o fechamento do dia.",
@@ -2120,84 +5096,97 @@ class BarbeariaApp:
         )
         
         if resposta.get() == "Fechar":
-            try:
-                caixa = self.db.obter_caixa_hoje()
-                if not caixa:
-                    CTkMessagebox(title="Erro", message="Caixa não encontrado!", icon="cancel")
-                    return
-                
-                valor_inicial = caixa[2]
-                total_vendas = self.db.obter_total_vendas_periodo(hoje, hoje)
-                valor_esperado = valor_inicial + total_vendas
-                
-                janela = ctk.CTkToplevel(self.janela)
-                janela.title("Fechar Caixa")
-                janela.geometry("400x300")
-                janela.transient(self.janela)
-                janela.grab_set()
+            self.executor.ler(
+                self.coletar_dados_caixa, ao_concluir=self.abrir_fechamento_caixa,
+                ao_falhar=lambda e: CTkMessagebox(title="Erro", message=f"Erro ao fechar caixa: {str(e)}", icon="cancel")
+            )
+    
+    def abrir_fechamento_caixa(self, dados):
+        """Janela de fechamento, com os totais lidos por coletar_dados_caixa"""
+        caixa = dados['caixa']
+        if not caixa:
+            CTkMessagebox(title="Erro", message="Caixa não encontrado!", icon="cancel")
+            return
+        
+        valor_inicial = caixa[2]
+        total_vendas = dados['total_vendas']
+        valor_esperado = valor_inicial + total_vendas
+        
+        janela = ctk.CTkToplevel(self.janela)
+        janela.title("Fechar Caixa")
+        janela.geometry("400x300")
+        janela.transient(self.janela)
+        janela.grab_set()
+        
+        ctk.CTkLabel(
+            janela,
+            text="💰 Fechamento de Caixa",
+            font=("Arial", 18, "bold")
+        ).pack(pady=20)
+        
+        info_text = f"""
+        Valor Inicial: R$ {valor_inicial:.2f}
+        Total em Vendas: R$ {total_vendas:.2f}
+        Total Esperado: R$ {valor_esperado:.2f}
+        """
+        
+        ctk.CTkLabel(janela, text=info_text, font=("Arial", 12)).pack(pady=10)
+        
+        ctk.CTkLabel(janela, text="Valor Físico no Caixa:").pack(pady=(20, 5))
+        entry_valor_fisico = ctk.CTkEntry(janela, width=200)
+        entry_valor_fisico.insert(0, f"{valor_esperado:.2f}")
+        entry_valor_fisico.pack(pady=(0, 20))
+        
+        def confirmar_fechamento():
+            try:
+                valor_fisico = float(entry_valor_fisico.get().replace(',', '.'))
+            except ValueError:
+                CTkMessagebox(title="Erro", message="Valor inválido!", icon="cancel")
+                return
+            
+            def fechado(_):
+                diferenca = valor_fisico - valor_esperado
                 
-                ctk.CTkLabel(
-                    janela,
-                    text="💰 Fechamento de Caixa",
-                    font=("Arial", 18, "bold")
-                ).pack(pady=20)
+                mensagem = f"""
+                ✅ Caixa fechado com sucesso!
                 
-                info_text = f"""
-                Valor Inicial: R$ {valor_inicial:.2f}
-                Total em Vendas: R$ {total_vendas:.2f}
-                Total Esperado: R$ {valor_esperado:.2f}
+                📊 Resumo:
+                • Valor Inicial: R$ {valor_inicial:.2f}
+                • Total em Vendas: R$ {total_vendas:.2f}
+                • Total Esperado: R$ {valor_esperado:.2f}
+                • Valor Físico: R$ {valor_fisico:.2f}
+                • Diferença: R$ {diferenca:.2f} {'(Sobra)' if diferenca >= 0 else '(Falta)'}
                 """
                 
-                ctk.CTkLabel(janela, text=info_text, font=("Arial", 12)).pack(pady=10)
-                
-                ctk.CTkLabel(janela, text="Valor Físico no Caixa:").pack(pady=(20, 5))
-                entry_valor_fisico = ctk.CTkEntry(janela, width=200)
-                entry_valor_fisico.insert(0, f"{valor_esperado:.2f}")
-                entry_valor_fisico.pack(pady=(0, 20))
-                
-                def confirmar_fechamento():
-                    try:
-                        valor_fisico = float(entry_valor_fisico.get().replace(',', '.'))
-                        
-                        self.db.fechar_caixa(valor_fisico)
-                        
-                        diferenca = valor_fisico - valor_esperado
-                        
-                        mensagem = f"""
-                        ✅ Caixa fechado com sucesso!
-                        
-                        📊 Resumo:
-                        • Valor Inicial: R$ {valor_inicial:.2f}
-                        • Total em Vendas: R$ {total_vendas:.2f}
-                        • Total Esperado: R$ {valor_esperado:.2f}
-                        • Valor Físico: R$ {valor_fisico:.2f}
-                        • Diferença: R$ {diferenca:.2f} {'(Sobra)' if diferenca >= 0 else '(Falta)'}
-                        """
-                        
-                        janela.destroy()
-                        CTkMessagebox(title="Caixa Fechado", message=mensagem, icon="check")
-                        self.mostrar_caixa()
-                        
-                    except ValueError:
-                        CTkMessagebox(title="Erro", message="Valor inválido!", icon="cancel")
-                
-                ctk.CTkButton(
-                    janela,
-                    text="🔒 Confirmar Fechamento",
-                    command=confirmar_fechamento,
-                    fg_color="#4CAF50",
-                    width=200
-                ).pack(pady=20)
-                
-            except Exception as e:
-                CTkMessagebox(title="Erro", message=f"Erro ao fechar caixa: {str(e)}", icon="cancel")
+                if janela.winfo_exists():
+                    janela.destroy()
+                CTkMessagebox(title="Caixa Fechado", message=mensagem, icon="check")
+                self.mostrar_caixa()
+            
+            self.executor.escrever(
+                "fechar_caixa", valor_fisico, ao_concluir=fechado,
+                ao_falhar=lambda e: CTkMessagebox(title="Erro", message=f"Erro ao fechar caixa: {str(e)}", icon="cancel")
+            )
+        
+        ctk.CTkButton(
+            janela,
+            text="🔒 Confirmar Fechamento",
+            command=confirmar_fechamento,
+            fg_color="#4CAF50",
+            width=200
+        ).pack(pady=20)
     
     # =============================================================
     # 7. NOVA VENDA COMPLETO E FUNCIONAL - CORRIGIDO
     # =============================================================
     def mostrar_nova_venda(self):
         """Módulo para iniciar serviço/vender produto"""
-        self.limpar_frame_principal()
+        self.telas.mostrar(
+            "nova_venda", self.construir_nova_venda, self.carregar_catalogo_venda,
+            tabelas=('servicos', 'produtos', 'clientes')
+        )
+    
+    def construir_nova_venda(self):
         
         ctk.CTkLabel(
             self.frame_principal,
@@ -2276,10 +5265,43 @@ class BarbeariaApp:
             command=self.atualizar_lista_itens_venda
         ).pack(side="left")
         
-        # Lista de itens
+        # Catálogo: filtro + lista virtual (Enter ou duplo clique adiciona)
+        self.entry_filtro_itens = ctk.CTkEntry(
+            frame_esquerda, placeholder_text="Filtrar itens... (Enter adiciona, ↓ vai para a lista)"
+        )
+        self.entry_filtro_itens.pack(fill="x", padx=20, pady=(0, 5))
+        self.entry_filtro_itens.bind("<KeyRelease>", self.filtrar_catalogo_venda)
+        self.entry_filtro_itens.bind("<Return>", lambda e: self.adicionar_item_catalogo(primeiro=True))
+        self.entry_filtro_itens.bind("<Down>", self.focar_catalogo_venda)
+        
         self.frame_lista_itens = ctk.CTkFrame(frame_esquerda)
         self.frame_lista_itens.pack(fill="both", expand=True, padx=20, pady=(0, 10))
         
+        self.tree_itens_venda = ttk.Treeview(
+            self.frame_lista_itens,
+            columns=("Item", "Valor", "Detalhe"),
+            show="headings",
+            height=10
+        )
+        for col, largura in (("Item", 220), ("Valor", 90), ("Detalhe", 110)):
+            self.tree_itens_venda.heading(col, text=col)
+            self.tree_itens_venda.column(col, width=largura)
+        
+        scrollbar_itens = ttk.Scrollbar(self.frame_lista_itens, orient="vertical")
+        self.tree_itens_venda.pack(side="left", fill="both", expand=True)
+        scrollbar_itens.pack(side="right", fill="y")
+        
+        self.lista_itens_venda = TreeviewVirtual(
+            self, self.tree_itens_venda, scrollbar_itens, self.formatar_item_catalogo,
+            ordens={"Item": 1, "Valor": 2},
+            chave=lambda item: item[0]
+        )
+        self.tree_itens_venda.bind("<Return>", lambda e: self.adicionar_item_catalogo())
+        self.tree_itens_venda.bind("<Double-1>", lambda e: self.adicionar_item_catalogo())
+        
+        # Serviços e produtos ativos, lidos uma vez e filtrados na memória
+        self.catalogo_venda = {'servico': [], 'produto': []}
+        
         # Quantidade (apenas para produtos)
         self.frame_quantidade = ctk.CTkFrame(frame_esquerda, fg_color="transparent")
         self.frame_quantidade.pack(fill="x", padx=20, pady=(0, 10))
@@ -2342,10 +5364,14 @@ class BarbeariaApp:
             font=("Arial", 16, "bold")
         ).pack(pady=30, padx=50, fill="x")
         
-        # Inicializar lista de itens
-        self.itens_selecionados = []
+        # Carrinho: cada alteração mexe só na linha afetada do resumo
+        self.carrinho = CarrinhoVenda()
+        self.carrinho.ouvintes.append(self.atualizar_resumo_venda)
+        self.linhas_carrinho = {}
         self.cliente_venda_id = None
+        self.venda_em_andamento = False
         self.atualizar_lista_itens_venda()
+        self.carregar_catalogo_venda()
     
     def buscar_cliente_venda(self):
         """Busca cliente por telefone"""
@@ -2355,7 +5381,15 @@ class BarbeariaApp:
             CTkMessagebox(title="Aviso", message="Digite um telefone!", icon="warning")
             return
         
-        cliente = self.db.buscar_cliente_por_telefone(telefone)
+        self.executor.ler(
+            "buscar_cliente_por_telefone", telefone,
+            ao_concluir=lambda cliente: self.mostrar_cliente_venda(cliente, telefone)
+        )
+    
+    def mostrar_cliente_venda(self, cliente, telefone):
+        """Mostra o resultado da busca de buscar_cliente_venda"""
+        if not self.frame_info_cliente.winfo_exists():
+            return  # A tela de venda foi fechada durante a busca
         
         if cliente:
             self.cliente_venda_id = cliente[0]
@@ -2418,14 +5452,32 @@ class BarbeariaApp:
                 CTkMessagebox(title="Erro", message="Preencha nome e telefone!", icon="cancel")
                 return
             
-            try:
-                cliente_id = self.db.adicionar_cliente(nome, telefone)
-                self.cliente_venda_id = cliente_id
-                janela.destroy()
+            def gravar(db):
+                """Roda na thread de escrita: (telefone gravado, se é novo)"""
+                existente = db.buscar_cliente_por_telefone(telefone)
+                if existente:
+                    # Mesmo telefone com outra formatação: usa o cadastro existente
+                    return existente[2], False
+                db.adicionar_cliente(nome, telefone)
+                return telefone, True
+            
+            def cadastrado(resultado):
+                telefone_gravado, novo = resultado
+                if janela.winfo_exists():
+                    janela.destroy()
+                if not self.entry_telefone_cliente.winfo_exists():
+                    return
+                
+                self.entry_telefone_cliente.delete(0, "end")
+                self.entry_telefone_cliente.insert(0, telefone_gravado)
                 self.buscar_cliente_venda()  # Atualizar display
-                CTkMessagebox(title="Sucesso", message="Cliente cadastrado!", icon="check")
-            except Exception as e:
-                CTkMessagebox(title="Erro", message=f"Erro ao cadastrar: {str(e)}", icon="cancel")
+                if novo:
+                    CTkMessagebox(title="Sucesso", message="Cliente cadastrado!", icon="check")
+            
+            self.executor.escrever(
+                gravar, ao_concluir=cadastrado,
+                ao_falhar=lambda e: CTkMessagebox(title="Erro", message=f"Erro ao cadastrar: {str(e)}", icon="cancel")
+            )
         
         ctk.CTkButton(
             janela,
@@ -2434,49 +5486,70 @@ class BarbeariaApp:
             width=200
         ).pack(pady=20)
     
-    def atualizar_lista_itens_venda(self):
-        """Atualiza a lista de itens (serviços ou produtos)"""
-        # Limpar frame
-        for widget in self.frame_lista_itens.winfo_children():
-            widget.destroy()
+    def carregar_catalogo_venda(self):
+        """Lê serviços e produtos de uma vez; trocar o tipo ou filtrar
+        depois disso não consulta o banco"""
+        def ler(db):
+            return {'servico': db.obter_servicos(), 'produto': db.obter_produtos()}
         
-        tipo = self.tipo_venda.get()
-        
-        if tipo == "servico":
-            itens = self.db.obter_servicos()
-            for servico in itens:
-                btn = ctk.CTkButton(
-                    self.frame_lista_itens,
-                    text=f"{servico[1]} - R$ {servico[2]:.2f} ({servico[3]} min)",
-                    command=lambda s=servico: self.adicionar_item_venda(s, "servico"),
-                    anchor="w",
-                    fg_color="transparent",
-                    hover_color="#2B2B2B",
-                    height=40
-                )
-                btn.pack(fill="x", pady=2)
-        else:
-            itens = self.db.obter_produtos()
-            for produto in itens:
-                btn = ctk.CTkButton(
-                    self.frame_lista_itens,
-                    text=f"{produto[1]} - R$ {produto[2]:.2f} (Estoque: {produto[4]})",
-                    command=lambda p=produto: self.adicionar_item_venda(p, "produto"),
-                    anchor="w",
-                    fg_color="transparent",
-                    hover_color="#2B2B2B",
-                    height=40
-                )
-                btn.pack(fill="x", pady=2)
+        def preencher(catalogo):
+            self.catalogo_venda = catalogo
+            self.filtrar_catalogo_venda()
+        
+        self.ler_em_segundo_plano(self.frame_lista_itens, ler, ao_concluir=preencher)
+    
+    def atualizar_lista_itens_venda(self):
+        """Troca o catálogo exibido (serviços ou produtos)"""
+        self.filtrar_catalogo_venda()
         
         # Mostrar/ocultar quantidade
-        if tipo == "produto":
+        if self.tipo_venda.get() == "produto":
             self.frame_quantidade.pack(fill="x", padx=20, pady=(0, 10))
         else:
             self.frame_quantidade.pack_forget()
     
+    def filtrar_catalogo_venda(self, evento=None):
+        palavras = self.entry_filtro_itens.get().casefold().split()
+        itens = self.catalogo_venda[self.tipo_venda.get()]
+        if palavras:
+            itens = [item for item in itens if all(p in item[1].casefold() for p in palavras)]
+        self.lista_itens_venda.inicio = 0
+        self.lista_itens_venda.definir_linhas(itens)
+    
+    def formatar_item_catalogo(self, item):
+        if self.tipo_venda.get() == "servico":
+            detalhe = f"{item[3]} min"
+        else:
+            detalhe = f"Estoque: {item[4]}"
+        return (item[1], f"R$ {item[2]:.2f}", detalhe)
+    
+    def focar_catalogo_venda(self, evento=None):
+        """Seta para baixo no filtro: passa para a primeira linha da lista"""
+        itens = self.tree_itens_venda.get_children()
+        if itens:
+            self.tree_itens_venda.focus_set()
+            self.tree_itens_venda.selection_set(itens[0])
+            self.tree_itens_venda.focus(itens[0])
+        return "break"
+    
+    def adicionar_item_catalogo(self, primeiro=False):
+        """Adiciona o item selecionado (ou, do filtro, o primeiro da lista)"""
+        lista = self.lista_itens_venda
+        selecionado = self.tree_itens_venda.selection()
+        if selecionado and not primeiro:
+            item = lista.obter_linha(int(selecionado[0]))
+        else:
+            item = lista.linhas[0] if lista.linhas else None
+        
+        if item is not None:
+            self.adicionar_item_venda(item, self.tipo_venda.get())
+        return "break"
+    
     def adicionar_item_venda(self, item, tipo):
         """Adiciona item à lista de vendas"""
+        if self.venda_em_andamento:
+            return  # O carrinho só muda depois que a venda for gravada
+        
         try:
             quantidade = 1
             if tipo == "produto":
@@ -2485,48 +5558,28 @@ class BarbeariaApp:
                     CTkMessagebox(title="Erro", message="Quantidade deve ser maior que zero!", icon="cancel")
                     return
                 
-                # Verificar estoque
-                if quantidade > item[4]:
+                # Verificar estoque (somando o que já está no carrinho)
+                if quantidade + self.carrinho.quantidade(tipo, item[0]) > item[4]:
                     CTkMessagebox(title="Erro", message=f"Estoque insuficiente! Disponível: {item[4]}", icon="cancel")
                     return
             
             valor_unitario = item[2] if tipo == "servico" else item[2]  # item[2] é valor_venda para produtos
-            valor_total = valor_unitario * quantidade
-            
-            # Adicionar à lista
-            self.itens_selecionados.append({
-                'id': item[0],
-                'nome': item[1],
-                'tipo': tipo,
-                'quantidade': quantidade,
-                'valor_unitario': valor_unitario,
-                'valor_total': valor_total
-            })
             
-            self.atualizar_resumo_venda()
+            # Adicionar ao carrinho (o mesmo item só aumenta a quantidade)
+            self.carrinho.adicionar(tipo, item[0], item[1], valor_unitario, quantidade)
             
         except ValueError:
             CTkMessagebox(title="Erro", message="Quantidade inválida!", icon="cancel")
     
-    def atualizar_resumo_venda(self):
-        """Atualiza o resumo da venda"""
-        # Limpar frame
-        for widget in self.frame_itens_selecionados.winfo_children():
-            widget.destroy()
-        
-        total = 0
-        
-        for i, item in enumerate(self.itens_selecionados):
+    def atualizar_resumo_venda(self, evento, chave, item):
+        """Aplica ao resumo uma alteração do carrinho"""
+        if evento == 'adicionado':
             frame_item = ctk.CTkFrame(self.frame_itens_selecionados, fg_color="#2B2B2B")
             frame_item.pack(fill="x", pady=2, padx=2)
             
             # Nome e valor
-            info_text = f"{item['nome']} - {item['quantidade']}x R$ {item['valor_unitario']:.2f} = R$ {item['valor_total']:.2f}"
-            ctk.CTkLabel(
-                frame_item,
-                text=info_text,
-                font=("Arial", 11)
-            ).pack(side="left", padx=10, pady=5)
+            label = ctk.CTkLabel(frame_item, text="", font=("Arial", 11))
+            label.pack(side="left", padx=10, pady=5)
             
             # Botão remover
             ctk.CTkButton(
@@ -2534,23 +5587,36 @@ class BarbeariaApp:
                 text="❌",
                 width=30,
                 height=30,
-                command=lambda idx=i: self.remover_item_venda(idx)
+                command=lambda: self.remover_item_venda(chave)
             ).pack(side="right", padx=5)
             
-            total += item['valor_total']
+            self.linhas_carrinho[chave] = (frame_item, label)
+        elif evento == 'removido':
+            self.linhas_carrinho.pop(chave)[0].destroy()
+        elif evento == 'limpo':
+            for frame_item, _label in self.linhas_carrinho.values():
+                frame_item.destroy()
+            self.linhas_carrinho.clear()
+        
+        if item is not None and chave in self.linhas_carrinho:
+            self.linhas_carrinho[chave][1].configure(
+                text=f"{item['nome']} - {item['quantidade']}x R$ {item['valor_unitario']:.2f} = R$ {item['valor_total']:.2f}"
+            )
         
         # Atualizar total
-        self.label_total.configure(text=f"Total: R$ {total:.2f}")
+        self.label_total.configure(text=f"Total: R$ {self.carrinho.total:.2f}")
     
-    def remover_item_venda(self, index):
-        """Remove item da lista de vendas"""
-        if 0 <= index < len(self.itens_selecionados):
-            self.itens_selecionados.pop(index)
-            self.atualizar_resumo_venda()
+    def remover_item_venda(self, chave):
+        """Remove a linha do carrinho, a não ser que a venda esteja sendo gravada"""
+        if not self.venda_em_andamento:
+            self.carrinho.remover(chave)
     
     def finalizar_venda(self):
         """Finaliza a venda"""
-        if not self.itens_selecionados:
+        if self.venda_em_andamento:
+            return
+        
+        if not self.carrinho:
             CTkMessagebox(title="Aviso", message="Adicione itens à venda!", icon="warning")
             return
         
@@ -2567,7 +5633,7 @@ class BarbeariaApp:
                 return
         
         # Calcular total
-        total = sum(item['valor_total'] for item in self.itens_selecionados)
+        total = self.carrinho.total
         
         # Confirmar venda
         resposta = CTkMessagebox(
@@ -2579,56 +5645,100 @@ class BarbeariaApp:
         )
         
         if resposta.get() == "Finalizar":
-            try:
-                # Registrar cada item
-                for item in self.itens_selecionados:
-                    self.db.registrar_venda(
-                        self.cliente_venda_id,
-                        item['tipo'],
-                        item['id'],
-                        item['quantidade'],
-                        item['valor_unitario'],
-                        self.forma_pagamento.get()
-                    )
+            forma_pagamento = self.forma_pagamento.get()
+            self.venda_em_andamento = True
+            
+            def concluida(_total):
+                self.venda_em_andamento = False
                 
                 # Limpar tudo
-                self.itens_selecionados = []
-                self.entry_telefone_cliente.delete(0, "end")
-                self.cliente_venda_id = None
-                self.label_info_cliente.configure(text="Digite um telefone e clique em Buscar")
-                self.frame_info_cliente.configure(fg_color="#E8F5E9")
-                self.atualizar_resumo_venda()
+                if self.frame_itens_selecionados.winfo_exists():
+                    self.carrinho.limpar()
+                    self.entry_telefone_cliente.delete(0, "end")
+                    self.cliente_venda_id = None
+                    self.label_info_cliente.configure(text="Digite um telefone e clique em Buscar")
+                    self.frame_info_cliente.configure(fg_color="#E8F5E9")
+                    self.carregar_catalogo_venda()  # Estoque mudou
                 
                 # Mostrar recibo
                 CTkMessagebox(
                     title="Venda Concluída!",
-                    message=f"✅ Venda registrada com sucesso!\n\nTotal: R$ {total:.2f}\nForma de pagamento: {self.forma_pagamento.get()}",
+                    message=f"✅ Venda registrada com sucesso!\n\nTotal: R$ {total:.2f}\nForma de pagamento: {forma_pagamento}",
                     icon="check"
                 )
-                
-            except Exception as e:
+            
+            def falhou(e):
+                self.venda_em_andamento = False
                 CTkMessagebox(title="Erro", message=f"Erro ao registrar venda: {str(e)}", icon="cancel")
+            
+            # Registrar todos os itens em uma única transação, na thread de escrita
+            self.executor.escrever(
+                "registrar_venda_lote",
+                self.cliente_venda_id,
+                self.carrinho.itens(),
+                forma_pagamento,
+                ao_concluir=concluida,
+                ao_falhar=falhou
+            )
     
     # =============================================================
     # 8. RELATÓRIOS COMPLETO COM BOTÃO BAIXAR - CORRIGIDO
     # =============================================================
     def mostrar_relatorios(self):
-        self.limpar_frame_principal()
+        self.telas.mostrar(
+            "relatorios", self.construir_relatorios, self.selecionar_aba_relatorio,
+            tabelas=('vendas', 'despesas', 'clientes', 'servicos', 'produtos'),
+            contexto=lambda: datetime.now().strftime("%Y-%m-%d")
+        )
+    
+    # Abas dos relatórios: método que constrói a aba e tabelas que ela consulta
+    ABAS_RELATORIOS = {
+        "Financeiro": ("criar_relatorio_financeiro", ()),
+        "Vendas": ("criar_relatorio_vendas", ('vendas', 'clientes', 'servicos', 'produtos')),
+        "Clientes": ("criar_relatorio_clientes", ('clientes', 'vendas')),
+        "Serviços": ("criar_relatorio_servicos", ('vendas', 'servicos')),
+        "Produtos": ("criar_relatorio_produtos", ('vendas', 'produtos')),
+    }
+    
+    def construir_relatorios(self):
+        self.notebook_relatorios = ctk.CTkTabview(
+            self.frame_principal, command=self.selecionar_aba_relatorio
+        )
+        self.notebook_relatorios.pack(fill="both", expand=True, padx=20, pady=20)
         
-        notebook = ctk.CTkTabview(self.frame_principal)
-        notebook.pack(fill="both", expand=True, padx=20, pady=20)
+        for nome in self.ABAS_RELATORIOS:
+            self.notebook_relatorios.add(nome)
+        
+        self.construir_painel_exportacoes()
+        
+        # Versão dos dados com que cada aba foi construída
+        self.versoes_abas_relatorios = {}
+        self.selecionar_aba_relatorio()
+    
+    def selecionar_aba_relatorio(self):
+        """Constrói a aba selecionada na primeira vez que ela é aberta e a
+        refaz só se as tabelas que ela consulta mudaram desde então"""
+        nome = self.notebook_relatorios.get()
+        metodo, tabelas = self.ABAS_RELATORIOS[nome]
+        versao = self.db.versao_tabelas(*tabelas) + (datetime.now().strftime("%Y-%m-%d"),)
+        if self.versoes_abas_relatorios.get(nome) == versao:
+            return
         
-        notebook.add("Financeiro")
-        notebook.add("Vendas")
-        notebook.add("Clientes")
-        notebook.add("Serviços")
-        notebook.add("Produtos")
+        frame = self.notebook_relatorios.tab(nome)
+        for widget in frame.winfo_children():
+            widget.destroy()
         
-        self.criar_relatorio_financeiro(notebook.tab("Financeiro"))
-        self.criar_relatorio_vendas(notebook.tab("Vendas"))
-        self.criar_relatorio_clientes(notebook.tab("Clientes"))
-        self.criar_relatorio_servicos(notebook.tab("Serviços"))
-        self.criar_relatorio_produtos(notebook.tab("Produtos"))
+        self.versoes_abas_relatorios[nome] = versao
+        getattr(self, metodo)(frame)
+    
+    def analisar_periodo(self, frame, data_inicio, data_fim, calcular, ao_concluir):
+        """Roda calcular(analise) em uma thread de leitura e entrega o
+        resultado a ao_concluir. O AnalisePeriodo vem do cache dos
+        relatórios (Database.obter_analise_periodo) quando nada mudou."""
+        def ler(db):
+            return calcular(db.obter_analise_periodo(data_inicio, data_fim))
+        
+        self.ler_em_segundo_plano(frame, ler, ao_concluir=ao_concluir)
     
     def criar_relatorio_financeiro(self, frame):
         ctk.CTkLabel(frame, text="📊 Relatório Financeiro", font=("Arial", 18, "bold")).pack(pady=20)
@@ -2669,6 +5779,14 @@ class BarbeariaApp:
             command=self.baixar_relatorio_excel,
             fg_color="#4CAF50",
             width=150
+        ).pack(side="left", padx=(0, 10))
+        
+        ctk.CTkButton(
+            frame_botoes,
+            text="🗄️ Arquivar Histórico",
+            command=self.arquivar_historico,
+            fg_color="gray",
+            width=150
         ).pack(side="left")
         
         self.frame_resultados_rel = ctk.CTkFrame(frame)
@@ -2678,48 +5796,86 @@ class BarbeariaApp:
         data_inicio = self.entry_rel_inicio.get()
         data_fim = self.entry_rel_fim.get()
         
-        try:
-            resumo = self.db.obter_resumo_financeiro(data_inicio, data_fim)
-            
-            for widget in self.frame_resultados_rel.winfo_children():
-                widget.destroy()
-            
-            metricas = [
-                ("💰 Total em Vendas", f"R$ {resumo['total_vendas']:,.2f}", "#4CAF50"),
-                ("💸 Total em Despesas", f"R$ {resumo['total_despesas']:,.2f}", "#F44336"),
-                ("📈 Lucro Líquido", f"R$ {resumo['lucro']:,.2f}", "#4CAF50" if resumo['lucro'] >= 0 else "#F44336"),
-            ]
+        def calcular(analise):
+            formas = analise.formas_pagamento()
+            return (
+                analise.resumo_financeiro(),
+                list(formas.itertuples(index=False, name=None)),
+                analise.agendamentos_por_status(),
+            )
+        
+        self.analisar_periodo(
+            self.frame_resultados_rel, data_inicio, data_fim, calcular,
+            ao_concluir=lambda dados: self.exibir_resumo_financeiro(*dados, data_inicio, data_fim)
+        )
+    
+    def exibir_resumo_financeiro(self, resumo, formas_pagamento, agendamentos, data_inicio, data_fim):
+        for widget in self.frame_resultados_rel.winfo_children():
+            widget.destroy()
+        
+        metricas = [
+            ("💰 Total em Vendas", f"R$ {resumo['total_vendas']:,.2f}", "#4CAF50"),
+            ("💸 Total em Despesas", f"R$ {resumo['total_despesas']:,.2f}", "#F44336"),
+            ("📈 Lucro Líquido", f"R$ {resumo['lucro']:,.2f}", "#4CAF50" if resumo['lucro'] >= 0 else "#F44336"),
+        ]
+        
+        for titulo, valor, cor in metricas:
+            linha = ctk.CTkFrame(self.frame_resultados_rel, fg_color=cor, corner_radius=8)
+            linha.pack(fill="x", padx=50, pady=5)
             
-            for titulo, valor, cor in metricas:
-                linha = ctk.CTkFrame(self.frame_resultados_rel, fg_color=cor, corner_radius=8)
-                linha.pack(fill="x", padx=50, pady=5)
-                
-                ctk.CTkLabel(linha, text=titulo, font=("Arial", 14)).pack(side="left", padx=20, pady=10)
-                ctk.CTkLabel(linha, text=valor, font=("Arial", 16, "bold")).pack(side="right", padx=20, pady=10)
+            ctk.CTkLabel(linha, text=titulo, font=("Arial", 14)).pack(side="left", padx=20, pady=10)
+            ctk.CTkLabel(linha, text=valor, font=("Arial", 16, "bold")).pack(side="right", padx=20, pady=10)
+        
+        if resumo['margem'] is not None:
+            margem = resumo['margem']
+            linha_margem = ctk.CTkFrame(self.frame_resultados_rel)
+            linha_margem.pack(fill="x", padx=50, pady=10)
             
-            if resumo['total_vendas'] > 0:
-                margem = (resumo['lucro'] / resumo['total_vendas']) * 100
-                linha_margem = ctk.CTkFrame(self.frame_resultados_rel)
-                linha_margem.pack(fill="x", padx=50, pady=10)
-                
-                ctk.CTkLabel(
-                    linha_margem,
-                    text=f"📊 Margem de Lucro: {margem:.1f}%",
-                    font=("Arial", 14),
-                    text_color="#4CAF50" if margem >= 0 else "#F44336"
-                ).pack()
+            ctk.CTkLabel(
+                linha_margem,
+                text=f"📊 Margem de Lucro: {margem:.1f}%",
+                font=("Arial", 14),
+                text_color="#4CAF50" if margem >= 0 else "#F44336"
+            ).pack()
             
-            ctk.CTkButton(
+            ctk.CTkLabel(
+                linha_margem,
+                text=f"🧾 {resumo['atendimentos']} atendimentos · Ticket médio: R$ {resumo['ticket_medio']:,.2f}"
+                     f" · Custo dos produtos: R$ {resumo['custo_produtos']:,.2f}",
+                font=("Arial", 12)
+            ).pack(pady=(5, 0))
+        
+        if formas_pagamento:
+            texto = "  ·  ".join(
+                f"{forma}: R$ {total:,.2f} ({participacao:.0f}%)"
+                for forma, _vendas, total, participacao in formas_pagamento
+            )
+            ctk.CTkLabel(
                 self.frame_resultados_rel,
-                text="📥 Baixar Relatório Detalhado",
-                command=lambda: self.baixar_relatorio_excel(data_inicio, data_fim),
-                fg_color="#2196F3",
-                width=250,
-                height=40
-            ).pack(pady=20)
-            
-        except Exception as e:
-            CTkMessagebox(title="Erro", message=f"Erro: {str(e)}", icon="cancel")
+                text=f"💳 {texto}",
+                font=("Arial", 12),
+                wraplength=700
+            ).pack(padx=50, pady=5)
+        
+        if agendamentos:
+            texto = "  ·  ".join(
+                f"{self.STATUS_AGENDAMENTO.get(status, ('', status))[1]}: {quantidade}"
+                for status, quantidade in agendamentos.items()
+            )
+            ctk.CTkLabel(
+                self.frame_resultados_rel,
+                text=f"📅 Agendamentos: {texto}",
+                font=("Arial", 12)
+            ).pack(padx=50, pady=5)
+        
+        ctk.CTkButton(
+            self.frame_resultados_rel,
+            text="📥 Baixar Relatório Detalhado",
+            command=lambda: self.baixar_relatorio_excel(data_inicio, data_fim),
+            fg_color="#2196F3",
+            width=250,
+            height=40
+        ).pack(pady=20)
     
     def baixar_relatorio_excel(self, data_inicio=None, data_fim=None):
         if not data_inicio:
@@ -2727,55 +5883,222 @@ class BarbeariaApp:
         if not data_fim:
             data_fim = self.entry_rel_fim.get()
         
-        try:
-            vendas = self.db.obter_vendas_periodo(data_inicio, data_fim)
-            despesas = self.db.obter_despesas_periodo(data_inicio, data_fim)
-            
-            if not vendas and not despesas:
+        def contar(db):
+            # vendas_diarias já inclui as vendas arquivadas
+            return (db.contar_vendas_periodo(data_inicio, data_fim)
+                    + db.contar_despesas_periodo(data_inicio, data_fim)
+                    + db.contar_historico('despesas', data_inicio, data_fim))
+        
+        def salvar(linhas):
+            if not linhas:
                 CTkMessagebox(title="Aviso", message="Nenhum dado encontrado para o período!", icon="warning")
                 return
             
-            arquivo = filedialog.asksaveasfilename(
-                defaultextension=".xlsx",
-                filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
-                initialfile=f"relatorio_{data_inicio}_{data_fim}.xlsx"
-            )
-            
+            arquivo = self.escolher_arquivo_exportacao(f"relatorio_{data_inicio}_{data_fim}")
             if not arquivo:
                 return
             
-            with pd.ExcelWriter(arquivo, engine='openpyxl') as writer:
-                if vendas:
-                    df_vendas = pd.DataFrame(vendas, columns=[
-                        'ID', 'Cliente_ID', 'Tipo', 'Item_ID', 'Quantidade', 
-                        'Valor_Unitario', 'Valor_Total', 'Forma_Pagamento', 'Data', 'Item_Nome', 'Cliente_Nome'
-                    ])
-                    df_vendas.to_excel(writer, sheet_name='Vendas', index=False)
-                
-                if despesas:
-                    df_despesas = pd.DataFrame(despesas, columns=[
-                        'ID', 'Descricao', 'Categoria', 'Valor', 'Data', 'Forma_Pagamento', 'Observacoes'
-                    ])
-                    df_despesas.to_excel(writer, sheet_name='Despesas', index=False)
-                
-                resumo = self.db.obter_resumo_financeiro(data_inicio, data_fim)
-                df_resumo = pd.DataFrame([resumo])
-                df_resumo.to_excel(writer, sheet_name='Resumo', index=False)
-            
+            self.fila_exportacoes.adicionar(
+                ExportacaoPlanilha(arquivo, self.abas_relatorio_financeiro(data_inicio, data_fim), contar=contar)
+            )
+        
+        self.ler_em_segundo_plano(self.frame_resultados_rel, contar, ao_concluir=salvar)
+    
+    @staticmethod
+    def abas_relatorio_financeiro(data_inicio, data_fim):
+        """Abas do relatório financeiro: vendas e despesas (banco e histórico)
+        linha a linha; as de resumo saem do AnalisePeriodo somado durante
+        elas, com as mesmas contas das abas da tela"""
+        periodo = (data_inicio, data_fim)
+        analise = AnalisePeriodo(data_inicio, data_fim)
+        
+        def pagamentos(db):
+            return [
+                (forma, vendas, round(total, 2))
+                for forma, vendas, total, _participacao in analise.formas_pagamento().itertuples(index=False)
+            ]
+        
+        def itens(tipo):
+            return lambda db: [
+                (nome, quantidade, round(faturamento, 2))
+                for nome, quantidade, faturamento, *_ in analise.ranking_itens(tipo).itertuples(index=False)
+            ]
+        
+        def clientes(db):
+            analise.ler_clientes(db)
+            return [
+                (nome, telefone, round(total, 2), visitas, round(media, 2))
+                for _id, nome, telefone, total, visitas, media in analise.ranking_clientes(20).itertuples(index=False)
+            ]
+        
+        def resumo(db):
+            valores = analise.resumo_financeiro()
+            return [(
+                round(valores['total_vendas'], 2),
+                round(valores['total_despesas'], 2),
+                round(valores['lucro'], 2),
+                round(valores['margem'], 2) if valores['margem'] is not None else None,
+                valores['atendimentos'],
+                round(valores['ticket_medio'], 2),
+                round(valores['custo_produtos'], 2),
+            )]
+        
+        return [
+            ("Vendas", Database.COLUNAS_EXPORTACAO_VENDAS,
+             lambda db: analise.repassar_vendas(db, db.iterar_vendas_exportacao(*periodo))),
+            ("Despesas", Database.COLUNAS_EXPORTACAO_DESPESAS,
+             lambda db: analise.repassar_despesas(db.iterar_despesas_exportacao(*periodo))),
+            ("Pagamentos", ("Forma_Pagamento", "Vendas", "Total"), pagamentos),
+            ("Serviços", ("Servico", "Quantidade", "Total"), itens('servico')),
+            ("Produtos", ("Produto", "Quantidade", "Total"), itens('produto')),
+            ("Clientes", ("Cliente", "Telefone", "Total", "Visitas", "Media"), clientes),
+            ("Resumo", ("Total_Vendas", "Total_Despesas", "Lucro", "Margem",
+                        "Atendimentos", "Ticket_Medio", "Custo_Produtos"), resumo),
+        ]
+    
+    def escolher_arquivo_exportacao(self, nome):
+        return filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("All files", "*.*")],
+            initialfile=f"{nome}.xlsx"
+        )
+    
+    def construir_painel_exportacoes(self):
+        """Painel das exportações na tela de relatórios (só aparece quando há alguma)"""
+        self.frame_exportacoes = ctk.CTkFrame(self.frame_principal)
+        self.linhas_exportacoes = {}
+        ctk.CTkLabel(
+            self.frame_exportacoes, text="📥 Exportações", font=("Arial", 14, "bold")
+        ).pack(anchor="w", padx=10, pady=(8, 4))
+        
+        for exportacao in self.fila_exportacoes.exportacoes:
+            self.adicionar_linha_exportacao(exportacao)
+        self.mostrar_painel_exportacoes()
+    
+    def mostrar_painel_exportacoes(self):
+        if not self.linhas_exportacoes:
+            self.frame_exportacoes.pack_forget()
+        elif not self.frame_exportacoes.winfo_ismapped():
+            self.frame_exportacoes.pack(
+                side="bottom", fill="x", padx=20, pady=(0, 20), before=self.notebook_relatorios
+            )
+    
+    def adicionar_linha_exportacao(self, exportacao):
+        linha = ctk.CTkFrame(self.frame_exportacoes, fg_color="transparent")
+        linha.pack(fill="x", padx=10, pady=(0, 6))
+        
+        ctk.CTkLabel(linha, text=exportacao.titulo, width=280, anchor="w").pack(side="left")
+        barra = ctk.CTkProgressBar(linha, width=200)
+        barra.set(0)
+        barra.pack(side="left", padx=10)
+        label_estado = ctk.CTkLabel(linha, text="", width=200, anchor="w", text_color="gray")
+        label_estado.pack(side="left")
+        botao = ctk.CTkButton(linha, text="", width=100)
+        botao.pack(side="right")
+        
+        self.linhas_exportacoes[exportacao] = (linha, barra, label_estado, botao)
+        self.atualizar_linha_exportacao(exportacao)
+    
+    # Texto de cada estado da exportação no painel
+    ESTADOS_EXPORTACAO = {
+        'na_fila': "⏳ Na fila",
+        'concluida': "✅ Concluída",
+        'falhou': "❌ Falhou",
+        'cancelada': "🚫 Cancelada",
+    }
+    
+    def atualizar_linha_exportacao(self, exportacao):
+        _linha, barra, label_estado, botao = self.linhas_exportacoes[exportacao]
+        estado = exportacao.estado
+        
+        if estado == 'gravando':
+            progresso = exportacao.progresso()
+            if progresso is None:
+                label_estado.configure(text="Preparando...")
+            else:
+                barra.set(progresso)
+                label_estado.configure(
+                    text=f"{exportacao.gravadas:,} de {exportacao.total:,} linhas".replace(",", ".")
+                )
+        else:
+            label_estado.configure(text=self.ESTADOS_EXPORTACAO[estado])
+            if estado == 'concluida':
+                barra.set(1)
+        
+        if estado in ('na_fila', 'gravando'):
+            botao.configure(
+                text="✖ Cancelar", fg_color="#F44336",
+                command=lambda: self.fila_exportacoes.cancelar(exportacao)
+            )
+        else:
+            botao.configure(
+                text="Remover", fg_color="gray",
+                command=lambda: self.fila_exportacoes.remover(exportacao)
+            )
+    
+    def atualizar_painel_exportacoes(self, evento, exportacao):
+        """Ouvinte da FilaExportacoes: avisa quando uma exportação termina e
+        atualiza o painel, se a tela de relatórios já foi construída"""
+        if evento == 'concluida':
             CTkMessagebox(
                 title="✅ Relatório Baixado!",
-                message=f"Relatório salvo em:\n{arquivo}",
+                message="Relatório salvo em:\n" + "\n".join(exportacao.arquivos()),
                 icon="check"
             )
-            
-        except ImportError:
+        elif evento == 'falhou':
+            self.erro_exportacao(exportacao.erro)
+        
+        painel = getattr(self, 'frame_exportacoes', None)
+        if painel is None or not painel.winfo_exists():
+            return
+        
+        if evento == 'adicionada':
+            self.adicionar_linha_exportacao(exportacao)
+        elif evento == 'removida':
+            self.linhas_exportacoes.pop(exportacao)[0].destroy()
+        else:
+            self.atualizar_linha_exportacao(exportacao)
+        self.mostrar_painel_exportacoes()
+    
+    def arquivar_historico(self):
+        resposta = CTkMessagebox(
+            title="Arquivar Histórico",
+            message=f"Mover para a pasta 'historico' as vendas, despesas e agendamentos "
+                    f"com mais de {Database.MESES_NO_BANCO} meses?\n"
+                    f"Os relatórios e exportações continuam incluindo esses dados.",
+            icon="question",
+            option_1="Cancelar",
+            option_2="Arquivar"
+        )
+        if resposta.get() != "Arquivar":
+            return
+        
+        def concluir(movidas):
+            if not movidas:
+                CTkMessagebox(title="Info", message="Nenhum mês para arquivar.", icon="info")
+                return
+            texto = "\n".join(f"{tabela.capitalize()}: {linhas:,} linhas".replace(",", ".")
+                              for tabela, linhas in movidas.items())
+            CTkMessagebox(title="✅ Histórico Arquivado", message=texto, icon="check")
+        
+        def falhar(erro):
+            if isinstance(erro, ImportError):
+                mensagem = "Instale o pandas para arquivar o histórico:\npip install pandas"
+            else:
+                mensagem = f"Erro ao arquivar: {str(erro)}"
+            CTkMessagebox(title="Erro", message=mensagem, icon="cancel")
+        
+        self.executor.escrever("arquivar_historico", ao_concluir=concluir, ao_falhar=falhar)
+    
+    def erro_exportacao(self, erro):
+        if isinstance(erro, ImportError):
             CTkMessagebox(
                 title="Erro",
-                message="Instale pandas e openpyxl:\npip install pandas openpyxl",
+                message="Instale o openpyxl (pip install openpyxl)\nou salve o relatório como .csv",
                 icon="cancel"
             )
-        except Exception as e:
-            CTkMessagebox(title="Erro", message=f"Erro ao salvar: {str(e)}", icon="cancel")
+        else:
+            CTkMessagebox(title="Erro", message=f"Erro ao salvar: {str(erro)}", icon="cancel")
     
     def criar_relatorio_vendas(self, frame):
         ctk.CTkLabel(frame, text="📈 Relatório de Vendas", font=("Arial", 18, "bold")).pack(pady=20)
@@ -2807,55 +6130,54 @@ class BarbeariaApp:
         data_inicio = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         data_fim = datetime.now().strftime("%Y-%m-%d")
         
-        vendas = self.db.obter_vendas_periodo(data_inicio, data_fim)
-        for venda in vendas:
-            tree.insert("", "end", values=(
-                venda[8][:10] if len(venda) > 8 and venda[8] else "",
-                venda[9] or "Não informado",
-                venda[8],
+        lista = TreeviewVirtual(
+            self, tree, scrollbar,
+            lambda venda: (
+                venda[8][:10] if venda[8] else "",
+                venda[10] or "Não informado",
+                venda[9],
                 venda[4],
                 f"R$ {venda[6]:.2f}",
                 venda[7]
-            ))
+            ),
+            ordens={
+                "Data": ('data_venda', 8),
+                "Quantidade": ('quantidade', 4),
+                "Valor": ('valor_total', 6),
+                "Pagamento": ('forma_pagamento', 7),
+            },
+            chave=lambda venda: venda[0]
+        )
+        lista.definir_fonte(
+            lambda db, **kwargs: db.obter_vendas_periodo_pagina(data_inicio, data_fim, **kwargs),
+            lambda db: db.contar_vendas_periodo(data_inicio, data_fim),
+            coluna_ordem="Data", decrescente=True
+        )
     
     def baixar_relatorio_vendas_excel(self):
-        try:
-            data_inicio = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-            data_fim = datetime.now().strftime("%Y-%m-%d")
-            
-            vendas = self.db.obter_vendas_periodo(data_inicio, data_fim)
-            
-            if not vendas:
+        data_inicio = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        data_fim = datetime.now().strftime("%Y-%m-%d")
+        
+        def contar(db):
+            return db.contar_vendas_periodo(data_inicio, data_fim)
+        
+        def salvar(linhas):
+            if not linhas:
                 CTkMessagebox(title="Aviso", message="Nenhuma venda encontrada!", icon="warning")
                 return
             
-            arquivo = filedialog.asksaveasfilename(
-                defaultextension=".xlsx",
-                filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
-                initialfile=f"relatorio_vendas_{data_inicio}_{data_fim}.xlsx"
-            )
-            
+            arquivo = self.escolher_arquivo_exportacao(f"relatorio_vendas_{data_inicio}_{data_fim}")
             if not arquivo:
                 return
             
-            df_vendas = pd.DataFrame(vendas, columns=[
-                'ID', 'Cliente_ID', 'Tipo', 'Item_ID', 'Quantidade', 
-                'Valor_Unitario', 'Valor_Total', 'Forma_Pagamento', 'Data', 'Item_Nome', 'Cliente_Nome'
-            ])
-            
-            df_vendas.to_excel(arquivo, index=False)
-            
-            CTkMessagebox(
-                title="✅ Relatório Baixado!",
-                message=f"Relatório de vendas salvo em:\n{arquivo}",
-                icon="check"
-            )
-            
-        except Exception as e:
-            CTkMessagebox(title="Erro", message=f"Erro ao salvar: {str(e)}", icon="cancel")
+            abas = [("Vendas", Database.COLUNAS_EXPORTACAO_VENDAS,
+                     lambda db: db.iterar_vendas_exportacao(data_inicio, data_fim))]
+            self.fila_exportacoes.adicionar(ExportacaoPlanilha(arquivo, abas, contar=contar))
+        
+        self.ler_em_segundo_plano(self.frame_principal, contar, ao_concluir=salvar)
     
     def criar_relatorio_clientes(self, frame):
-        ctk.CTkLabel(frame, text="👥 Relatório de Clientes", font=("Arial", 18, "bold")).pack(pady=20)
+        ctk.CTkLabel(frame, text="👥 Melhores Clientes (últimos 30 dias)", font=("Arial", 18, "bold")).pack(pady=20)
         
         columns = ("Nome", "Telefone", "Total Gasto", "Visitas", "Média/Visita")
         tree = ttk.Treeview(frame, columns=columns, show="headings", height=15)
@@ -2870,16 +6192,24 @@ class BarbeariaApp:
         tree.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=10)
         scrollbar.pack(side="right", fill="y", pady=10)
         
-        clientes = self.db.obter_top_clientes(20)
-        for cliente in clientes:
-            media = cliente[1] / cliente[2] if cliente[2] > 0 else 0
-            tree.insert("", "end", values=(
-                cliente[0],
-                "",
-                f"R$ {cliente[1]:,.2f}",
-                cliente[2],
-                f"R$ {media:.2f}"
-            ))
+        data_inicio = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        data_fim = datetime.now().strftime("%Y-%m-%d")
+        
+        def preencher(clientes):
+            for _id, nome, telefone, total, visitas, media in clientes:
+                tree.insert("", "end", values=(
+                    nome,
+                    telefone,
+                    f"R$ {total:,.2f}",
+                    visitas,
+                    f"R$ {media:.2f}"
+                ))
+        
+        self.analisar_periodo(
+            frame, data_inicio, data_fim,
+            lambda analise: list(analise.ranking_clientes(20).itertuples(index=False, name=None)),
+            ao_concluir=preencher
+        )
     
     def criar_relatorio_servicos(self, frame):
         ctk.CTkLabel(frame, text="✂️ Serviços Mais Vendidos", font=("Arial", 18, "bold")).pack(pady=20)
@@ -2900,20 +6230,25 @@ class BarbeariaApp:
         data_inicio = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         data_fim = datetime.now().strftime("%Y-%m-%d")
         
-        servicos = self.db.obter_servicos_mais_vendidos(data_inicio, data_fim)
-        for servico in servicos:
-            media = servico[2] / servico[1] if servico[1] > 0 else 0
-            tree.insert("", "end", values=(
-                servico[0],
-                servico[1],
-                f"R$ {servico[2]:,.2f}",
-                f"R$ {media:.2f}"
-            ))
+        def preencher(servicos):
+            for nome, quantidade, faturamento, _custo, media, _margem in servicos:
+                tree.insert("", "end", values=(
+                    nome,
+                    quantidade,
+                    f"R$ {faturamento:,.2f}",
+                    f"R$ {media:.2f}"
+                ))
+        
+        self.analisar_periodo(
+            frame, data_inicio, data_fim,
+            lambda analise: list(analise.ranking_itens('servico').itertuples(index=False, name=None)),
+            ao_concluir=preencher
+        )
     
     def criar_relatorio_produtos(self, frame):
         ctk.CTkLabel(frame, text="🛍️ Produtos Mais Vendidos", font=("Arial", 18, "bold")).pack(pady=20)
         
-        columns = ("Produto", "Quantidade", "Faturamento", "Média")
+        columns = ("Produto", "Quantidade", "Faturamento", "Média", "Margem")
         tree = ttk.Treeview(frame, columns=columns, show="headings", height=15)
         
         for col in columns:
@@ -2929,21 +6264,31 @@ class BarbeariaApp:
         data_inicio = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         data_fim = datetime.now().strftime("%Y-%m-%d")
         
-        produtos = self.db.obter_produtos_mais_vendidos(data_inicio, data_fim)
-        for produto in produtos:
-            media = produto[2] / produto[1] if produto[1] > 0 else 0
-            tree.insert("", "end", values=(
-                produto[0],
-                produto[1],
-                f"R$ {produto[2]:,.2f}",
-                f"R$ {media:.2f}"
-            ))
+        def preencher(produtos):
+            for nome, quantidade, faturamento, _custo, media, margem in produtos:
+                tree.insert("", "end", values=(
+                    nome,
+                    quantidade,
+                    f"R$ {faturamento:,.2f}",
+                    f"R$ {media:.2f}",
+                    f"{margem:.1f}%"
+                ))
+        
+        self.analisar_periodo(
+            frame, data_inicio, data_fim,
+            lambda analise: list(analise.ranking_itens('produto').itertuples(index=False, name=None)),
+            ao_concluir=preencher
+        )
     
     # =============================================================
     # 9. CONFIGURAÇÕES
     # =============================================================
     def mostrar_configuracoes(self):
-        self.limpar_frame_principal()
+        self.telas.mostrar(
+            "configuracoes", self.construir_configuracoes
+        )
+    
+    def construir_configuracoes(self):
         
         notebook = ctk.CTkTabview(self.frame_principal)
         notebook.pack(fill="both", expand=True, padx=20, pady=20)
@@ -3063,19 +6408,21 @@ class BarbeariaApp:
         try:
             pasta = Path("backups")
             pasta.mkdir(exist_ok=True)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            arquivo = pasta / f"backup_{timestamp}.db"
-            
-            shutil.copy2("barbearia.db", arquivo)
-            
-            CTkMessagebox(
+        except OSError as e:
+            CTkMessagebox(title="Erro", message=f"Erro: {str(e)}", icon="cancel")
+            return
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        arquivo = pasta / f"backup_{timestamp}.db"
+        
+        self.executor.escrever(
+            "fazer_backup", arquivo,
+            ao_concluir=lambda _: CTkMessagebox(
                 title="Backup Concluído",
                 message=f"Backup criado!\n\nArquivo: {arquivo.name}",
                 icon="check"
             )
-        except Exception as e:
-            CTkMessagebox(title="Erro", message=f"Erro: {str(e)}", icon="cancel")
+        )
     
     def criar_config_sistema(self, frame):
         ctk.CTkLabel(frame, text="Configurações do Sistema", font=("Arial", 18, "bold")).pack(pady=20)
@@ -3112,21 +6459,49 @@ class BarbeariaApp:
     def cancelar_agendamento_dash(self):
         CTkMessagebox(title="Info", message="Funcionalidade em desenvolvimento", icon="info")
     
-    def limpar_frame_principal(self):
-        for widget in self.frame_principal.winfo_children():
-            widget.destroy()
+    def ler_em_segundo_plano(self, frame, metodo, *args, ao_concluir, **kwargs):
+        """Executa a leitura fora da thread da interface, mostrando
+        'Carregando...' sobre o frame até o resultado chegar"""
+        label_carregando = ctk.CTkLabel(
+            frame,
+            text="⏳ Carregando...",
+            font=("Arial", 14),
+            text_color="gray"
+        )
+        label_carregando.place(relx=0.5, rely=0.5, anchor="center")
+        
+        def concluir(resultado):
+            if not frame.winfo_exists():
+                return
+            label_carregando.destroy()
+            ao_concluir(resultado)
+        
+        def falhar(erro):
+            if frame.winfo_exists():
+                label_carregando.destroy()
+            CTkMessagebox(title="Erro", message=f"Erro ao carregar dados: {str(erro)}", icon="cancel")
+        
+        return self.executor.ler(metodo, *args, ao_concluir=concluir, ao_falhar=falhar, **kwargs)
     
     def sair(self):
+        mensagem = "Deseja realmente sair?"
+        ativas = len(self.fila_exportacoes.ativas())
+        if ativas:
+            mensagem = f"{ativas} exportação(ões) em andamento será(ão) cancelada(s).\n{mensagem}"
+        
         resposta = CTkMessagebox(
             title="Sair",
-            message="Deseja realmente sair?",
+            message=mensagem,
             icon="question",
             option_1="Cancelar",
             option_2="Sair"
         )
         
         if resposta.get() == "Sair":
-            self.db.fechar()
+            self.monitor.parar()
+            self.fila_exportacoes.encerrar()
+            self.executor.encerrar()
+            GerenciadorConexoes.encerrar()
             self.janela.quit()
     
     def run(self):
@@ -3135,9 +6510,80 @@ class BarbeariaApp:
 # =============================================================
 # EXECUÇÃO
 # =============================================================
+def relatorio_tempo_inicializacao():
+    """Mostra quanto tempo cada etapa da inicialização leva: importações do
+    módulo, banco, janela de login e, à parte, os módulos adiados.
+    
+    Os módulos adiados são medidos num processo novo: a janela de login já
+    dispara o pré-carregamento, que os deixaria (meio) importados aqui.
+    
+    Uso: python sistema.py --tempo-importacao
+    """
+    import subprocess
+    
+    print(f"Importações do sistema.py: {TEMPO_IMPORTACOES * 1000:.0f} ms")
+    
+    inicio = time.perf_counter()
+    GerenciadorConexoes.obter()
+    print(f"Abertura do banco: {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    
+    try:
+        inicio = time.perf_counter()
+        login = LoginWindow()
+        login.janela.update()
+        print(f"Janela de login: {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        print(f"Login visível após {(time.perf_counter() - INICIO_PROCESSO) * 1000:.0f} ms "
+              f"do início do processo")
+        login.janela.destroy()
+    except Exception as e:
+        print(f"Janela de login: não medida ({e})")
+    
+    print("Módulos adiados (processo separado):")
+    subprocess.run(
+        [sys.executable, "-c", "import sistema; sistema.medir_modulos_adiados()"],
+        cwd=Path(__file__).resolve().parent
+    )
+
+
+def medir_modulos_adiados():
+    """Importa em sequência o que o pré-carregamento faz em segundo plano,
+    mostrando o tempo de cada módulo"""
+    for nome in MODULOS_ADIADOS:
+        try:
+            importar_modulo(nome)
+        except ImportError as e:
+            print(f"  {nome}: indisponível ({e})")
+            continue
+        tempo = tempos_importacao.get(nome)
+        print(f"  {nome}: {'%.0f ms' % tempo if tempo is not None else 'já carregado'}")
+
+
 if __name__ == "__main__":
+    if "--arquivar-historico" in sys.argv:
+        # Uso: python sistema.py --arquivar-historico
+        try:
+            movidas = GerenciadorConexoes.obter().db.arquivar_historico()
+            for tabela, linhas in movidas.items():
+                print(f"{tabela}: {linhas} linhas arquivadas")
+            if not movidas:
+                print("Nenhum mês para arquivar")
+        finally:
+            GerenciadorConexoes.encerrar()
+        sys.exit(0)
+    
+    if "--tempo-importacao" in sys.argv:
+        try:
+            relatorio_tempo_inicializacao()
+        finally:
+            GerenciadorConexoes.encerrar()
+        sys.exit(0)
+    
     ctk.set_appearance_mode("dark")
     ctk.set_default_color_theme("blue")
     
-    login = LoginWindow()
-    login.run()
\ No newline at end of file
+    try:
+        login = LoginWindow()
+        login.run()
+    finally:
+        GerenciadorConexoes.encerrar()
+        ProfilerConsultas.encerrar()
\ No newline at end of file
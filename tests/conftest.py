@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sistema
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Banco novo (já migrado) numa pasta temporária"""
+    banco = sistema.Database(str(tmp_path / 'barbearia.db'))
+    yield banco
+    banco.fechar()
@@ -0,0 +1,144 @@
+import csv
+
+import pytest
+
+import sistema
+
+pytest.importorskip('pandas')
+
+
+def vender(db, data_venda, cliente_id, tipo, item_id, quantidade, valor_unitario, forma="Dinheiro"):
+    db.cursor.execute(
+        """INSERT INTO vendas
+           (cliente_id, tipo, item_id, quantidade, valor_unitario, valor_total, forma_pagamento, data_venda)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (cliente_id, tipo, item_id, quantidade, valor_unitario, valor_unitario * quantidade, forma, data_venda)
+    )
+    db.conn.commit()
+
+
+@pytest.fixture
+def db_com_vendas(db):
+    corte = db.adicionar_servico("Corte", 40.0)
+    barba = db.adicionar_servico("Barba", 25.0)
+    pomada = db.adicionar_produto("Pomada", 30.0, 12.0, 100)
+    ana = db.adicionar_cliente("Ana", "11 99999-0001")
+    bruno = db.adicionar_cliente("Bruno", "11 99999-0002")
+    
+    # Atendimentos com vários itens no mesmo horário, vendas sem cliente
+    # e o mesmo cliente em horários diferentes
+    vender(db, "2024-05-02 10:00:00", ana, 'servico', corte, 1, 40.0)
+    vender(db, "2024-05-02 10:00:00", ana, 'servico', barba, 1, 25.0, "Pix")
+    vender(db, "2024-05-02 10:00:00", ana, 'produto', pomada, 2, 30.0, "Pix")
+    vender(db, "2024-05-02 10:00:00", None, 'produto', pomada, 1, 30.0)
+    vender(db, "2024-05-03 09:30:00", bruno, 'servico', corte, 1, 40.0, "Cartão Débito")
+    vender(db, "2024-05-03 09:30:00", bruno, 'produto', pomada, 1, 30.0, "Cartão Débito")
+    vender(db, "2024-05-04 16:00:00", ana, 'servico', corte, 1, 40.0)
+    vender(db, "2024-05-05 11:00:00", None, 'servico', barba, 1, 25.0)
+    db.adicionar_despesa("Aluguel", "Fixas", 500.0, "2024-05-01")
+    db.adicionar_despesa("Luz", "Fixas", 80.25, "2024-05-10")
+    
+    # Renomear não separa as vendas do mesmo serviço
+    db.cursor.execute("UPDATE servicos SET nome = 'Corte Masculino' WHERE id = ?", (corte,))
+    db.conn.commit()
+    return db
+
+
+def metricas(analise):
+    return {
+        'resumo': analise.resumo_financeiro(),
+        'formas': analise.formas_pagamento().to_dict('records'),
+        'servicos': analise.ranking_itens('servico').to_dict('records'),
+        'produtos': analise.ranking_itens('produto').to_dict('records'),
+        'clientes': analise.ranking_clientes().to_dict('records'),
+        'agendamentos': analise.agendamentos_por_status(),
+    }
+
+
+def test_blocos_pequenos_dao_as_mesmas_metricas(db_com_vendas):
+    db = db_com_vendas
+    inteira = sistema.AnalisePeriodo.carregar(db, "2024-05-01", "2024-05-31")
+    
+    resumo = inteira.resumo_financeiro()
+    assert resumo['total_vendas'] == 290.0
+    assert resumo['total_despesas'] == 580.25
+    assert resumo['atendimentos'] == 5
+    assert resumo['custo_produtos'] == 48.0
+    assert [linha['item_nome'] for linha in metricas(inteira)['servicos']] == ["Corte Masculino", "Barba"]
+    assert [(c['cliente_nome'], c['visitas']) for c in metricas(inteira)['clientes']] == [("Ana", 2), ("Bruno", 1)]
+    
+    # Um bloco por linha: os atendimentos cruzam a divisa entre blocos
+    for bloco in (1, 2, 3):
+        assert metricas(sistema.AnalisePeriodo.carregar(db, "2024-05-01", "2024-05-31", bloco=bloco)) == metricas(inteira)
+
+
+def test_exportacao_usa_as_contas_da_tela(db_com_vendas, tmp_path):
+    db = db_com_vendas
+    analise = db.obter_analise_periodo("2024-05-01", "2024-05-31")
+    
+    arquivo = tmp_path / "relatorio.csv"
+    exportacao = sistema.ExportacaoPlanilha(
+        arquivo, sistema.BarbeariaApp.abas_relatorio_financeiro("2024-05-01", "2024-05-31")
+    )
+    arquivos = exportacao.executar(db)
+    
+    def aba(nome):
+        caminho = next(a for a in arquivos if a.endswith(f"_{nome}.csv"))
+        with open(caminho, encoding='utf-8-sig', newline='') as entrada:
+            return list(csv.reader(entrada, delimiter=';'))[1:]
+    
+    servicos = analise.ranking_itens('servico')
+    assert aba("Serviços") == [
+        [nome, str(quantidade), str(round(faturamento, 2))]
+        for nome, quantidade, faturamento in servicos[['item_nome', 'quantidade', 'faturamento']].itertuples(index=False)
+    ]
+    assert [linha[:3] for linha in aba("Pagamentos")] == [["Dinheiro", "4", "135.0"], ["Pix", "2", "85.0"], ["Cartão Débito", "2", "70.0"]]
+    assert [linha[:4] for linha in aba("Clientes")] == [["Ana", "11 99999-0001", "165.0", "2"], ["Bruno", "11 99999-0002", "70.0", "1"]]
+    
+    resumo = analise.resumo_financeiro()
+    assert aba("Resumo") == [[
+        "290.0", "580.25", str(round(resumo['lucro'], 2)), str(round(resumo['margem'], 2)),
+        "5", str(round(resumo['ticket_medio'], 2)), "48.0",
+    ]]
+
+
+def test_periodo_sem_vendas(db):
+    analise = sistema.AnalisePeriodo.carregar(db, "2024-05-01", "2024-05-31")
+    assert analise.vazia()
+    assert analise.formas_pagamento().empty
+    assert analise.ranking_itens('servico').empty
+    assert analise.ranking_clientes().empty
+    assert analise.resumo_financeiro()['atendimentos'] == 0
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    """ProfilerConsultas ligado só durante o teste"""
+    ativo = sistema.ProfilerConsultas(limite_ms=10_000, arquivo_log=str(tmp_path / 'consultas_lentas.log'))
+    sistema.ProfilerConsultas._instancia, sistema.ProfilerConsultas._verificado = ativo, True
+    yield ativo
+    sistema.ProfilerConsultas.encerrar()
+    sistema.ProfilerConsultas._verificado = False
+
+
+def test_consultas_da_analise_passam_pelo_profiler(db_com_vendas, profiler, monkeypatch):
+    pilhas = []
+    monkeypatch.setattr(profiler, 'acao_atual', lambda: pilhas.append(1) or "acao_lenta")
+    
+    def consulta(trecho):
+        return next(item for sql, item in profiler.estatisticas.items() if trecho in sql)
+    
+    sistema.AnalisePeriodo.carregar(db_com_vendas, "2024-05-01", "2024-05-31", bloco=2)
+    assert consulta("FROM vendas WHERE data_venda")['linhas'] == 8
+    assert consulta("FROM despesas WHERE data")['linhas'] == 2
+    assert consulta("FROM servicos UNION ALL")['linhas'] == 3
+    assert consulta("FROM clientes WHERE id IN")['linhas'] == 2
+    
+    # Consultas rápidas não percorrem a pilha
+    assert pilhas == []
+    assert list(consulta("FROM vendas WHERE data_venda")['acoes']) == ["MainThread"]
+    
+    profiler.limite_ms = 0
+    sistema.AnalisePeriodo.carregar(db_com_vendas, "2024-05-01", "2024-05-31")
+    assert pilhas
+    assert consulta("FROM vendas WHERE data_venda")['acoes']["acao_lenta"] == 1
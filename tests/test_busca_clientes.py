@@ -0,0 +1,50 @@
+import pytest
+
+
+@pytest.fixture
+def db_com_clientes(db):
+    if not db.possui_busca_textual():
+        pytest.skip("SQLite sem FTS5 trigram")
+    db.cursor.executemany(
+        "INSERT INTO clientes (nome, telefone, observacoes) VALUES (?, ?, ?)",
+        [(f"Cliente {i}", f"11 9{i:08d}", "indicado pela família Silva") for i in range(1500)]
+    )
+    db.conn.commit()
+    db.adicionar_cliente("Marina Silva", "11 98888-7777")
+    return db
+
+
+def test_relevancia_ordena_todas_as_correspondencias(db_com_clientes):
+    db = db_com_clientes
+    
+    # O melhor resultado é o último cadastrado, depois de 1500 que só citam
+    # o termo nas observações
+    primeiro = db.buscar_clientes("silva", limite=1)
+    assert primeiro[0][1] == "Marina Silva"
+    
+    assert db.contar_busca_clientes("silva") == 1501
+    assert len(db.buscar_clientes("silva")) == 1501
+
+
+def test_paginas_da_busca_continuam_do_deslocamento(db_com_clientes):
+    db = db_com_clientes
+    
+    todas = [cliente[0] for cliente in db.buscar_clientes("silva")]
+    paginas = []
+    for deslocamento in range(0, 1501, 200):
+        linhas, chave = db.buscar_clientes_pagina("silva", limite=200, deslocamento=deslocamento)
+        assert chave is None
+        paginas.extend(cliente[0] for cliente in linhas)
+    assert paginas == todas
+    
+    por_nome, _ = db.buscar_clientes_pagina("silva", limite=3, ordem='nome')
+    assert [cliente[1] for cliente in por_nome] == ["Cliente 0", "Cliente 1", "Cliente 10"]
+
+
+def test_palavras_curtas_usam_like_com_o_mesmo_total(db_com_clientes):
+    db = db_com_clientes
+    
+    assert db.contar_busca_clientes("Ma Silva") == 1
+    assert [cliente[1] for cliente in db.buscar_clientes("Ma Silva")] == ["Marina Silva"]
+    assert db.contar_busca_clientes("   ") == 0
+    assert db.buscar_clientes("") == []
@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def duplicado_antigo(db):
+    """Dois clientes com o mesmo telefone, como a migração 5 os deixa: o
+    mais novo fica sem telefone_norm"""
+    ana = db.adicionar_cliente("Ana", "(11) 99999-0001")
+    repetida = db.adicionar_cliente("Ana Souza", "11 99999-0009")
+    db.cursor.execute(
+        "UPDATE clientes SET telefone = '11999990001', telefone_norm = NULL WHERE id = ?", (repetida,)
+    )
+    db.conn.commit()
+    return ana, repetida
+
+
+def telefone_norm(db, cliente_id):
+    db.cursor.execute("SELECT telefone_norm FROM clientes WHERE id = ?", (cliente_id,))
+    return db.cursor.fetchone()[0]
+
+
+def test_editar_nome_de_telefone_repetido(db, duplicado_antigo):
+    _, repetida = duplicado_antigo
+    # O formulário de edição manda sempre o telefone, mesmo sem mudança
+    db.atualizar_cliente(repetida, nome="Ana S.", telefone="11999990001")
+    
+    db.cursor.execute("SELECT nome, telefone_norm FROM clientes WHERE id = ?", (repetida,))
+    assert db.cursor.fetchone() == ("Ana S.", None)
+
+
+def test_trocar_telefone_recalcula_a_chave(db, duplicado_antigo):
+    ana, repetida = duplicado_antigo
+    db.atualizar_cliente(repetida, nome="Ana Souza", telefone="(11) 98888-7777")
+    assert telefone_norm(db, repetida) == "11988887777"
+    
+    # Trocar para o número de outro cliente continua barrado pelo índice
+    with pytest.raises(sqlite3.IntegrityError):
+        db.atualizar_cliente(ana, nome="Ana", telefone="11 98888-7777")
@@ -0,0 +1,103 @@
+import time
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+import sistema
+
+REPETICOES = 500
+LIMITE_MB = 5.0
+
+
+def medir_crescimento(repetir):
+    """Memória (bytes) que sobra depois de REPETICOES chamadas, após um aquecimento"""
+    # Aquecimento: caches de fontes do matplotlib e dos relatórios
+    for _ in range(5):
+        repetir()
+    
+    tracemalloc.start()
+    try:
+        inicial = tracemalloc.get_traced_memory()[0]
+        for _ in range(REPETICOES):
+            repetir()
+        return tracemalloc.get_traced_memory()[0] - inicial
+    finally:
+        tracemalloc.stop()
+
+
+def vender(db, servico):
+    db.registrar_venda_lote(
+        None, [{'tipo': 'servico', 'id': servico, 'quantidade': 1, 'valor_unitario': 40.0}], "Dinheiro"
+    )
+
+
+def test_grafico_nao_acumula_memoria(db):
+    """O gráfico do dashboard, renderizado com o Agg, sem Tk (roda sem display)"""
+    pytest.importorskip('matplotlib')
+    pytest.importorskip('PIL')
+    grafico = sistema.GraficoBarras(7, 'Vendas Diárias', 'Valor (R$)')
+    servico = db.adicionar_servico("Corte", 40.0)
+    
+    def renderizar():
+        vender(db, servico)
+        totais = db.obter_snapshot_dashboard(partes=('vendas_semana',))['vendas_semana']
+        imagem = grafico.renderizar(*sistema.BarbeariaApp.serie_vendas_semana(totais))
+        assert imagem.size == (800, 400)
+    
+    crescimento = medir_crescimento(renderizar)
+    assert crescimento <= LIMITE_MB * 1024 * 1024, (
+        f"{REPETICOES} renderizações do gráfico: memória cresceu {crescimento / 1024 / 1024:.2f} MB"
+    )
+
+
+@pytest.fixture
+def app(tmp_path):
+    """BarbeariaApp de verdade sobre um banco temporário (pulado sem display)"""
+    tkinter = pytest.importorskip('tkinter')
+    sistema.GerenciadorConexoes._instancia = sistema.GerenciadorConexoes(caminho=str(tmp_path / 'barbearia.db'))
+    try:
+        aplicacao = sistema.BarbeariaApp((1, "admin", "admin"))
+    except tkinter.TclError as erro:
+        sistema.GerenciadorConexoes.encerrar()
+        pytest.skip(f"Tk indisponível: {erro}")
+    
+    yield aplicacao
+    
+    aplicacao.monitor.parar()
+    aplicacao.fila_exportacoes.encerrar()
+    aplicacao.executor.encerrar()
+    aplicacao.janela.destroy()
+    sistema.GerenciadorConexoes.encerrar()
+
+
+def esperar_leituras(app, limite_s=10):
+    """Processa os eventos do Tk até as leituras em segundo plano voltarem"""
+    fim = time.monotonic() + limite_s
+    app.janela.update()
+    while app.executor._pendentes and time.monotonic() < fim:
+        time.sleep(0.005)
+        app.janela.update()
+
+
+def test_dashboard_nao_acumula_memoria(app):
+    db = app.db
+    servico = db.adicionar_servico("Corte", 40.0)
+    db.adicionar_produto("Pomada", 25.0, 10.0, 2, estoque_minimo=5)
+    cliente = db.adicionar_cliente("Ana", "11 99999-0001")
+    db.adicionar_agendamento(cliente, servico, datetime.now().strftime("%Y-%m-%d"), "10:00", "João", 40.0)
+    
+    def atualizar():
+        # Cada venda faz mostrar_dashboard reler a tela em segundo plano
+        vender(db, servico)
+        app.mostrar_dashboard()
+        dados = app.coletar_dados_dashboard(db)
+        assert not isinstance(dados['grafico_vendas'], Exception)
+        app.preencher_dashboard(dados)
+        esperar_leituras(app)
+    
+    crescimento = medir_crescimento(atualizar)
+    assert crescimento <= LIMITE_MB * 1024 * 1024, (
+        f"{REPETICOES} atualizações do dashboard: memória cresceu {crescimento / 1024 / 1024:.2f} MB"
+    )
+
@@ -0,0 +1,72 @@
+import sqlite3
+import time
+
+import pytest
+
+import sistema
+
+
+@pytest.fixture
+def fuso_sao_paulo(monkeypatch):
+    if not hasattr(time, 'tzset'):
+        pytest.skip("time.tzset indisponível")
+    monkeypatch.setenv('TZ', 'America/Sao_Paulo')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def padroes(caminho, tabela):
+    with sqlite3.connect(caminho) as conn:
+        return {linha[1]: linha[4] for linha in conn.execute(f"PRAGMA table_info({tabela})")}
+
+
+def voltar_para_utc(caminho):
+    """Deixa o banco como era antes da migração 11: padrões em UTC"""
+    conn = sqlite3.connect(caminho)
+    versao = conn.execute("PRAGMA schema_version").fetchone()[0]
+    conn.execute("PRAGMA writable_schema = ON")
+    for utc, local in sistema.Database.PADROES_DATA_LOCAL:
+        conn.execute("UPDATE sqlite_master SET sql = replace(sql, ?, ?) WHERE type = 'table'", (local, utc))
+    conn.execute(f"PRAGMA schema_version = {versao + 1}")
+    conn.execute("PRAGMA writable_schema = OFF")
+    conn.execute("PRAGMA user_version = 10")
+    conn.commit()
+    conn.close()
+
+
+def test_padroes_de_data_em_hora_local(db):
+    assert padroes(db.caminho, 'vendas')['data_venda'] == "datetime('now', 'localtime')"
+    assert padroes(db.caminho, 'clientes')['data_cadastro'] == "date('now', 'localtime')"
+
+
+def test_migracao_passa_vendas_e_padroes_para_hora_local(tmp_path, fuso_sao_paulo):
+    caminho = str(tmp_path / 'barbearia.db')
+    db = sistema.Database(caminho)
+    servico = db.adicionar_servico("Corte", 40.0)
+    db.fechar()
+    voltar_para_utc(caminho)
+    
+    # Venda das 22h de 31/05 em São Paulo, gravada pelo padrão antigo em UTC
+    conn = sqlite3.connect(caminho)
+    conn.execute(
+        """INSERT INTO vendas (tipo, item_id, quantidade, valor_unitario, valor_total, forma_pagamento, data_venda)
+           VALUES ('servico', ?, 1, 40.0, 40.0, 'Pix', '2024-06-01 01:00:00')""",
+        (servico,)
+    )
+    conn.commit()
+    conn.close()
+    assert padroes(caminho, 'vendas')['data_venda'] == 'CURRENT_TIMESTAMP'
+    
+    db = sistema.Database(caminho)
+    try:
+        assert padroes(caminho, 'vendas')['data_venda'] == "datetime('now', 'localtime')"
+        db.cursor.execute("PRAGMA integrity_check")
+        assert db.cursor.fetchone()[0] == 'ok'
+        db.cursor.execute("SELECT data_venda FROM vendas")
+        assert db.cursor.fetchone()[0] == '2024-05-31 22:00:00'
+        assert db.obter_total_vendas_periodo('2024-05-31', '2024-05-31') == 40.0
+        assert db.obter_total_vendas_periodo('2024-06-01', '2024-06-01') == 0
+    finally:
+        db.fechar()
@@ -0,0 +1,126 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('pandas')
+
+
+def vender(db, data_venda, cliente_id, tipo, item_id, quantidade, valor_unitario, forma="Dinheiro"):
+    db.cursor.execute(
+        """INSERT INTO vendas
+           (cliente_id, tipo, item_id, quantidade, valor_unitario, valor_total, forma_pagamento, data_venda)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (cliente_id, tipo, item_id, quantidade, valor_unitario, valor_unitario * quantidade, forma, data_venda)
+    )
+    db.conn.commit()
+
+
+@pytest.fixture
+def db_com_meses_antigos(db):
+    servico = db.adicionar_servico("Corte", 40.0)
+    produto = db.adicionar_produto("Pomada", 25.0, 10.0, 50)
+    cliente = db.adicionar_cliente("Ana", "11 99999-0001")
+    outro = db.adicionar_cliente("Bruno", "11 99999-0002")
+    
+    vender(db, "2020-03-05 10:00:00", cliente, 'servico', servico, 1, 40.0)
+    vender(db, "2020-03-20 15:30:00", cliente, 'produto', produto, 2, 25.0, "Pix")
+    vender(db, "2020-04-02 09:00:00", outro, 'servico', servico, 1, 40.0)
+    vender(db, "2020-04-10 11:00:00", None, 'produto', produto, 1, 25.0)
+    db.registrar_venda_lote(
+        cliente, [{'tipo': 'servico', 'id': servico, 'quantidade': 1, 'valor_unitario': 45.0}], "Cartão"
+    )
+    
+    db.adicionar_despesa("Aluguel", "Fixas", 800.0, "2020-03-01")
+    db.adicionar_despesa("Luz", "Fixas", 120.5, "2020-04-01")
+    db.adicionar_despesa("Aluguel", "Fixas", 900.0, datetime.now().strftime("%Y-%m-%d"))
+    
+    db.adicionar_agendamento(cliente, servico, "2020-03-05", "10:00", "João", 40.0)
+    db.adicionar_agendamento(outro, servico, "2020-03-05", "09:00", "João", 40.0)
+    return db, cliente
+
+
+def test_arquivar_nao_muda_historico_nem_totais(db_com_meses_antigos):
+    db, cliente = db_com_meses_antigos
+    inicio, fim = "2020-01-01", datetime.now().strftime("%Y-%m-%d")
+    
+    def ler():
+        analise = db.obter_analise_periodo(inicio, fim)
+        return {
+            'historico_cliente': db.obter_historico_cliente(cliente),
+            'total_vendas': db.obter_total_vendas_periodo(inicio, fim),
+            'vendas': db.contar_vendas_periodo(inicio, fim),
+            'despesas': sorted(db.iterar_despesas_exportacao(inicio, fim)),
+            'resumo': analise.resumo_financeiro(),
+            'servicos': analise.ranking_itens('servico').to_dict('records'),
+            'produtos': analise.ranking_itens('produto').to_dict('records'),
+            'agenda': db.obter_agendamentos_do_dia("2020-03-05"),
+        }
+    
+    antes = ler()
+    movidas = db.arquivar_historico()
+    
+    assert movidas == {'vendas': 4, 'despesas': 2, 'agendamentos': 2}
+    assert db.obter_arquivos_historico('vendas', inicio, fim)
+    db.cursor.execute("SELECT COUNT(*) FROM vendas")
+    assert db.cursor.fetchone()[0] == 1
+    
+    depois = ler()
+    assert depois == antes
+    assert [linha[0][:7] for linha in depois['historico_cliente']] == [fim[:7], "2020-03", "2020-03"]
+    assert [linha[2] for linha in depois['historico_cliente']] == ["Corte", "Pomada", "Corte"]
+    assert [(ag[4], ag[11], ag[13]) for ag in depois['agenda']] == [("09:00", "Bruno", "Corte"), ("10:00", "Ana", "Corte")]
+
+
+def test_exclusao_depois_do_arquivamento_subtrai_dos_totais(db_com_meses_antigos):
+    db, _ = db_com_meses_antigos
+    inicio, fim = "2020-01-01", datetime.now().strftime("%Y-%m-%d")
+    db.arquivar_historico()
+    
+    db.cursor.execute("SELECT SUM(valor_total) FROM vendas_diarias WHERE dia < '2020-05-01'")
+    assert db.cursor.fetchone()[0] == 155.0
+    
+    # Um registro de arquivamento que não terminou não muda o trigger de DELETE
+    db.cursor.execute(
+        "INSERT INTO arquivos_historico (arquivo, tabela, mes, linhas, concluido) VALUES ('x.npz', 'vendas', '2020-05', 1, 0)"
+    )
+    db.cursor.execute("DELETE FROM vendas")
+    db.conn.commit()
+    assert db.obter_total_vendas_periodo(inicio, fim) == 155.0
+
+
+@pytest.mark.parametrize('ordem,decrescente', [('hora', False), ('cliente_nome', False), ('valor', True)])
+def test_paginas_da_agenda_juntam_banco_e_historico(db_com_meses_antigos, ordem, decrescente):
+    db, cliente = db_com_meses_antigos
+    servico = db.obter_servicos()[0][0]
+    db.adicionar_agendamento(None, servico, "2020-03-06", "08:00", "Rui", 55.0)
+    db.arquivar_historico()
+    # Agendamentos gravados no mês depois de ele ir para o histórico
+    db.adicionar_agendamento(cliente, servico, "2020-03-05", "09:30", "Rui", 30.0)
+    db.adicionar_agendamento(None, servico, "2020-03-06", "07:00", "Rui", 50.0)
+    
+    periodo = ("2020-03-01", "2020-03-31")
+    assert db.contar_agendamentos_periodo(*periodo) == 5
+    todas, proxima = db.obter_agendamentos_periodo_pagina(*periodo, limite=50, ordem=ordem, decrescente=decrescente)
+    assert len(todas) == 5 and proxima is None
+    
+    por_keyset, apos = [], None
+    while True:
+        linhas, apos = db.obter_agendamentos_periodo_pagina(
+            *periodo, apos=apos, limite=2, ordem=ordem, decrescente=decrescente
+        )
+        por_keyset += linhas
+        if apos is None:
+            break
+    por_deslocamento = [
+        linha for inicio in range(0, 5, 2)
+        for linha in db.obter_agendamentos_periodo_pagina(
+            *periodo, limite=2, ordem=ordem, decrescente=decrescente, deslocamento=inicio
+        )[0]
+    ]
+    assert por_keyset == por_deslocamento == todas
+    
+    if ordem == 'hora':
+        assert [(ag[3], ag[4]) for ag in todas] == [
+            ("2020-03-05", "09:00"), ("2020-03-05", "09:30"), ("2020-03-05", "10:00"),
+            ("2020-03-06", "07:00"), ("2020-03-06", "08:00"),
+        ]
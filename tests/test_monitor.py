@@ -0,0 +1,38 @@
+import pytest
+
+import sistema
+
+
+@pytest.fixture
+def gerenciador(tmp_path):
+    sistema.GerenciadorConexoes._instancia = sistema.GerenciadorConexoes(caminho=str(tmp_path / 'barbearia.db'))
+    yield sistema.GerenciadorConexoes._instancia
+    sistema.GerenciadorConexoes.encerrar()
+
+
+def test_escrita_de_outro_processo_junto_com_escrita_local(gerenciador):
+    db = gerenciador.db
+    monitor = sistema.MonitorAlteracoes(None, gerenciador)
+    assert monitor.verificar() == set()
+    
+    # No mesmo intervalo: este processo grava clientes e outro grava despesas
+    db.adicionar_cliente("Ana", "11 99999-0001")
+    outro_processo = sistema.Database(gerenciador.caminho)
+    try:
+        outro_processo.adicionar_despesa("Luz", "Fixas", 100.0, "2024-05-01")
+    finally:
+        outro_processo.fechar()
+    
+    versao_despesas = db.versao_tabelas('despesas')
+    assert monitor.verificar() == {'clientes', 'despesas'}
+    # As telas escondidas que mostram despesas também ficam desatualizadas
+    assert db.versao_tabelas('despesas') != versao_despesas
+    
+    assert monitor.verificar() == set()
+    
+    outro_processo = sistema.Database(gerenciador.caminho)
+    try:
+        outro_processo.adicionar_servico("Barba", 25.0)
+    finally:
+        outro_processo.fechar()
+    assert monitor.verificar() == {'servicos'}
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+import sistema
+
+pytest.importorskip('pandas')
+
+
+def hoje():
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def vender(db, servico, quantidade=1, forma="Dinheiro"):
+    db.registrar_venda_lote(
+        None, [{'tipo': 'servico', 'id': servico, 'quantidade': quantidade, 'valor_unitario': 40.0}], forma
+    )
+
+
+def test_analise_vem_do_cache_ate_a_tabela_ser_gravada(db):
+    servico = db.adicionar_servico("Corte", 40.0)
+    vender(db, servico)
+    
+    analise = db.obter_analise_periodo(hoje(), hoje())
+    assert analise.resumo_financeiro()['total_vendas'] == 40.0
+    
+    # Sem escrita pelo Database o resultado guardado é entregue
+    assert db.obter_analise_periodo(hoje(), hoje()) is analise
+    
+    db.adicionar_cliente("Ana", "11 99999-0001")
+    nova = db.obter_analise_periodo(hoje(), hoje())
+    assert nova is not analise
+    assert db.obter_analise_periodo(hoje(), hoje()) is nova
+    
+    vender(db, servico, 2, "Pix")
+    assert db.obter_analise_periodo(hoje(), hoje()).resumo_financeiro()['total_vendas'] == 120.0
+
+
+def test_escrita_conta_uma_versao_por_transacao(db):
+    servico = db.adicionar_servico("Corte", 40.0)
+    antes = db.versoes_gravadas('vendas', 'produtos', 'despesas')
+    
+    # Vários itens na mesma venda: uma escrita, não uma por linha
+    db.registrar_venda_lote(None, [
+        {'tipo': 'servico', 'id': servico, 'quantidade': 1, 'valor_unitario': 40.0},
+        {'tipo': 'servico', 'id': servico, 'quantidade': 1, 'valor_unitario': 40.0},
+    ], "Dinheiro")
+    vendas, produtos, despesas = db.versoes_gravadas('vendas', 'produtos', 'despesas')
+    assert (vendas, produtos, despesas) == (antes[0] + 1, antes[1] + 1, antes[2])
+    
+    # Se a escrita falha, o contador volta junto com a transação
+    with pytest.raises(Exception):
+        db.registrar_venda_lote(None, [{'tipo': 'servico', 'id': servico}], "Dinheiro")
+    assert db.versoes_gravadas('vendas', 'produtos', 'despesas') == (vendas, produtos, despesas)
+    assert not db.conn.in_transaction
+
+
+def test_escrita_de_outra_conexao_invalida_o_cache(db):
+    servico = db.adicionar_servico("Corte", 40.0)
+    leitor = sistema.Database(db.caminho, somente_leitura=True)
+    try:
+        assert leitor.obter_analise_periodo(hoje(), hoje()).vazia()
+        
+        outro_processo = sistema.Database(db.caminho)
+        try:
+            vender(outro_processo, servico)
+        finally:
+            outro_processo.fechar()
+        
+        assert leitor.obter_analise_periodo(hoje(), hoje()).resumo_financeiro()['total_vendas'] == 40.0
+    finally:
+        leitor.fechar()